@@ -12,7 +12,9 @@ with open(os.path.join(here, "keops_version"), encoding="utf-8") as v:
     __version__ = v.read().rstrip()
 
 from .config.config import set_build_folder, get_build_folder
+from .config.config import set_build_profile, get_build_profile
 from .utils.code_gen_utils import clean_keops
+from .utils.build_cache import evict_formulas
 
 # flags for debugging :
 # prints information about atomic operations during code building
@@ -22,13 +24,3 @@ debug_ops = False
 debug_ops_at_exec = False
 
 cuda_block_size = 192
-
-from . import config as keopscoreconfig
-
-if keopscoreconfig.config.use_cuda:
-    keopscoreconfig.config.init_cudalibs()
-    from .binders.nvrtc.Gpu_link_compile import Gpu_link_compile
-    from .binders.nvrtc.Gpu_link_compile import jit_compile_dll
-
-    if not os.path.exists(jit_compile_dll()):
-        Gpu_link_compile.compile_jit_compile_dll()
@@ -3,8 +3,14 @@ import os
 import keopscore.config.config
 from keopscore.config.config import get_build_folder
 from keopscore.utils.code_gen_utils import get_hash_name
-from keopscore.utils.misc_utils import KeOps_Error, KeOps_Message
-from keopscore.config.config import cpp_flags
+from keopscore.utils.misc_utils import (
+    KeOps_Error,
+    KeOps_Message,
+    file_lock,
+    write_file_atomically,
+)
+from keopscore.config.config import get_cpp_flags_key, get_enable_compile
+from keopscore.utils.build_cache import evict_formulas, touch_formula
 
 
 class LinkCompile:
@@ -22,6 +28,8 @@ class LinkCompile:
             self.aliases,
             self.nargs,
             self.dtype,
+            self.dtype_storage,
+            self.split_indices,
             self.dtypeacc,
             self.sum_scheme_string,
             self.tagHostDevice,
@@ -29,7 +37,8 @@ class LinkCompile:
             self.tag1D2D,
             self.use_half,
             self.device_id,
-            cpp_flags,
+            self.strided_args,
+            get_cpp_flags_key(),
         )
 
         # info_file is the name of the file that will contain some meta-information required by the bindings, e.g. 7b9a611f7e.nfo
@@ -47,11 +56,10 @@ class LinkCompile:
         # create info_file to save some parameters : dim (dimension of output vectors),
         #                                            tagI (O or 1, reduction over i or j indices),
         #                                            dimy (sum of dimensions of j-indexed vectors)
-        f = open(self.info_file, "w")
-        f.write(
-            f"red_formula={self.red_formula_string}\ndim={self.dim}\ntagI={self.tagI}\ndimy={self.dimy}"
+        write_file_atomically(
+            self.info_file,
+            f"red_formula={self.red_formula_string}\ndim={self.dim}\ntagI={self.tagI}\ndimy={self.dimy}",
         )
-        f.close()
 
     def read_info(self):
         # read info_file to retreive dim, tagI, dimy
@@ -81,28 +89,54 @@ class LinkCompile:
 
     def write_code(self):
         # write the generated code in the source file ; this is used as a subfunction of compile_code
-        f = open(self.gencode_file, "w")
-        f.write(self.code)
-        f.close()
+        write_file_atomically(self.gencode_file, self.code)
 
     def generate_code(self):
         pass
 
+    def is_built(self):
+        return os.path.exists(self.file_to_check) and os.path.exists(self.info_file)
+
+    def miss_report(self):
+        return (
+            f"formula {self.gencode_filename} is not in the build folder {get_build_folder()}, "
+            "and compilation of new formulas is disabled.\n"
+            f"    formula : {self.red_formula_string}\n"
+            f"    aliases : {self.aliases}\n"
+            f"    scheme : {type(self).__name__}, dtype : {self.dtype_storage}, "
+            f"dtype_acc : {self.dtypeacc}, sum_scheme : {self.sum_scheme_string}\n"
+            "It should be compiled (e.g. with pykeops.precompile) before exporting the bundle."
+        )
+
     def get_dll_and_params(self):
         # main method of the class : it generates - if needed - the code and returns the name of the dll to be run for
         # performing the reduction, e.g. 7b9a611f7e.so, or in the case of JIT compilation, the name of the main KeOps dll,
         # and the name of the assembly code file.
-        if not os.path.exists(self.file_to_check):
-            KeOps_Message(
-                "Generating code for formula " + self.red_formula.__str__() + " ... ",
-                flush=True,
-                end="",
-            )
-            self.generate_code()
-            self.save_info()
-            KeOps_Message("OK", use_tag=False, flush=True)
+        # The info file is written last, so that the code is ready when it exists ; when
+        # several processes share the build folder, only the first one generates the code,
+        # while the others wait for the lock and then read the info file.
+        if not self.is_built():
+            if not get_enable_compile():
+                KeOps_Error(self.miss_report())
+            with file_lock(self.gencode_file + ".lock"):
+                if not self.is_built():
+                    KeOps_Message(
+                        "Generating code for formula "
+                        + self.red_formula.__str__()
+                        + " ... ",
+                        flush=True,
+                        end="",
+                    )
+                    self.generate_code()
+                    self.save_info()
+                    KeOps_Message("OK", use_tag=False, flush=True)
+                else:
+                    self.read_info()
+            # the build folder may now exceed its size cap
+            evict_formulas()
         else:
             self.read_info()
+            touch_formula(self.gencode_filename)
         return dict(
             tag=self.gencode_filename,
             source_file=self.true_dllname,
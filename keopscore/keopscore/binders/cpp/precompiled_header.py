@@ -0,0 +1,107 @@
+import os
+import subprocess
+
+import keopscore.config.config
+from keopscore.config.config import (
+    get_build_folder,
+    get_enable_compile,
+    get_use_precompiled_header,
+)
+from keopscore.utils.code_gen_utils import c_include, get_hash_name
+from keopscore.utils.misc_utils import (
+    KeOps_Message,
+    file_lock,
+    tmp_file_name,
+    write_file_atomically,
+)
+
+###########################################################
+# Precompiled header for the Cpu formulas : the code of every formula starts with the
+# same standard headers (and OpenMP, and the KeOps headers for the ranges scheme),
+# which are parsed once, in a precompiled header located in the build folder. It is
+# identified by the compiler and the compile flags, and given to the compiler with
+# the -include option : if it can not be used (e.g. the compiler has changed), the
+# compiler simply parses the header itself.
+
+standard_headers = [
+    "cmath",
+    "cstdint",
+    "cstring",
+    "stdlib.h",
+    "stdarg.h",
+    "vector",
+    "string",
+    "iostream",
+]
+
+keops_headers = [
+    "include/Sizes.h",
+    "include/ranges_utils.h",
+    "include/Ranges.h",
+    "include/half_storage.h",
+]
+
+# headers which could not be precompiled in this process
+failed_headers = set()
+
+
+def get_prologue_code():
+    headers = list(standard_headers)
+    if keopscore.config.config.use_OpenMP:
+        headers.append("omp.h")
+    # all formulas are generated with C_CONTIGUOUS 1, which is used by Sizes.h
+    return (
+        "#define C_CONTIGUOUS 1\n"
+        + c_include(*headers)
+        + "".join(f'#include "{header}"\n' for header in keops_headers)
+    )
+
+
+def get_precompiled_header(profile_flags=""):
+    """
+    Returns the path of the precompiled header for the compile flags of a build
+    profile, which is built if needed, or None if precompiled headers are disabled
+    or could not be built.
+    """
+    if not get_use_precompiled_header():
+        return None
+    cxx_compiler = keopscore.config.config.cxx_compiler
+    cpp_flags = keopscore.config.config.cpp_flags + profile_flags
+    code = get_prologue_code()
+    header = os.path.join(
+        get_build_folder(),
+        f"keops_cpu_prologue_{get_hash_name(cxx_compiler, cpp_flags, code)}.h",
+    )
+    if os.path.exists(header + ".gch"):
+        return header
+    if header in failed_headers or not get_enable_compile():
+        return None
+    # the header is written before the precompiled header, which is renamed when
+    # complete : both exist when the precompiled header is ready.
+    with file_lock(header + ".lock"):
+        if not os.path.exists(header + ".gch"):
+            KeOps_Message("Precompiling Cpu headers ... ", flush=True, end="")
+            write_file_atomically(header, code)
+            tmpname = tmp_file_name(header + ".gch")
+            res = subprocess.run(
+                f"{cxx_compiler} {cpp_flags} -x c++-header {header} -o {tmpname}",
+                shell=True,
+                capture_output=True,
+            )
+            if res.returncode != 0 or not os.path.exists(tmpname):
+                KeOps_Message(
+                    "failed, formulas are compiled without it.", use_tag=False
+                )
+                failed_headers.add(header)
+                if os.path.exists(tmpname):
+                    os.remove(tmpname)
+                return None
+            os.replace(tmpname, header + ".gch")
+            KeOps_Message("OK", use_tag=False, flush=True)
+    return header
+
+
+def get_precompiled_header_flags(profile_flags=""):
+    # compile flags using the precompiled header, if any
+    header = get_precompiled_header(profile_flags)
+    return "" if header is None else f" -include {header}"
@@ -107,3 +107,10 @@ class Gpu_link_compile(LinkCompile):
             ),
         )
         KeOps_Message("OK", use_tag=False, flush=True)
+
+
+# the cuda libraries are loaded, and the jit compiler engine built, when the Gpu
+# binder is first needed (and not at the import of keopscore)
+keopscore.config.config.init_cudalibs()
+if not os.path.exists(jit_compile_dll()):
+    Gpu_link_compile.compile_jit_compile_dll()
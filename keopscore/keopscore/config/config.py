@@ -1,15 +1,22 @@
 import os
 from os.path import join
+import hashlib
+import json
 import shutil
+import threading
 from ctypes import CDLL, RTLD_GLOBAL
 import keopscore
 from ctypes.util import find_library
-from keopscore.utils.misc_utils import KeOps_Warning, KeOps_Error
+from keopscore.utils.misc_utils import (
+    KeOps_Warning,
+    KeOps_Error,
+    write_file_atomically,
+)
 import platform, sys
 
-# global parameters can be set here :
-use_cuda = True  # use cuda if possible
-use_OpenMP = True  # use OpenMP if possible (see function set_OpenMP below)
+# global parameters can be set here, or by the user before the first compilation :
+# use_cuda = False  # use cuda if possible (default True, see probe_cuda below)
+# use_OpenMP = False  # use OpenMP if possible (default True, see probe_cpp_flags below)
 
 # System Path
 base_dir_path = os.path.abspath(join(os.path.dirname(os.path.realpath(__file__)), ".."))
@@ -29,9 +36,6 @@ if specific_gpus:
     default_build_folder_name += "_CUDA_VISIBLE_DEVICES_" + specific_gpus
 default_build_path = join(keops_cache_folder, default_build_folder_name)
 
-# init cache folder
-os.makedirs(keops_cache_folder, exist_ok=True)
-
 
 # build path setter/getter
 
@@ -52,22 +56,26 @@ def set_build_folder(
             path = default_build_path
 
     # create the folder if not yet done
-    os.makedirs(path, exist_ok=True)
-
-    # _build_path contains the current build folder path (or None if not yet set). We need
-    # to remove this _build_path from the sys.path, replace the value of _build_path
-    # and update the sys.path
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        # read-only file system : the folder can only contain precompiled formulas
+        pass
+
+    # _build_path contains the current build folder path (or None if not yet set).
+    # N.B. the build folder is not added to sys.path : modules are loaded from their path.
     global _build_path
-    if _build_path in sys.path:
-        sys.path.remove(_build_path)
     _build_path = path
-    sys.path.append(path)
 
     # saving the location of the build path in a file
     if write_save_file:
-        f = open(save_file, "w")
-        f.write(path)
-        f.close()
+        try:
+            os.makedirs(keops_cache_folder, exist_ok=True)
+            f = open(save_file, "w")
+            f.write(path)
+            f.close()
+        except OSError:
+            pass
 
     # reset all cached formulas if needed
     if reset_all:
@@ -82,95 +90,279 @@ def set_build_folder(
                 Gpu_link_compile.compile_jit_compile_dll()
 
 
-set_build_folder(read_save_file=True, write_save_file=False, reset_all=False)
-
-
 def get_build_folder():
+    # the build folder is set at first use : by default, the location saved in the
+    # save file (or the default build path)
+    if _build_path is None:
+        set_build_folder(read_save_file=True, write_save_file=False, reset_all=False)
     return _build_path
 
 
-jit_binary = join(_build_path, "keops_nvrtc.so")
+# compilation of new formulas ; when it is disabled (e.g. when using a precompiled
+# bundle without compiler, see pykeops.load_bundle), formulas which are not
+# in the build folder raise an error.
+enable_compile = os.getenv("KEOPS_ENABLE_COMPILE") != "0"
+
+
+def get_enable_compile():
+    global enable_compile
+    return enable_compile
+
+
+def set_enable_compile(val):
+    global enable_compile
+    if val == 1:
+        enable_compile = True
+    elif val == 0:
+        enable_compile = False
+
+
+# precompiled header for the shared prologue of the Cpu formulas (standard headers,
+# OpenMP and the KeOps headers), see keopscore/binders/cpp/precompiled_header.py
+use_precompiled_header = os.getenv("KEOPS_PRECOMPILED_HEADER") != "0"
+
+
+def get_use_precompiled_header():
+    global use_precompiled_header
+    return use_precompiled_header
+
+
+def set_use_precompiled_header(val):
+    global use_precompiled_header
+    if val == 1:
+        use_precompiled_header = True
+    elif val == 0:
+        use_precompiled_header = False
+
+
+# size cap of the build folder : when it contains more than build_folder_max_formulas
+# formulas, or more than build_folder_max_size megabytes of formula files, the least
+# recently used formulas are removed (see keopscore/utils/build_cache.py).
+# The value 0 means no cap.
+build_folder_max_size = float(os.getenv("KEOPS_BUILD_FOLDER_MAX_SIZE", "0"))
+build_folder_max_formulas = int(os.getenv("KEOPS_BUILD_FOLDER_MAX_FORMULAS", "0"))
+
+
+def get_build_folder_max_size():
+    global build_folder_max_size
+    return build_folder_max_size
+
+
+def set_build_folder_max_size(val):
+    global build_folder_max_size
+    build_folder_max_size = val
+
+
+def get_build_folder_max_formulas():
+    global build_folder_max_formulas
+    return build_folder_max_formulas
+
+
+def set_build_folder_max_formulas(val):
+    global build_folder_max_formulas
+    build_folder_max_formulas = val
+
+
+# build profiles : named sets of compile flags which are added to cpp_flags for
+# compiling the Cpu formulas. The profile is chosen globally (set_build_profile, or
+# the KEOPS_BUILD_PROFILE environment variable) or for each reduction (option
+# build_profile of Genred), and every profile has its own compiled modules.
+build_profiles = {
+    # the default flags, for modules which can be used on any machine of the same
+    # architecture (e.g. in a precompiled bundle)
+    "portable": "",
+    # the instruction set of the current machine
+    "native": " -march=native",
+    # infinities are kept, since they are used by Min and Max reductions
+    "native-fast-math": " -march=native -ffast-math -fno-finite-math-only",
+    # profile guided optimization : the modules are first built with instrumentation,
+    # and built again with the profile of their first call (GCC only)
+    "pgo": " -march=native",
+}
+
+build_profile = os.getenv("KEOPS_BUILD_PROFILE", "portable")
+
+
+def get_build_profile():
+    global build_profile
+    return build_profile
+
+
+def set_build_profile(val="portable"):
+    global build_profile
+    if val not in build_profiles:
+        KeOps_Error(
+            f"unknown build profile {val}, should be one of {', '.join(build_profiles)}."
+        )
+    build_profile = val
+
+
+def get_profile_flags(profile=None):
+    # compile flags added to cpp_flags for the build profile
+    profile = profile or build_profile
+    if profile not in build_profiles:
+        KeOps_Error(
+            f"unknown build profile {profile}, should be one of {', '.join(build_profiles)}."
+        )
+    return build_profiles[profile]
+
+
+compile_options = " -shared -fPIC -O3 -std=c++11"
+
+disable_pragma_unrolls = True
+
 
-# Compiler
-cxx_compiler = os.getenv("CXX")
-if cxx_compiler is None:
-    cxx_compiler = "g++"
-if shutil.which(cxx_compiler) is None:
-    KeOps_Warning(
-        """
+###########################################################
+# Probes of the environment : the compiler, the OpenMP support and the cuda
+# libraries are only looked for when a compilation or a launch first needs them,
+# i.e. when one of the attributes listed in lazy_probes is first accessed
+# (see __getattr__ below), so that importing keopscore stays fast.
+# The results of the probes which do not depend on the current process are
+# stored in the build folder, in a file identified by a fingerprint of the
+# environment, and read by the next processes.
+
+probe_lock = threading.RLock()
+probe_results = {}
+
+
+def env_fingerprint():
+    env = [keopscore.__version__, sys.executable, platform.uname()]
+    env += [
+        os.getenv(var)
+        for var in (
+            "PATH",
+            "LD_LIBRARY_PATH",
+            "DYLD_LIBRARY_PATH",
+            "CXX",
+            "CUDA_PATH",
+            "CUDA_HOME",
+            "CUDA_VISIBLE_DEVICES",
+        )
+    ]
+    if os.path.exists("/etc/ld.so.cache"):
+        # updated when shared libraries are installed
+        env.append(os.path.getmtime("/etc/ld.so.cache"))
+    return hashlib.sha256(str(env).encode("utf-8")).hexdigest()[:10]
+
+
+def probes_file():
+    return join(get_build_folder(), f"env_probes_{env_fingerprint()}.json")
+
+
+def cached_probe(name, fun):
+    # returns fun(), which is computed once for the environment
+    path = probes_file()
+    if path not in probe_results:
+        try:
+            with open(path) as f:
+                probe_results[path] = json.load(f)
+        except (OSError, ValueError):
+            probe_results[path] = {}
+    results = probe_results[path]
+    if name not in results:
+        results[name] = fun()
+        try:
+            write_file_atomically(path, json.dumps(results))
+        except OSError:
+            pass
+    return results[name]
+
+
+def probe_compiler():
+    global cxx_compiler
+    # Compiler
+    cxx = os.getenv("CXX")
+    if cxx is None:
+        cxx = "g++"
+    if cached_probe("which_" + cxx, lambda: shutil.which(cxx)) is None:
+        KeOps_Warning(
+            """
     The default C++ compiler could not be found on your system.
     You need to either define the CXX environment variable or a symlink to the g++ command.
     For example if g++-8 is the command you can do
       import os
       os.environ['CXX'] = 'g++-8'
     """
-    )
+        )
+    cxx_compiler = cxx
 
 
-compile_options = " -shared -fPIC -O3 -std=c++11"
+def probe_openmp_darwin():
+    import subprocess, importlib
 
+    res = subprocess.run(
+        'echo "#include <omp.h>" | g++ -E - -o /dev/null',
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        shell=True,
+    )
 
-# cpp options
-if platform.system() == "Darwin":
-    cpp_flags = compile_options + " -flto"
-else:
-    cpp_flags = compile_options + " -flto=auto"
+    if res.returncode != 0:
+        return None, "omp.h header is not in the path, disabling OpenMP."
+    # we try to import either mkl or numpy, because it will load
+    # the shared libraries for OpenMP.
+    import importlib.util
+
+    if importlib.util.find_spec("mkl"):
+        import mkl
+    elif importlib.util.find_spec("numpy"):
+        import numpy
+    # Now we can look if one of libmkl_rt, libomp and/or libiomp is loaded.
+    pid = os.getpid()
+    loaded_libs = {}
+    for lib in ["libomp", "libiomp", "libmkl_rt"]:
+        res = subprocess.run(
+            f"lsof -p {pid} | grep {lib}", stdout=subprocess.PIPE, shell=True
+        )
+        loaded_libs[lib] = (
+            os.path.dirname(res.stdout.split(b" ")[-1]).decode("utf-8")
+            if res.returncode == 0
+            else None
+        )
+    if loaded_libs["libmkl_rt"]:
+        return f' -Xclang -fopenmp -lmkl_rt -L{loaded_libs["libmkl_rt"]}', None
+    elif loaded_libs["libiomp"]:
+        return f' -Xclang -fopenmp -liomp5 -L{loaded_libs["libiomp"]}', None
+    elif loaded_libs["libomp"]:
+        return f' -Xclang -fopenmp -lomp -L{loaded_libs["libomp"]}', None
+    else:
+        return None, "OpenMP shared libraries not loaded, disabling OpenMP."
 
-disable_pragma_unrolls = True
 
-# OpenMP setting
-# adds compile flags for OpenMP support.
-if use_OpenMP:
+def probe_cpp_flags():
+    global cpp_flags, use_OpenMP
+    # cpp options
     if platform.system() == "Darwin":
-        import subprocess, importlib
-
-        res = subprocess.run(
-            'echo "#include <omp.h>" | g++ -E - -o /dev/null',
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.PIPE,
-            shell=True,
-        )
-        
-        if res.returncode != 0:
-            KeOps_Warning("omp.h header is not in the path, disabling OpenMP.")
-            use_OpenMP = False
-        else:
-            # we try to import either mkl or numpy, because it will load
-            # the shared libraries for OpenMP.
-            import importlib.util
-
-            if importlib.util.find_spec("mkl"):
-                import mkl
-            elif importlib.util.find_spec("numpy"):
-                import numpy
-            # Now we can look if one of libmkl_rt, libomp and/or libiomp is loaded.
-            pid = os.getpid()
-            loaded_libs = {}
-            for lib in ["libomp", "libiomp", "libmkl_rt"]:
-                res = subprocess.run(
-                    f"lsof -p {pid} | grep {lib}", stdout=subprocess.PIPE, shell=True
-                )
-                loaded_libs[lib] = (
-                    os.path.dirname(res.stdout.split(b" ")[-1]).decode("utf-8")
-                    if res.returncode == 0
-                    else None
-                )
-            if loaded_libs["libmkl_rt"]:
-                cpp_flags += f' -Xclang -fopenmp -lmkl_rt -L{loaded_libs["libmkl_rt"]}'
-            elif loaded_libs["libiomp"]:
-                cpp_flags += f' -Xclang -fopenmp -liomp5 -L{loaded_libs["libiomp"]}'
-            elif loaded_libs["libomp"]:
-                cpp_flags += f' -Xclang -fopenmp -lomp -L{loaded_libs["libomp"]}'
-            else:
-                KeOps_Warning("OpenMP shared libraries not loaded, disabling OpenMP.")
-                use_OpenMP = False
+        flags = compile_options + " -flto"
     else:
-        cpp_flags += " -fopenmp -fno-fat-lto-objects"
+        flags = compile_options + " -flto=auto"
+
+    # OpenMP setting
+    # adds compile flags for OpenMP support.
+    # a value of use_OpenMP set before the probe disables OpenMP if False
+    openmp = globals().get("use_OpenMP", True)
+    if openmp:
+        if platform.system() == "Darwin":
+            openmp_flags, warning = cached_probe("openmp_darwin", probe_openmp_darwin)
+            if openmp_flags is None:
+                KeOps_Warning(warning)
+                openmp = False
+            else:
+                flags += openmp_flags
+        else:
+            flags += " -fopenmp -fno-fat-lto-objects"
+
+    if platform.system() == "Darwin":
+        flags += " -undefined dynamic_lookup"
+
+    cpp_flags = flags + " -I" + bindings_source_dir
+    use_OpenMP = openmp
 
-if platform.system() == "Darwin":
-    cpp_flags += " -undefined dynamic_lookup"
 
-cpp_flags += " -I" + bindings_source_dir
+def get_cpp_flags_key():
+    # compile flags identifying the compiled formulas : the include path of keopscore
+    # is ignored, so that a build folder can be used with another installation.
+    return keopscore.config.config.cpp_flags.replace(" -I" + bindings_source_dir, "")
 
 
 def find_and_try_library(libtag):
@@ -186,56 +378,104 @@ def find_and_try_library(libtag):
 
 
 cuda_dependencies = ["cuda", "nvrtc"]
-if all([find_and_try_library(lib) for lib in cuda_dependencies]):
-    # N.B. calling get_gpu_props issues a warning if cuda is not available, so we do not add another warning here
-    from keopscore.utils.gpu_utils import (
-        get_gpu_props,
-    )  # N.B. this import should be kept inside the if statement
-
-    cuda_available = get_gpu_props()[0] > 0
-else:
-    cuda_available = False
-    KeOps_Warning(
-        "Cuda libraries were not detected on the system or could not be loaded ; using cpu only mode"
-    )
 
-if not use_cuda and cuda_available:
-    KeOps_Warning(
-        "Cuda appears to be available on your system, but use_cuda is set to False in config.py. Using cpu only mode"
-    )
 
-if use_cuda and not cuda_available:
-    use_cuda = False
+def probe_cuda():
+    global cuda_available, use_cuda
+    global cuda_version, libcuda_folder, libnvrtc_folder, nvrtc_flags, nvrtc_include
+    global cuda_include_path, jit_source_file, jit_source_header, jit_binary
 
-if use_cuda:
-    from keopscore.utils.gpu_utils import (
-        libcuda_folder,
-        libnvrtc_folder,
-        get_cuda_include_path,
-        get_cuda_version,
-    )
+    if all(
+        cached_probe("library_" + lib, lambda: find_and_try_library(lib))
+        for lib in cuda_dependencies
+    ):
+        # N.B. calling get_gpu_props issues a warning if cuda is not available, so we do not add another warning here
+        from keopscore.utils.gpu_utils import (
+            get_gpu_props,
+        )  # N.B. this import should be kept inside the if statement
+
+        cuda_available = get_gpu_props()[0] > 0
+    else:
+        cuda_available = False
+        KeOps_Warning(
+            "Cuda libraries were not detected on the system or could not be loaded ; using cpu only mode"
+        )
 
-    cuda_version = get_cuda_version()
-    nvrtc_flags = (
-        compile_options
-        + f" -fpermissive -L{libcuda_folder} -L{libnvrtc_folder} -lcuda -lnvrtc"
+    # a value of use_cuda set before the probe disables cuda if False
+    try_cuda = globals().get("use_cuda", True)
+    if not try_cuda and cuda_available:
+        KeOps_Warning(
+            "Cuda appears to be available on your system, but use_cuda is set to False in config.py. Using cpu only mode"
+        )
+
+    use_cuda = try_cuda and cuda_available
+
+    if use_cuda:
+        from keopscore.utils.gpu_utils import (
+            libcuda_folder,
+            libnvrtc_folder,
+            get_cuda_include_path,
+            get_cuda_version,
+        )
+
+        cuda_version = get_cuda_version()
+        nvrtc_flags = (
+            compile_options
+            + f" -fpermissive -L{libcuda_folder} -L{libnvrtc_folder} -lcuda -lnvrtc"
+        )
+        nvrtc_include = " -I" + bindings_source_dir
+        cuda_include_path = get_cuda_include_path()
+        if cuda_include_path:
+            nvrtc_include += " -I" + cuda_include_path
+        jit_source_file = join(base_dir_path, "binders", "nvrtc", "keops_nvrtc.cpp")
+        jit_source_header = join(base_dir_path, "binders", "nvrtc", "keops_nvrtc.h")
+        jit_binary = join(get_build_folder(), "keops_nvrtc.so")
+    else:
+        cuda_version = None
+        libcuda_folder = None
+        libnvrtc_folder = None
+        nvrtc_flags = None
+        nvrtc_include = None
+        cuda_include_path = None
+        jit_source_file = None
+        jit_source_header = None
+        jit_binary = None
+
+
+lazy_probes = {
+    "cxx_compiler": probe_compiler,
+    "cpp_flags": probe_cpp_flags,
+    "use_OpenMP": probe_cpp_flags,
+}
+lazy_probes.update(
+    dict.fromkeys(
+        (
+            "cuda_available",
+            "use_cuda",
+            "cuda_version",
+            "libcuda_folder",
+            "libnvrtc_folder",
+            "nvrtc_flags",
+            "nvrtc_include",
+            "cuda_include_path",
+            "jit_source_file",
+            "jit_source_header",
+            "jit_binary",
+        ),
+        probe_cuda,
     )
-    nvrtc_include = " -I" + bindings_source_dir
-    cuda_include_path = get_cuda_include_path()
-    if cuda_include_path:
-        nvrtc_include += " -I" + cuda_include_path
-    jit_source_file = join(base_dir_path, "binders", "nvrtc", "keops_nvrtc.cpp")
-    jit_source_header = join(base_dir_path, "binders", "nvrtc", "keops_nvrtc.h")
-else:
-    cuda_version = None
-    libcuda_folder = None
-    libnvrtc_folder = None
-    nvrtc_flags = None
-    nvrtc_include = None
-    cuda_include_path = None
-    jit_source_file = None
-    jit_source_header = None
-    jit_binary = None
+)
+
+
+def __getattr__(name):
+    # called for the attributes which are not yet defined, i.e. before the probe
+    if name in lazy_probes:
+        with probe_lock:
+            if name not in globals():
+                lazy_probes[name]()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 init_cudalibs_flag = False
 
@@ -0,0 +1,60 @@
+# cache-blocked (tiled) computation scheme for Cpu reductions
+
+enable_tiles = True
+
+
+def get_enable_tiles():
+    global enable_tiles
+    return enable_tiles
+
+
+def set_enable_tiles(val):
+    global enable_tiles
+    if val == 1:
+        enable_tiles = True
+    elif val == 0:
+        enable_tiles = False
+
+
+# number of "i" rows which share each block of "j" variables loaded in cache
+tile_i = 32
+
+# target size (in bytes) of the contiguous buffer holding a block of "j" variables ;
+# it should fit in the L1/L2 cache of a single core.
+tile_j_bytes = 32768
+
+
+def get_tile_sizes(dimy, sizeof_dtype):
+    global tile_i, tile_j_bytes
+    tile_j = max(1, tile_j_bytes // max(1, dimy * sizeof_dtype))
+    return tile_i, tile_j
+
+
+# vectorized evaluation of the formula over "lanes" of consecutive "j" indices
+# inside each block (CpuReduc_simd). The number of lanes is chosen at build time
+# from the SIMD width of the target architecture.
+enable_simd = False
+
+
+def get_enable_simd():
+    global enable_simd
+    return enable_simd
+
+
+def set_enable_simd(val):
+    global enable_simd
+    if val == 1:
+        enable_simd = True
+    elif val == 0:
+        enable_simd = False
+
+
+def get_cpu_scheme():
+    # Cpu 1D computation scheme given by the flags above : "simd", "tiled" or "1D".
+    # It is an argument of get_keops_dll, so that a scheme may also be requested
+    # for a given reduction (e.g. by the autotuner of pykeops).
+    if get_enable_simd():
+        return "simd"
+    elif get_enable_tiles():
+        return "tiled"
+    return "1D"
@@ -3,3 +3,31 @@
 
 def Grad_WithSavedForward(red_formula, v, gradin, f0):
     return red_formula.DiffT(v, gradin, f0)
+
+
+# gradients with respect to several variables vs, computed by a single reduction whose
+# output is the concatenation of the gradients (in the order of vs). The gradients should
+# be sum reductions over the same index, i.e. the variables should all be indexed by i
+# or parameters, or all be indexed by j. This saves the loops over i and j, and the
+# loads of the variables, of the separate reductions ; but the formula of every gradient
+# is kept as is in the Concat, so the subexpressions shared by several gradients are
+# still evaluated once per gradient.
+
+
+def GradConcat_WithSavedForward(red_formula, vs, gradin, f0):
+    from keopscore.formulas.maths.Concat import Concat
+    from keopscore.formulas.reductions.Sum_Reduction import Sum_Reduction
+    from keopscore.utils.misc_utils import KeOps_Error
+
+    grads = [red_formula.DiffT(v, gradin, f0) for v in vs]
+    if not all(
+        isinstance(grad, Sum_Reduction) and grad.tagI == grads[0].tagI
+        for grad in grads
+    ):
+        KeOps_Error(
+            "GradConcat_WithSavedForward requires gradients which are sum reductions over the same index."
+        )
+    formula = grads[0].formula
+    for grad in grads[1:]:
+        formula = Concat(formula, grad.formula)
+    return Sum_Reduction(formula, grads[0].tagI)
@@ -1,2 +1,2 @@
 from .Grad import Grad
-from .Grad_WithSavedForward import Grad_WithSavedForward
+from .Grad_WithSavedForward import Grad_WithSavedForward, GradConcat_WithSavedForward
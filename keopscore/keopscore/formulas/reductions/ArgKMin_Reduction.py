@@ -20,13 +20,12 @@ class ArgKMin_Reduction(KMin_ArgKMin_Reduction):
 
     def FinalizeOutput(self, acc, out, i):
         fdim = self.formula.dim
+        acc_val, acc_ind, s = self.halves(acc)
         p = c_variable("int", new_c_varname("p"))
         loop, k = c_for_loop(0, fdim, 1, pragma_unroll=True)
         body = p.declare_assign(k)
-        inner_loop, l = c_for_loop(
-            k, k + 2 * self.K * fdim, 2 * fdim, pragma_unroll=True
-        )
-        body += inner_loop(out[p].assign(acc[l + fdim]) + p.add_assign(fdim))
+        inner_loop, l = c_for_loop(k, k + self.K * s, s, pragma_unroll=True)
+        body += inner_loop(out[p].assign(acc_ind[l]) + p.add_assign(fdim))
         return loop(body)
         outer_body
 
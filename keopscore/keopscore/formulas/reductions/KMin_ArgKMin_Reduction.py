@@ -7,6 +7,7 @@ from keopscore.utils.code_gen_utils import (
     new_c_varname,
     c_if,
     c_array,
+    c_array_pair,
     use_pragma_unroll,
 )
 from keopscore.formulas.reductions.Reduction import Reduction
@@ -30,47 +31,76 @@ class KMin_ArgKMin_Reduction(Reduction):
 
         # We work with a (values,indices) vector
         self.dimred = self.dim  # dimension of inner reduction variables
+        self.dimind = K * formula.dim
+
+    def halves(self, acc):
+        # returns the arrays of values and of indices of the accumulator (or output)
+        # acc, and the offset between two consecutive minimal values of a dimension in
+        # these arrays : values and indices are interleaved in a single array, or
+        # stored in the two arrays of a c_array_pair (see MapReduce.split_indices).
+        fdim = self.formula.dim
+        if isinstance(acc, c_array_pair):
+            return acc.vals, acc.inds, fdim
+        inds = c_array(acc.dtype, acc.dim - fdim, f"({acc.id}+{fdim})")
+        return acc, inds, 2 * fdim
 
     def InitializeReduction(self, acc):
         # Returns C++ code to be used at initialization phase of the reduction.
         if acc.dtype == "half2":
             KeOps_Error("not implemented")
         fdim, K = self.formula.dim, self.K
+        acc_val, acc_ind, s = self.halves(acc)
         outer_loop, k = c_for_loop(0, fdim, 1, pragma_unroll=True)
-        inner_loop, l = c_for_loop(k, k + (2 * K * fdim), 2 * fdim, pragma_unroll=True)
+        inner_loop, l = c_for_loop(k, k + K * s, s, pragma_unroll=True)
         return outer_loop(
             inner_loop(
-                acc[l].assign(infinity(acc.dtype)) + acc[l + fdim].assign(c_zero_float)
+                acc_val[l].assign(infinity(acc.dtype))
+                + acc_ind[l].assign(c_zero_float)
             )
         )
 
     def ReducePair(self, acc, xi):
         # Returns C++ code that implements the update phase of the reduction.
         dtype = xi.dtype
-        fdim = self.formula.dim
-        out = c_array(dtype, self.dimred, new_c_varname("out"))
+        fdim, K = self.formula.dim, self.K
+        if isinstance(acc, c_array_pair):
+            out = c_array_pair(
+                c_array(dtype, acc.vals.dim, new_c_varname("out")),
+                c_array(acc.inds.dtype, acc.inds.dim, new_c_varname("out_ind")),
+            )
+        else:
+            out = c_array(dtype, self.dimred, new_c_varname("out"))
+        acc_val, acc_ind, s = self.halves(acc)
+        xi_val, xi_ind, t = self.halves(xi)
+        out_val, out_ind, _ = self.halves(out)
         outer_loop, k = c_for_loop(0, fdim, 1)
         p = c_variable("int", new_c_varname("p"))
         q = c_variable("int", new_c_varname("q"))
-        inner_loop, l = c_for_loop(k, self.dimred, 2 * fdim)
+        inner_loop, l = c_for_loop(k, k + K * s, s)
         inner_body = c_if(
-            xi[p] < acc[q],
-            out[l].assign(xi[p])
-            + out[l + fdim].assign(xi[p + fdim])
-            + p.add_assign(2 * fdim),
-            out[l].assign(acc[q])
-            + out[l + fdim].assign(acc[q + fdim])
-            + q.add_assign(2 * fdim),
+            xi_val[p] < acc_val[q],
+            out_val[l].assign(xi_val[p])
+            + out_ind[l].assign(xi_ind[p])
+            + p.add_assign(t),
+            out_val[l].assign(acc_val[q])
+            + out_ind[l].assign(acc_ind[q])
+            + q.add_assign(s),
         )
         outer_body = p.declare_assign(k) + q.declare_assign(k) + inner_loop(inner_body)
-        final_loop, k = c_for_loop(0, self.dimred, 1)
+        final_outer_loop, k = c_for_loop(0, fdim, 1)
+        final_inner_loop, l = c_for_loop(k, k + K * s, s)
+        final_body = acc_val[l].assign(out_val[l]) + acc_ind[l].assign(out_ind[l])
         return (
-            out.declare() + outer_loop(outer_body) + final_loop(acc[k].assign(out[k]))
+            out.declare()
+            + outer_loop(outer_body)
+            + final_outer_loop(final_inner_loop(final_body))
         )
 
     def ReducePairShort(self, acc, xi, ind):
         fdim, K = self.formula.dim, self.K
-        dtype = xi.dtype
+        acc_val, acc_ind, s = self.halves(acc)
+        # local copies of the values use the precision of the accumulator
+        dtype = acc_val.dtype
 
         xik = c_variable(dtype, new_c_varname("xik"))
         l = c_variable("int", new_c_varname("l"))
@@ -85,16 +115,30 @@ class KMin_ArgKMin_Reduction(Reduction):
                         for(int {k.id}=0; {k.id}<{fdim}; {k.id}++) {{
                             {xik.assign(xi[k])}
                             {use_pragma_unroll()}                 
-                            for({l.id}={(k+(K-1)*2*fdim).id}; {l.id}>={k.id} && {(xik<acc[l]).id}; {l.id}-={2*fdim}) {{
-                                {tmpl.declare_assign(acc[l])}
-                                {indtmpl.declare_assign(acc[l+fdim])}
-                                {acc[l].assign(xik)}
-                                {acc[l+fdim].assign(ind)}                      
-                                if({l.id}<{(k+(2*fdim*(K-1))).id}) {{
-                                    {acc[l+2*fdim].assign(tmpl)}
-                                    {acc[l+2*fdim+fdim].assign(indtmpl)}
+                            for({l.id}={(k+(K-1)*s).id}; {l.id}>={k.id} && {(xik<acc_val[l]).id}; {l.id}-={s}) {{
+                                {tmpl.declare_assign(acc_val[l])}
+                                {indtmpl.declare_assign(acc_ind[l])}
+                                {acc_val[l].assign(xik)}
+                                {acc_ind[l].assign(ind)}                      
+                                if({l.id}<{(k+(s*(K-1))).id}) {{
+                                    {acc_val[l+s].assign(tmpl)}
+                                    {acc_ind[l+s].assign(indtmpl)}
                                 }}
                             }}
                         }}
                     }}
                 """
+
+    def FinalizeOutput(self, acc, out, i):
+        fdim, K = self.formula.dim, self.K
+        acc_val, acc_ind, s = self.halves(acc)
+        out_val, out_ind, t = self.halves(out)
+        p = c_variable("int", new_c_varname("p"))
+        outer_loop, k = c_for_loop(0, fdim, 1, pragma_unroll=True)
+        inner_loop, l = c_for_loop(k, k + K * s, s, pragma_unroll=True)
+        body = (
+            out_val[p].assign(acc_val[l])
+            + out_ind[p].assign(acc_ind[l])
+            + p.add_assign(t)
+        )
+        return outer_loop(p.declare_assign(k) + inner_loop(body))
@@ -20,6 +20,7 @@ class KMin_Reduction(KMin_ArgKMin_Reduction):
     def __init__(self, formula, K, tagIJ):
         super().__init__(formula, K, tagIJ)
         self.dim = K * formula.dim
+        self.dimind = 0
 
     def FinalizeOutput(self, acc, out, i):
         fdim, K = self.formula.dim, self.K
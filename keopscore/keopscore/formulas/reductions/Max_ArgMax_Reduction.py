@@ -16,4 +16,7 @@ class Max_ArgMax_Reduction(Max_ArgMax_Reduction_Base):
         self.dim = 2 * formula.dim
 
     def FinalizeOutput(self, acc, out, i):
-        return VectCopy(out, acc)
+        dim = self.formula.dim
+        acc_val, acc_ind = acc.split(dim, dim)
+        out_val, out_ind = out.split(dim, dim)
+        return VectCopy(out_val, acc_val) + VectCopy(out_ind, acc_ind)
@@ -16,4 +16,7 @@ class Min_ArgMin_Reduction(Min_ArgMin_Reduction_Base):
         self.dim = 2 * formula.dim
 
     def FinalizeOutput(self, acc, out, i):
-        return VectCopy(out, acc)
+        dim = self.formula.dim
+        acc_val, acc_ind = acc.split(dim, dim)
+        out_val, out_ind = out.split(dim, dim)
+        return VectCopy(out_val, acc_val) + VectCopy(out_ind, acc_ind)
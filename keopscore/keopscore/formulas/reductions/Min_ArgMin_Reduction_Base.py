@@ -1,4 +1,6 @@
 from keopscore.utils.code_gen_utils import (
+    cast_to,
+    c_variable,
     infinity,
     c_zero_float,
     VectApply,
@@ -16,6 +18,7 @@ class Min_ArgMin_Reduction_Base(Reduction):
 
         # We work with a (values,indices) vector
         self.dimred = 2 * formula.dim  # dimension of inner reduction variables
+        self.dimind = formula.dim
 
     def InitializeReduction(self, acc):
         # Returns C++ code to be used at initialization phase of the reduction.
@@ -27,6 +30,9 @@ class Min_ArgMin_Reduction_Base(Reduction):
         # Subroutine of ReducePairShort and ReducePair methods.
         if xi.dtype == "half2":
             KeOps_Error("not implemented")
+        if xi.dtype != acc_val.dtype:
+            # values of the formula compared with a higher precision accumulator
+            xi = c_variable(acc_val.dtype, cast_to(acc_val.dtype, xi))
         return c_if(xi < acc_val, acc_val.assign(xi) + acc_ind.assign(ind))
 
     def ReducePair(self, acc, xi):
@@ -34,7 +40,7 @@ class Min_ArgMin_Reduction_Base(Reduction):
         dim = self.formula.dim
         acc_val, acc_ind = acc.split(dim, dim)
         xi_val, xi_ind = xi.split(dim, dim)
-        return VectApply(self.ReducePairScalar, acc_val, xi_val, xi_ind)
+        return VectApply(self.ReducePairScalar, acc_val, acc_ind, xi_val, xi_ind)
 
     def ReducePairShort(self, acc, xi, ind):
         if xi.dtype == "half2":
@@ -5,6 +5,12 @@ from keopscore.utils.Tree import Tree
 class Reduction(Tree):
     """Base class for all KeOps final reductions over a formula"""
 
+    # number of indices in the output of the reduction (e.g. for argmin). On Gpu,
+    # indices are encoded as floating point numbers in the accumulator and in the
+    # output array ; on Cpu, they are stored in separate integer arrays of dimension
+    # dimind (see MapReduce.split_indices).
+    dimind = 0
+
     def __init__(self, formula, tagI):
         """- formula is an object of type Operation, it is the formula on which we apply a reduction
         - tagI : 0 or 1, specifies wether we do the reduction over "i"-indexed or "j"-indexed variables.
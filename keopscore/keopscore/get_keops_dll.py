@@ -2,12 +2,14 @@
 This is the main entry point for all binders. It takes as inputs :
   - map_reduce_id : string naming the type of map-reduce scheme to be used : either "CpuReduc", "GpuReduc1D_FromDevice", ...
   - red_formula_string : string expressing the formula, such as "Sum_Reduction((Exp(Minus(Sum(Square((Var(0,3,0) / Var(1,3,1)))))) * Var(2,1,1)),0)",
-  - enable_chunks : -1, 0 or 1, for Gpu mode only, enable special routines for high dimensions (-1 means automatic setting)
-  - enable_finalchunks : -1, 0 or 1, for Gpu mode only, enable special routines for final operation in high dimensions (-1 means automatic setting)
-  - mul_var_highdim : -1, 0 or 1, for Gpu mode only, another option for special routines of final operation in high dimensions (-1 means automatic setting)
+  - enable_chunks : -1, 0 or 1, for Gpu mode and CpuReduc only, enable special routines for high dimensions (-1 means automatic setting)
+  - enable_finalchunks : -1, 0 or 1, for Gpu mode and CpuReduc only, enable special routines for final operation in high dimensions (-1 means automatic setting)
+  - mul_var_highdim : -1, 0 or 1, for Gpu mode and CpuReduc only, another option for special routines of final operation in high dimensions (-1 means automatic setting)
+  - cpu_scheme : "1D", "tiled" or "simd", for CpuReduc only, computation scheme of the reduction (see keopscore.config.tiles.get_cpu_scheme)
   - aliases : list of strings expressing the aliases list, which may be empty,
   - nargs : integer specifying the number of arguments for the call to the routine,
-  - dtype : string specifying the float type of the arguments  "float", "double" or "half")
+  - dtype : string specifying the float type of the arguments  "float", "double" or "half2" ; for Cpu mode it can also be
+            "keops_half" or "keops_bfloat16" (half precision storage, with computations in float))
   - dtypeacc : string specifying the float type of the accumulator of the reduction ("float", "double" or "half")
   - sum_scheme_string : string specifying the type of accumulation for summation reductions : either "direct_sum", "block_sum" or "kahan_scheme".
   - tagHostDevice : 0 or 1, for Gpu mode only, use indicates whether data is stored on Host (0) or Gpu Device (1)
@@ -15,6 +17,8 @@ This is the main entry point for all binders. It takes as inputs :
   - tag1D2D : 0 or 1, for Gpu mode only, use 1D (0) or 2D (1) computation map-reduce scheme
   - use_half : 0 or 1, for Gpu mode only, enable special routines for half-precision data type
   - device_id : integer, for Gpu mode only, id of Gpu device to build the code for
+  - strided_args : tuple of integers, for Cpu mode only, indices of the arguments which are not contiguous ;
+            their row and column strides are given at runtime.
 
 It returns
       - tag : string, hash code used as id for the input formula and parameters
@@ -42,12 +46,13 @@ It returns
 
 It can be used as a Python function or as a standalone Python script (in which case it prints the outputs):
   - example (as Python function) :
-      get_keops_dll("CpuReduc", "Sum_Reduction((Exp(Minus(Sum(Square((Var(0,3,0) / Var(1,3,1)))))) * Var(2,1,1)),0)", 0, 0, 0, [], 3, "float", "float", "block_sum", 0, 0, 0, 0, 0)
+      get_keops_dll("CpuReduc", "Sum_Reduction((Exp(Minus(Sum(Square((Var(0,3,0) / Var(1,3,1)))))) * Var(2,1,1)),0)", 0, 0, 0, "tiled", [], 3, "float", "float", "block_sum", 0, 0, 0, 0, 0, ())
   - example (as Python script) :
-      python get_keops_dll.py CpuReduc "Sum_Reduction((Exp(Minus(Sum(Square((Var(0,3,0) / Var(1,3,1)))))) * Var(2,1,1)),0)" 0 0 0 "[]" 3 float float block_sum 0 0 0 0 0
+      python get_keops_dll.py CpuReduc "Sum_Reduction((Exp(Minus(Sum(Square((Var(0,3,0) / Var(1,3,1)))))) * Var(2,1,1)),0)" 0 0 0 tiled "[]" 3 float float block_sum 0 0 0 0 0 "()"
 """
 import inspect
 import sys
+import threading
 
 import keopscore.config.config
 from keopscore.config.config import get_build_folder
@@ -65,33 +70,56 @@ from keopscore.formulas import Zero_Reduction, Sum_Reduction
 from keopscore.formulas.GetReduction import GetReduction
 from keopscore.formulas.variables.Zero import Zero
 from keopscore.utils.Cache import Cache
-from keopscore.utils.code_gen_utils import KeOps_Error
+from keopscore.utils.code_gen_utils import KeOps_Error, half_storage_dtypes
 
 # Get every classes in mapreduce
 map_reduce = dict(inspect.getmembers(keopscore.mapreduce, inspect.isclass))
 
 
-def get_keops_dll_impl(
+# the code generation sets global options (e.g. set_enable_chunk), and may be run by
+# several threads (e.g. the compile pool of pykeops) : it is serialized by this lock
+codegen_lock = threading.RLock()
+
+
+def get_keops_dll_impl(*args):
+    with codegen_lock:
+        return generate_keops_dll(*args)
+
+
+def generate_keops_dll(
     map_reduce_id,
     red_formula_string,
     enable_chunks,
     enable_finalchunks,
     mul_var_highdim,
+    cpu_scheme,
     aliases,
     *args,
 ):
     # detecting the need for special chunked computation modes :
     use_chunk_mode = 0
-    if "Gpu" in map_reduce_id:
-        if not keopscore.config.config.use_cuda:
-            KeOps_Error(
-                "You selected a Gpu reduce scheme but KeOps is in Cpu only mode."
-            )
+    if "Gpu" in map_reduce_id and not keopscore.config.config.use_cuda:
+        KeOps_Error("You selected a Gpu reduce scheme but KeOps is in Cpu only mode.")
+    # half precision storage and strided arrays on Cpu require local copies of the
+    # variables, which are only made by the cache-blocked and ranges schemes.
+    local_copies = args[1] in half_storage_dtypes or len(args[-1]) > 0
+    if local_copies and map_reduce_id == "CpuReduc2D":
+        map_reduce_id = "CpuReduc"
+    if local_copies and map_reduce_id == "CpuReducFull":
+        KeOps_Error(
+            "reductions over both i and j are only implemented for contiguous float32 or float64 arrays."
+        )
+    if "Gpu" in map_reduce_id or (map_reduce_id == "CpuReduc" and not local_copies):
+        sum_scheme_string = args[3]
         set_enable_chunk(enable_chunks)
         set_enable_finalchunk(enable_finalchunks)
         set_mult_var_highdim(mul_var_highdim)
         red_formula = GetReduction(red_formula_string, aliases)
-        if use_final_chunks(red_formula) and map_reduce_id != "GpuReduc2D":
+        if (
+            use_final_chunks(red_formula)
+            and map_reduce_id != "GpuReduc2D"
+            and ("Gpu" in map_reduce_id or sum_scheme_string != "kahan_scheme")
+        ):
             use_chunk_mode = 2
             map_reduce_id += "_finalchunks"
         elif get_enable_chunk() and map_reduce_id != "GpuReduc2D":
@@ -104,6 +132,13 @@ def get_keops_dll_impl(
                 if not chk.chunk_postchunk_mix:
                     use_chunk_mode = 1
                     map_reduce_id += "_chunks"
+    if map_reduce_id == "CpuReduc":
+        if cpu_scheme == "simd":
+            # cache-blocked scheme with vectorized evaluation over "j" lanes
+            map_reduce_id += "_simd"
+        elif cpu_scheme == "tiled" or local_copies:
+            # cache-blocked scheme for Cpu reductions
+            map_reduce_id += "_tiled"
     # Instantiation of
     map_reduce_class = map_reduce[map_reduce_id]
 
@@ -163,6 +198,7 @@ if __name__ == "__main__":
         "enable_chunks": int,
         "enable_finalchunks": int,
         "mul_var_highdim": int,
+        "cpu_scheme": str,
         "aliases": list,
         "nargs": int,
         "dtype": str,
@@ -173,6 +209,7 @@ if __name__ == "__main__":
         "tag1D2D": int,
         "use_half": int,
         "device_id": int,
+        "strided_args": tuple,
     }
 
     if len(argv) != len(argdict):
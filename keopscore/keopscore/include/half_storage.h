@@ -0,0 +1,78 @@
+#pragma once
+
+// Half precision storage types for the Cpu backend : float16 and bfloat16 values
+// are stored on 16 bits, but are converted to float for every computation.
+// Conversions from float use the round-to-nearest-even rule.
+
+#include <cstdint>
+#include <cstring>
+
+inline float keops_bits_to_float(uint32_t u) {
+    float f;
+    std::memcpy(&f, &u, sizeof(float));
+    return f;
+}
+
+inline uint32_t keops_float_to_bits(float f) {
+    uint32_t u;
+    std::memcpy(&u, &f, sizeof(float));
+    return u;
+}
+
+struct keops_half {
+    uint16_t bits;
+
+    keops_half() = default;
+
+    keops_half(float f) {
+        uint32_t u = keops_float_to_bits(f);
+        uint32_t sign = (u >> 16) & 0x8000u;
+        uint32_t absu = u & 0x7fffffffu;
+        if (absu >= 0x7f800000u) {
+            // infinity or NaN (NaN stays quiet)
+            bits = (uint16_t)(sign | 0x7c00u | (absu > 0x7f800000u ? 0x200u : 0u));
+        } else if (absu >= 0x477ff000u) {
+            // too large : rounds to infinity
+            bits = (uint16_t)(sign | 0x7c00u);
+        } else if (absu < 0x38800000u) {
+            // subnormal float16 (or zero) : the float is rescaled so that
+            // the addition performs the rounding at the right position
+            float r = keops_bits_to_float(absu) + 0.5f;
+            bits = (uint16_t)(sign | (keops_float_to_bits(r) - 0x3f000000u));
+        } else {
+            uint32_t mant_odd = (absu >> 13) & 1u;
+            absu += 0xc8000fffu + mant_odd;  // rebias exponent and round
+            bits = (uint16_t)(sign | (absu >> 13));
+        }
+    }
+
+    operator float() const {
+        uint32_t sign = (uint32_t)(bits & 0x8000u) << 16;
+        uint32_t expo = (bits >> 10) & 0x1fu;
+        uint32_t mant = bits & 0x3ffu;
+        if (expo == 0x1fu)
+            return keops_bits_to_float(sign | 0x7f800000u | (mant << 13));
+        if (expo == 0) {
+            // zero or subnormal float16 : mant * 2^-24
+            float r = (float)mant * 5.9604644775390625e-8f;
+            return sign ? -r : r;
+        }
+        return keops_bits_to_float(sign | ((expo + 112u) << 23) | (mant << 13));
+    }
+};
+
+struct keops_bfloat16 {
+    uint16_t bits;
+
+    keops_bfloat16() = default;
+
+    keops_bfloat16(float f) {
+        uint32_t u = keops_float_to_bits(f);
+        if ((u & 0x7fffffffu) > 0x7f800000u)
+            bits = (uint16_t)((u >> 16) | 0x40u);  // quiet NaN
+        else
+            bits = (uint16_t)((u + 0x7fffu + ((u >> 16) & 1u)) >> 16);
+    }
+
+    operator float() const { return keops_bits_to_float((uint32_t)bits << 16); }
+};
@@ -1,6 +1,13 @@
 from keopscore.formulas.reductions import *
 from keopscore.formulas.GetReduction import GetReduction
-from keopscore.utils.code_gen_utils import Var_loader, new_c_varname, pointer, c_include
+from keopscore.utils.code_gen_utils import (
+    Var_loader,
+    new_c_varname,
+    pointer,
+    c_array_pair,
+    c_include,
+    half_storage_dtypes,
+)
 
 
 class MapReduce:
@@ -21,14 +28,25 @@ class MapReduce:
         tag1D2D,
         use_half,
         device_id,
+        strided_args=(),
     ):
         self.red_formula_string = red_formula_string
         self.aliases = aliases
 
         self.red_formula = GetReduction(red_formula_string, aliases=aliases)
 
+        if dtype in half_storage_dtypes:
+            # half precision storage (Cpu only) : input and output arrays are read
+            # and written in this type, while all local variables are floats.
+            self.dtype_storage, dtype = dtype, "float"
+        else:
+            self.dtype_storage = dtype
         self.dtype = dtype
         self.dtypeacc = dtypeacc
+        # on Cpu, the indices of the reductions with indices (argmin, ...) are
+        # accumulated as integers, and written in the int64 output array out_ind, while
+        # their values are written in the output array out.
+        self.split_indices = tagCpuGpu == 0 and self.red_formula.dimind > 0
         self.nargs = nargs
         self.sum_scheme_string = sum_scheme_string
         self.tagHostDevice, self.tagCpuGpu, self.tag1D2D = (
@@ -38,7 +56,9 @@ class MapReduce:
         )
         self.use_half = use_half
         self.device_id = device_id
-        self.varloader = Var_loader(self.red_formula)
+        # indices of the input arrays which are not contiguous (Cpu only)
+        self.strided_args = tuple(strided_args)
+        self.varloader = Var_loader(self.red_formula, self.strided_args)
 
     def get_code(self):
         self.headers = "#define C_CONTIGUOUS 1\n"
@@ -49,6 +69,12 @@ class MapReduce:
         else:
             self.headers += "#define USE_HALF 0\n"
 
+        if self.dtype_storage != self.dtype:
+            self.headers += '#include "include/half_storage.h"\n'
+
+        if self.tagCpuGpu == 0:
+            self.headers += c_include("cstdint")
+
         red_formula = self.red_formula
         formula = red_formula.formula
         dtype = self.dtype
@@ -66,10 +92,64 @@ class MapReduce:
         self.param_loc = c_array(dtype, self.varloader.dimp, "param_loc")
 
         argname = new_c_varname("arg")
-        self.arg = c_variable(pointer(pointer(dtype)), argname)
+        self.arg = c_variable(pointer(pointer(self.dtype_storage)), argname)
         self.args = [self.arg[k] for k in range(nargs)]
 
-        self.acc = c_array(dtypeacc, red_formula.dimred, "acc")
-        self.acctmp = c_array(dtypeacc, red_formula.dimred, "acctmp")
+        self.acc = self.accumulator("acc")
+        self.acctmp = self.accumulator("acctmp")
         self.fout = c_array(dtype, formula.dim, "fout")
-        self.outi = c_array(dtype, red_formula.dim, f"(out + i * {red_formula.dim})")
+        self.outi = self.output_array(red_formula.dim)
+
+    def accumulator(self, name):
+        # returns the accumulator of the reduction, named name : with split_indices,
+        # it is the pair of the values and of the indices, stored in the int array
+        # name_ind, so that the indices are exact whatever the precision of the values.
+        red_formula = self.red_formula
+        if not self.split_indices:
+            return c_array(self.dtypeacc, red_formula.dimred, name)
+        dimind = red_formula.dimind
+        return c_array_pair(
+            c_array(self.dtypeacc, red_formula.dimred - dimind, name),
+            c_array("int", dimind, f"{name}_ind"),
+        )
+
+    def output_array(self, dim):
+        # returns the c_array pointing to the output of the reduction for index i :
+        # with split_indices, the indices are written in out_ind, and the output is the
+        # pair of the values and of the indices (or the indices only, e.g. for argmin).
+        if not self.split_indices:
+            return c_array(self.dtype_storage, dim, f"(out + i * {dim})")
+        dimind = self.red_formula.dimind
+        out_ind = c_array("int64_t", dimind, f"(out_ind + i * {dimind})")
+        if dim == dimind:
+            return out_ind
+        dimval = dim - dimind
+        return c_array_pair(
+            c_array(self.dtype_storage, dimval, f"(out + i * {dimval})"), out_ind
+        )
+
+    def accumulator_buffer(self, acc, name, size):
+        # returns C++ code declaring the buffer name, which contains size accumulators
+        # of the type of acc (see accumulator) : with split_indices, the indices are
+        # stored in the buffer name_ind.
+        code = ""
+        for array, suffix in zip(accumulator_arrays(acc), ("", "_ind")):
+            code += f"""
+                std::vector< {array.dtype} > {name}{suffix}_v({size} * {max(array.dim, 1)});
+                {array.dtype} *{name}{suffix} = {name}{suffix}_v.data();
+            """
+        return code
+
+    def accumulator_pointer(self, acc, buffer, index):
+        # returns C++ code declaring acc (see accumulator) as a pointer to the
+        # accumulator number index of the buffer (see accumulator_buffer)
+        code = ""
+        for array, suffix in zip(accumulator_arrays(acc), ("", "_ind")):
+            code += f"{array.dtype} *{array.id} = {buffer}{suffix} + ({index}) * {array.dim};\n"
+        return code
+
+
+def accumulator_arrays(acc):
+    # arrays of an accumulator : the array of values, and the array of indices
+    # with split_indices
+    return [acc.vals, acc.inds] if isinstance(acc, c_array_pair) else [acc]
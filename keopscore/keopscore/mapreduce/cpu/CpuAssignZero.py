@@ -35,7 +35,7 @@ class CpuAssignZero(MapReduce, Cpu_link_compile):
 {self.headers}
 
 template < typename TYPE >
-int AssignZeroCpu_{self.gencode_filename}(int nx, int ny, TYPE* out,  TYPE **{arg.id}) {{
+int AssignZeroCpu_{self.gencode_filename}(int nx, int ny, TYPE* out, int64_t* out_ind, TYPE **{arg.id}) {{
     #pragma omp parallel for
     for (int i = 0; i < nx; i++) {{
         {outi.assign(c_zero_float)}
@@ -47,7 +47,7 @@ int AssignZeroCpu_{self.gencode_filename}(int nx, int ny, TYPE* out,  TYPE **{ar
 #include <vector>
 
 template < typename TYPE >
-int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, TYPE **arg) {{
+int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, int64_t *out_ind, TYPE **arg) {{
 
     if (tagI==1) {{
         int tmp = ny;
@@ -55,7 +55,7 @@ int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, TY
         nx = tmp;
     }}
 
-    return AssignZeroCpu_{self.gencode_filename}< TYPE > (nx, ny, out, arg);
+    return AssignZeroCpu_{self.gencode_filename}< TYPE > (nx, ny, out, out_ind, arg);
 
 }}
 
@@ -72,12 +72,13 @@ int launch_keops_cpu_{self.gencode_filename}(int dimY,
                                          int dimout,
                                          std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
                                          int **ranges,
-                                         std::vector< int > shapeout, TYPE *out,
+                                         std::vector< int > shapeout, TYPE *out, int64_t *out_ind,
                                          TYPE **arg,
-                                         std::vector< std::vector< int > > argshape) {{
+                                         std::vector< std::vector< int > > argshape,
+                                         int *argstrides) {{
 
 
-    return launch_keops_{self.gencode_filename}< TYPE > (nx, ny, tagI, out, arg);
+    return launch_keops_{self.gencode_filename}< TYPE > (nx, ny, tagI, out, out_ind, arg);
 
 }}
 
@@ -42,7 +42,7 @@ class CpuReduc(MapReduce, Cpu_link_compile):
         self.code = f"""
 {self.headers}
 template < typename TYPE > 
-int CpuConv_{self.gencode_filename}(int nx, int ny, TYPE* out, TYPE **{arg.id}) {{
+int CpuConv_{self.gencode_filename}(int nx, int ny, TYPE* out, int64_t* out_ind, TYPE **{arg.id}) {{
     #pragma omp parallel for
     for (int i = 0; i < nx; i++) {{
         {fout.declare()}
@@ -67,7 +67,7 @@ int CpuConv_{self.gencode_filename}(int nx, int ny, TYPE* out, TYPE **{arg.id})
 #include <vector>
 
 template < typename TYPE > 
-int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, TYPE **arg) {{
+int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, int64_t *out_ind, TYPE **arg) {{
     
     if (tagI==1) {{
         int tmp = ny;
@@ -75,7 +75,7 @@ int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, TY
         nx = tmp;
     }}
     
-    return CpuConv_{self.gencode_filename}< TYPE >(nx, ny, out, arg);
+    return CpuConv_{self.gencode_filename}< TYPE >(nx, ny, out, out_ind, arg);
 
 }}
 template < typename TYPE >
@@ -91,12 +91,13 @@ int launch_keops_cpu_{self.gencode_filename}(int dimY,
                                              int dimout,
                                              std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
                                              int **ranges,
-                                             std::vector< int > shapeout, TYPE *out,
+                                             std::vector< int > shapeout, TYPE *out, int64_t *out_ind,
                                              TYPE **arg,
-                                             std::vector< std::vector< int > > argshape) {{
+                                             std::vector< std::vector< int > > argshape,
+                                             int *argstrides) {{
 
     
-    return launch_keops_{self.gencode_filename} < TYPE >(nx, ny, tagI, out, arg);
+    return launch_keops_{self.gencode_filename} < TYPE >(nx, ny, tagI, out, out_ind, arg);
 
 }}
                 """
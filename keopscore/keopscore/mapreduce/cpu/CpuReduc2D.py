@@ -0,0 +1,159 @@
+from keopscore import debug_ops_at_exec
+from keopscore.binders.cpp.Cpu_link_compile import Cpu_link_compile
+from keopscore.mapreduce.cpu.CpuAssignZero import CpuAssignZero
+from keopscore.mapreduce.MapReduce import MapReduce
+from keopscore.utils.code_gen_utils import c_include
+import keopscore
+
+
+class CpuReduc2D(MapReduce, Cpu_link_compile):
+    """
+    class for generating the final C++ code, Cpu version with 2D scheme :
+    the reduction index "j" is split into one contiguous range per thread,
+    each thread computing partial accumulators for a block of "i" indices.
+    The partial results are then merged with the ReducePair method of the reduction
+    (this is the Cpu counterpart of GpuReduc2D, useful when nx is small compared
+    to the number of threads).
+    """
+
+    AssignZero = CpuAssignZero
+
+    # number of "i" indices processed at each step ; it bounds the size of the
+    # buffer of partial accumulators (nthreads * BLOCK_I * dimred values).
+    block_i = 1024
+
+    def __init__(self, *args):
+        MapReduce.__init__(self, *args)
+        Cpu_link_compile.__init__(self)
+        self.dimy = self.varloader.dimy
+
+    def get_code(self):
+        super().get_code()
+
+        i = self.i
+        j = self.j
+        red_formula = self.red_formula
+        fout = self.fout
+        outi = self.outi
+        arg = self.arg
+        args = self.args
+        table = self.varloader.direct_table(args, i, j)
+        sum_scheme = self.sum_scheme
+
+        acc = self.acc
+        acc_t = self.accumulator("acc_t")
+        index = "(size_t)tid * BLOCK_I + (i - istart)"
+
+        headers = ["cmath", "stdlib.h", "vector"]
+        if keopscore.config.config.use_OpenMP:
+            headers.append("omp.h")
+        if debug_ops_at_exec:
+            headers.append("iostream")
+        self.headers += c_include(*headers)
+
+        self.code = f"""
+{self.headers}
+
+#define BLOCK_I {self.block_i}
+
+template < typename TYPE >
+int CpuConv2D_{self.gencode_filename}(int nx, int ny, TYPE* out, int64_t* out_ind, TYPE **{arg.id}) {{
+    int nthreads = 1;
+    #ifdef _OPENMP
+    nthreads = omp_get_max_threads();
+    #endif
+    if (nthreads > ny)
+        nthreads = (ny > 0) ? ny : 1;
+
+    // partial accumulators : one slot per thread and per "i" index of the current block
+    {self.accumulator_buffer(acc, "acc_buf", "(size_t)nthreads * BLOCK_I")}
+
+    for (int istart = 0; istart < nx; istart += BLOCK_I) {{
+        int iend = (istart + BLOCK_I < nx) ? istart + BLOCK_I : nx;
+
+        // number of threads of the team : OpenMP may start less than nthreads
+        // threads (dynamic adjustment, nested parallelism, thread limit...)
+        int nteam = 1;
+
+        #pragma omp parallel num_threads(nthreads)
+        {{
+            int tid = 0, nthreads_team = 1;
+            #ifdef _OPENMP
+            tid = omp_get_thread_num();
+            nthreads_team = omp_get_num_threads();
+            #endif
+            #pragma omp master
+            nteam = nthreads_team;
+            // contiguous range of "j" indices handled by this thread
+            int jstart = (int)(((long)ny * tid) / nthreads_team);
+            int jend = (int)(((long)ny * (tid + 1)) / nthreads_team);
+
+            {fout.declare()}
+            {sum_scheme.declare_temporary_accumulator()}
+            for (int i = istart; i < iend; i++) {{
+                {self.accumulator_pointer(acc, "acc_buf", index)}
+                {red_formula.InitializeReduction(acc)}
+                {sum_scheme.initialize_temporary_accumulator()}
+                for (int j = jstart; j < jend; j++) {{
+                    {red_formula.formula(fout,table)}
+                    {sum_scheme.accumulate_result(acc, fout, j)}
+                    {sum_scheme.periodic_accumulate_temporary(acc, j)}
+                }}
+                {sum_scheme.final_operation(acc)}
+            }}
+        }}
+
+        // merge the partial results of all threads
+        #pragma omp parallel for
+        for (int i = istart; i < iend; i++) {{
+            int tid = 0;
+            {self.accumulator_pointer(acc, "acc_buf", index)}
+            for (tid = 1; tid < nteam; tid++) {{
+                {self.accumulator_pointer(acc_t, "acc_buf", index)}
+                {red_formula.ReducePair(acc, acc_t)}
+            }}
+            {red_formula.FinalizeOutput(acc, outi, i)}
+        }}
+    }}
+    return 0;
+}}
+                    """
+
+        self.code += f"""
+#include "stdarg.h"
+
+template < typename TYPE >
+int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, int64_t *out_ind, TYPE **arg) {{
+
+    if (tagI==1) {{
+        int tmp = ny;
+        ny = nx;
+        nx = tmp;
+    }}
+
+    return CpuConv2D_{self.gencode_filename}< TYPE >(nx, ny, out, out_ind, arg);
+
+}}
+template < typename TYPE >
+int launch_keops_cpu_{self.gencode_filename}(int dimY,
+                                             int nx,
+                                             int ny,
+                                             int tagI,
+                                             int tagZero,
+                                             int use_half,
+                                             int dimred,
+                                             int use_chunk_mode,
+                                             std::vector< int > indsi, std::vector< int > indsj, std::vector< int > indsp,
+                                             int dimout,
+                                             std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
+                                             int **ranges,
+                                             std::vector< int > shapeout, TYPE *out, int64_t *out_ind,
+                                             TYPE **arg,
+                                             std::vector< std::vector< int > > argshape,
+                                             int *argstrides) {{
+
+
+    return launch_keops_{self.gencode_filename} < TYPE >(nx, ny, tagI, out, out_ind, arg);
+
+}}
+                """
@@ -0,0 +1,148 @@
+from keopscore import debug_ops_at_exec
+from keopscore.binders.cpp.Cpu_link_compile import Cpu_link_compile
+from keopscore.mapreduce.MapReduce import MapReduce
+from keopscore.utils.code_gen_utils import c_array, c_include
+import keopscore
+
+
+class CpuReducFull(MapReduce, Cpu_link_compile):
+    """
+    class for generating the final C++ code, Cpu version of the reductions over both
+    "i" and "j" indices : the "i" indices are split into one contiguous range per
+    thread, each thread accumulating the values of the formula for all the pairs
+    (i,j) of its range in a single accumulator. The partial results are then merged
+    with the ReducePair method of the reduction, and the output is a single row.
+    """
+
+    def __init__(self, *args):
+        MapReduce.__init__(self, *args)
+        Cpu_link_compile.__init__(self)
+        self.dimy = self.varloader.dimy
+
+    def get_code(self):
+        super().get_code()
+
+        i = self.i
+        j = self.j
+        red_formula = self.red_formula
+        dtypeacc = self.dtypeacc
+        dimred = red_formula.dimred
+        fout = self.fout
+        outi = self.outi
+        arg = self.arg
+        args = self.args
+        table = self.varloader.direct_table(args, i, j)
+        sum_scheme = self.sum_scheme
+
+        acc = c_array(dtypeacc, dimred, "acc")
+        acc_t = c_array(dtypeacc, dimred, "acc_t")
+
+        headers = ["cmath", "stdlib.h", "vector"]
+        if keopscore.config.config.use_OpenMP:
+            headers.append("omp.h")
+        if debug_ops_at_exec:
+            headers.append("iostream")
+        self.headers += c_include(*headers)
+
+        self.code = f"""
+{self.headers}
+
+template < typename TYPE >
+int CpuConvFull_{self.gencode_filename}(int nx, int ny, TYPE* out, int64_t* out_ind, TYPE **{arg.id}) {{
+    int nthreads = 1;
+    #ifdef _OPENMP
+    nthreads = omp_get_max_threads();
+    #endif
+    if (nthreads > nx)
+        nthreads = (nx > 0) ? nx : 1;
+
+    // partial accumulators : one per thread
+    std::vector< {dtypeacc} > acc_buf_v((size_t)nthreads * {max(dimred, 1)});
+    {dtypeacc} *acc_buf = acc_buf_v.data();
+
+    // number of threads of the team : OpenMP may start less than nthreads
+    // threads (dynamic adjustment, nested parallelism, thread limit...)
+    int nteam = 1;
+
+    #pragma omp parallel num_threads(nthreads)
+    {{
+        int tid = 0, nthreads_team = 1;
+        #ifdef _OPENMP
+        tid = omp_get_thread_num();
+        nthreads_team = omp_get_num_threads();
+        #endif
+        #pragma omp master
+        nteam = nthreads_team;
+        // contiguous range of "i" indices handled by this thread
+        int istart = (int)(((long)nx * tid) / nthreads_team);
+        int iend = (int)(((long)nx * (tid + 1)) / nthreads_team);
+
+        {fout.declare()}
+        {dtypeacc} *acc = acc_buf + (size_t)tid * {dimred};
+        {sum_scheme.declare_temporary_accumulator()}
+        {red_formula.InitializeReduction(acc)}
+        {sum_scheme.initialize_temporary_accumulator()}
+        for (int i = istart; i < iend; i++) {{
+            for (int j = 0; j < ny; j++) {{
+                {red_formula.formula(fout,table)}
+                {sum_scheme.accumulate_result(acc, fout, j)}
+                {sum_scheme.periodic_accumulate_temporary(acc, j)}
+            }}
+        }}
+        {sum_scheme.final_operation(acc)}
+    }}
+
+    // merge the partial results of all threads
+    {dtypeacc} *acc = acc_buf;
+    for (int tid = 1; tid < nteam; tid++) {{
+        {dtypeacc} *acc_t = acc_buf + (size_t)tid * {dimred};
+        {red_formula.ReducePair(acc, acc_t)}
+    }}
+    int i = 0;
+    {red_formula.FinalizeOutput(acc, outi, i)}
+    return 0;
+}}
+                    """
+
+        self.code += f"""
+#include "stdarg.h"
+
+template < typename TYPE >
+int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, int64_t *out_ind, TYPE **arg) {{
+
+    if (tagI==1) {{
+        int tmp = ny;
+        ny = nx;
+        nx = tmp;
+    }}
+
+    return CpuConvFull_{self.gencode_filename}< TYPE >(nx, ny, out, out_ind, arg);
+
+}}
+template < typename TYPE >
+int launch_keops_cpu_{self.gencode_filename}(int dimY,
+                                             int nx,
+                                             int ny,
+                                             int tagI,
+                                             int tagZero,
+                                             int use_half,
+                                             int dimred,
+                                             int use_chunk_mode,
+                                             std::vector< int > indsi, std::vector< int > indsj, std::vector< int > indsp,
+                                             int dimout,
+                                             std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
+                                             int **ranges,
+                                             std::vector< int > shapeout, TYPE *out, int64_t *out_ind,
+                                             TYPE **arg,
+                                             std::vector< std::vector< int > > argshape,
+                                             int *argstrides) {{
+
+
+    return launch_keops_{self.gencode_filename} < TYPE >(nx, ny, tagI, out, out_ind, arg);
+
+}}
+                """
+
+
+# the formulas equal to zero are computed by the same scheme, which writes a single row
+CpuReducFull.AssignZero = CpuReducFull
@@ -0,0 +1,160 @@
+from keopscore import debug_ops_at_exec
+from keopscore.binders.cpp.Cpu_link_compile import Cpu_link_compile
+from keopscore.config.chunks import dimchunk
+from keopscore.mapreduce.Chunk_Mode_Constants import Chunk_Mode_Constants
+from keopscore.mapreduce.cpu.CpuAssignZero import CpuAssignZero
+from keopscore.mapreduce.MapReduce import MapReduce
+from keopscore.utils.code_gen_utils import c_array, c_include, c_variable, value
+import keopscore
+
+
+class CpuReduc_chunks(MapReduce, Cpu_link_compile):
+    """
+    class for generating the final C++ code, Cpu version for high dimensional formulas :
+    for each pair (i,j), the chunkable part of the formula (e.g. a squared distance)
+    is evaluated by pieces of dimchunk coordinates, which are read directly from the
+    input arrays, so that no local copy of the high dimensional variables is needed.
+    """
+
+    AssignZero = CpuAssignZero
+
+    def __init__(self, *args):
+        MapReduce.__init__(self, *args)
+        Cpu_link_compile.__init__(self)
+        self.chk = Chunk_Mode_Constants(self.red_formula)
+        self.dimy = self.chk.dimy
+
+    def chunk_table(self, nminargs, dimchunk_curr=None, chunk=None):
+        # table of pointers to the input arrays ; chunked variables point to
+        # the current chunk of their row, other variables to their full row.
+        chk = self.chk
+        tagI, tagJ = self.red_formula.tagI, self.red_formula.tagJ
+        row_index = {tagI: self.i.id, tagJ: self.j.id, 2: "0"}
+        vars_notchunked = [
+            *chk.varsi_notchunked,
+            *chk.varsj_notchunked,
+            *chk.varsp_notchunked,
+        ]
+        vars_chunked = [*chk.varsi_chunked, *chk.varsj_chunked, *chk.varsp_chunked]
+        res = [None] * nminargs
+        for v in vars_notchunked:
+            arg = self.args[v.ind]
+            res[v.ind] = c_array(
+                value(arg.dtype), v.dim, f"({arg.id}+{row_index[v.cat]}*{v.dim})"
+            )
+        if chunk is not None:
+            for v in vars_chunked:
+                arg = self.args[v.ind]
+                res[v.ind] = c_array(
+                    value(arg.dtype),
+                    dimchunk_curr,
+                    f"({arg.id}+{row_index[v.cat]}*{chk.dim_org}+{chunk.id}*{dimchunk})",
+                )
+        return res
+
+    def get_code(self):
+        super().get_code()
+
+        red_formula = self.red_formula
+        dtype = self.dtype
+        chk = self.chk
+
+        i = self.i
+        j = self.j
+        arg = self.arg
+        sum_scheme = self.sum_scheme
+
+        acc = self.accumulator("acc")
+        fout_chunk = c_array(dtype, chk.dimout_chunk, "fout_chunk")
+        fout_tmp_chunk = c_array(dtype, chk.fun_chunked.dim, "fout_tmp_chunk")
+        fout_tmp = c_array(dtype, chk.dimfout, "fout_tmp")
+        outi = self.output_array(chk.dimout)
+
+        chunk = c_variable("int", "chunk")
+        last_chunk = c_variable("int", f"{chk.nchunks - 1}")
+        table_chunk = self.chunk_table(chk.nminargs, dimchunk, chunk)
+        table_lastchunk = self.chunk_table(chk.nminargs, chk.dimlastchunk, last_chunk)
+        # the post-chunk formula takes the accumulated chunks as extra variable
+        table_out = self.chunk_table(chk.nminargs + 1)
+        table_out[chk.nminargs] = fout_chunk
+
+        headers = ["cmath", "stdlib.h"]
+        if keopscore.config.config.use_OpenMP:
+            headers.append("omp.h")
+        if debug_ops_at_exec:
+            headers.append("iostream")
+        self.headers += c_include(*headers)
+
+        self.code = f"""
+{self.headers}
+template < typename TYPE >
+int CpuConv_chunks_{self.gencode_filename}(int nx, int ny, TYPE* out, int64_t* out_ind, TYPE **{arg.id}) {{
+    #pragma omp parallel for
+    for (int i = 0; i < nx; i++) {{
+        {fout_chunk.declare()}
+        {fout_tmp_chunk.declare()}
+        {fout_tmp.declare()}
+        {acc.declare()}
+        {sum_scheme.declare_temporary_accumulator()}
+        {red_formula.InitializeReduction(acc)}
+        {sum_scheme.initialize_temporary_accumulator()}
+        for (int j = 0; j < ny; j++) {{
+            {chk.fun_chunked.initacc_chunk(fout_chunk)}
+            // looping on chunks (except the last)
+            for (int chunk = 0; chunk < {chk.nchunks - 1}; chunk++) {{
+                {chk.fun_chunked(fout_tmp_chunk, table_chunk)}
+                {chk.fun_chunked.acc_chunk(fout_chunk, fout_tmp_chunk)}
+            }}
+            // last chunk
+            {chk.fun_lastchunked(fout_tmp_chunk, table_lastchunk)}
+            {chk.fun_chunked.acc_chunk(fout_chunk, fout_tmp_chunk)}
+            {chk.fun_postchunk(fout_tmp, table_out)}
+            {sum_scheme.accumulate_result(acc, fout_tmp, j)}
+            {sum_scheme.periodic_accumulate_temporary(acc, j)}
+        }}
+        {sum_scheme.final_operation(acc)}
+        {red_formula.FinalizeOutput(acc, outi, i)}
+    }}
+    return 0;
+}}
+                    """
+
+        self.code += f"""
+#include "stdarg.h"
+#include <vector>
+
+template < typename TYPE >
+int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, int64_t *out_ind, TYPE **arg) {{
+
+    if (tagI==1) {{
+        int tmp = ny;
+        ny = nx;
+        nx = tmp;
+    }}
+
+    return CpuConv_chunks_{self.gencode_filename}< TYPE >(nx, ny, out, out_ind, arg);
+
+}}
+template < typename TYPE >
+int launch_keops_cpu_{self.gencode_filename}(int dimY,
+                                             int nx,
+                                             int ny,
+                                             int tagI,
+                                             int tagZero,
+                                             int use_half,
+                                             int dimred,
+                                             int use_chunk_mode,
+                                             std::vector< int > indsi, std::vector< int > indsj, std::vector< int > indsp,
+                                             int dimout,
+                                             std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
+                                             int **ranges,
+                                             std::vector< int > shapeout, TYPE *out, int64_t *out_ind,
+                                             TYPE **arg,
+                                             std::vector< std::vector< int > > argshape,
+                                             int *argstrides) {{
+
+
+    return launch_keops_{self.gencode_filename} < TYPE >(nx, ny, tagI, out, out_ind, arg);
+
+}}
+                """
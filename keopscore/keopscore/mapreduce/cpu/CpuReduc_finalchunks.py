@@ -0,0 +1,150 @@
+from keopscore import debug_ops_at_exec
+from keopscore.binders.cpp.Cpu_link_compile import Cpu_link_compile
+from keopscore.config.chunks import dimfinalchunk
+from keopscore.formulas.reductions.Sum_Reduction import Sum_Reduction
+from keopscore.mapreduce.cpu.CpuAssignZero import CpuAssignZero
+from keopscore.mapreduce.MapReduce import MapReduce
+from keopscore.utils.code_gen_utils import (
+    c_array,
+    c_include,
+    c_variable,
+    Var_loader,
+)
+from keopscore.utils.misc_utils import KeOps_Error
+import keopscore
+
+
+class CpuReduc_finalchunks(MapReduce, Cpu_link_compile):
+    """
+    class for generating the final C++ code, Cpu version for formulas of the type
+    sum_j k(x_i,y_j)*b_j with high dimensional b_j : the scalar values k(x_i,y_j) are
+    computed once for a block of "j" indices, and then multiplied with b_j by chunks
+    of dimfinalchunk coordinates, accumulating directly into the output.
+    """
+
+    AssignZero = CpuAssignZero
+
+    # number of "j" indices for which the values k(x_i,y_j) are stored
+    block_j = 1024
+
+    def __init__(self, *args):
+        MapReduce.__init__(self, *args)
+        Cpu_link_compile.__init__(self)
+        self.dimy = self.varloader.dimy
+
+    def get_code(self):
+        super().get_code()
+
+        dtype = self.dtype
+        dtypeacc = self.dtypeacc
+        i = self.i
+        j = self.j
+        arg = self.arg
+        args = self.args
+
+        fun_internal = Sum_Reduction(
+            self.red_formula.formula.children[0], self.red_formula.tagI
+        )
+        formula = fun_internal.formula
+        if formula.dim != 1:
+            KeOps_Error("dimfout should be 1")
+
+        varfinal = self.red_formula.formula.children[1]
+        dimout = varfinal.dim
+        nchunks = 1 + (dimout - 1) // dimfinalchunk
+        dimlastfinalchunk = dimout - (nchunks - 1) * dimfinalchunk
+
+        table = Var_loader(fun_internal).direct_table(args, i, j)
+        foutj = c_array(dtype, 1, "(fout + j - jstart)")
+        acc = c_array(dtypeacc, dimfinalchunk, "acc")
+        bj = c_variable(f"{dtype}*", f"({args[varfinal.ind].id} + j * {dimout})")
+
+        headers = ["cmath", "stdlib.h", "vector"]
+        if keopscore.config.config.use_OpenMP:
+            headers.append("omp.h")
+        if debug_ops_at_exec:
+            headers.append("iostream")
+        self.headers += c_include(*headers)
+
+        self.code = f"""
+{self.headers}
+
+#define BLOCK_J {self.block_j}
+
+template < typename TYPE >
+int CpuConv_finalchunks_{self.gencode_filename}(int nx, int ny, TYPE* out, int64_t* out_ind, TYPE **{arg.id}) {{
+    #pragma omp parallel
+    {{
+        // values of the scalar formula for the current block of "j" indices
+        std::vector< {dtype} > fout_v(BLOCK_J);
+        {dtype} *fout = fout_v.data();
+        {acc.declare()}
+
+        #pragma omp for
+        for (int i = 0; i < nx; i++) {{
+            {dtype} *outi = out + i * {dimout};
+            for (int k = 0; k < {dimout}; k++)
+                outi[k] = 0.0f;
+            for (int jstart = 0; jstart < ny; jstart += BLOCK_J) {{
+                int jend = (jstart + BLOCK_J < ny) ? jstart + BLOCK_J : ny;
+                for (int j = jstart; j < jend; j++) {{
+                    {formula(foutj, table)}
+                }}
+                for (int chunk = 0; chunk < {nchunks}; chunk++) {{
+                    int dimchunk_curr = (chunk < {nchunks - 1}) ? {dimfinalchunk} : {dimlastfinalchunk};
+                    for (int k = 0; k < dimchunk_curr; k++)
+                        acc[k] = 0.0f;
+                    for (int j = jstart; j < jend; j++) {{
+                        {dtype} kj = fout[j - jstart];
+                        {dtype} *bj = {bj.id} + chunk * {dimfinalchunk};
+                        for (int k = 0; k < dimchunk_curr; k++)
+                            acc[k] += kj * bj[k];
+                    }}
+                    for (int k = 0; k < dimchunk_curr; k++)
+                        outi[chunk * {dimfinalchunk} + k] += acc[k];
+                }}
+            }}
+        }}
+    }}
+    return 0;
+}}
+                    """
+
+        self.code += f"""
+#include "stdarg.h"
+
+template < typename TYPE >
+int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, int64_t *out_ind, TYPE **arg) {{
+
+    if (tagI==1) {{
+        int tmp = ny;
+        ny = nx;
+        nx = tmp;
+    }}
+
+    return CpuConv_finalchunks_{self.gencode_filename}< TYPE >(nx, ny, out, out_ind, arg);
+
+}}
+template < typename TYPE >
+int launch_keops_cpu_{self.gencode_filename}(int dimY,
+                                             int nx,
+                                             int ny,
+                                             int tagI,
+                                             int tagZero,
+                                             int use_half,
+                                             int dimred,
+                                             int use_chunk_mode,
+                                             std::vector< int > indsi, std::vector< int > indsj, std::vector< int > indsp,
+                                             int dimout,
+                                             std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
+                                             int **ranges,
+                                             std::vector< int > shapeout, TYPE *out, int64_t *out_ind,
+                                             TYPE **arg,
+                                             std::vector< std::vector< int > > argshape,
+                                             int *argstrides) {{
+
+
+    return launch_keops_{self.gencode_filename} < TYPE >(nx, ny, tagI, out, out_ind, arg);
+
+}}
+                """
@@ -63,7 +63,7 @@ class CpuReduc_ranges(MapReduce, Cpu_link_compile):
         imstartx = c_variable("int", "i-start_x")
         jmstarty = c_variable("int", "j-start_y")
 
-        headers = ["cmath", "stdlib.h"]
+        headers = ["cmath", "stdlib.h", "vector", "algorithm"]
         if keopscore.config.config.use_OpenMP:
             headers.append("omp.h")
         if debug_ops_at_exec:
@@ -98,12 +98,21 @@ void check_nargs(int nargs, int nminargs) {{
 #include "include/ranges_utils.h"
 #include "include/Ranges.h"
 
+#ifndef KEOPS_RANGE_WORK_ITEM
+#define KEOPS_RANGE_WORK_ITEM
+// piece of work for the parallel loop : rows [start, end) of the range range_index
+struct range_work_item {{
+    int range_index, start, end;
+    long work;
+}};
+#endif
+
 template< typename TYPE>                 
 int CpuConv_ranges_{self.gencode_filename}(int nx, int ny, 
                     int nbatchdims, int* shapes,
                     std::vector< int > indsi, std::vector< int > indsj, std::vector< int > indsp,
                     int nranges_x, int nranges_y, int **ranges,
-                    TYPE* out, TYPE **{arg.id}) {{
+                    TYPE* out, int64_t* out_ind, TYPE **{arg.id}, int *argstrides) {{
                         
     int sizei = indsi.size();
     int sizej = indsj.size();
@@ -133,9 +142,6 @@ int CpuConv_ranges_{self.gencode_filename}(int nx, int ny,
     
     // Actual for-for loop -----------------------------------------------------
 
-    {param_loc.declare()}
-    {varloader.load_vars("p", param_loc, args)}  // If nbatchdims == 0, the parameters are fixed once and for all
-    
     // Set the output to zero, as the ranges may not cover the full output -----
     {acctmp.declare()} // __TYPEACC__ acctmp[DIMRED];
     for (int i = 0; i < nx; i++) {{
@@ -156,72 +162,118 @@ int CpuConv_ranges_{self.gencode_filename}(int nx, int ny,
     int* slices_x = {red_formula.tagJ} ? ranges[1] : ranges[4];
     int* ranges_y = {red_formula.tagJ} ? ranges[2] : ranges[5];
 
-    int indices_i[sizei], indices_j[sizej], indices_p[sizep];  // Buffers for the "broadcasted indices"
-    for (int k = 0; k < sizei; k++) {{ indices_i[k] = 0; }}  // Fill the "offsets" with zeroes,
-    for (int k = 0; k < sizej; k++) {{ indices_j[k] = 0; }}  // the default value when nbatchdims == 0.
-    for (int k = 0; k < sizep; k++) {{ indices_p[k] = 0; }}
-    
-    
+    // Work items -------------------------------------------------------------
+    //
+    // The ranges are processed in parallel : each range of "i" indices is cut into
+    // chunks of rows with a similar work estimate (rows x total length of the slices),
+    // and the chunks are distributed to the threads from the most to the least expensive,
+    // so that a few large clusters do not leave the other cores idle.
+    std::vector< long > row_work(nranges);
+    long total_work = 0;
     for (int range_index = 0; range_index < nranges; range_index++) {{
-        int start_x = ranges_x[2 * range_index];
-        int end_x = ranges_x[2 * range_index + 1];
         int start_slice = (range_index < 1) ? 0 : slices_x[range_index - 1];
         int end_slice = slices_x[range_index];
+        long len = 0;
+        for (int slice = start_slice; slice < end_slice; slice++)
+            len += ranges_y[2 * slice + 1] - ranges_y[2 * slice];
+        row_work[range_index] = (len > 0) ? len : 1;
+        total_work += (ranges_x[2 * range_index + 1] - ranges_x[2 * range_index]) * row_work[range_index];
+    }}
+
+    int nthreads = 1;
+    #ifdef _OPENMP
+    nthreads = omp_get_max_threads();
+    #endif
+    long target_work = total_work / (8 * nthreads) + 1;
 
-        // If needed, compute the "true" start indices of the range, turning
-        // the "abstract" index start_x into an array of actual "pointers/offsets" stored in indices_i:
-        if (nbatchdims > 0) {{
-            vect_broadcast_index(start_x, nbatchdims, sizei, shapes, shapes_i, indices_i);
-            // And for the parameters, too:
-            vect_broadcast_index(range_index, nbatchdims, sizep, shapes, shapes_p, indices_p);
-            {varloader.load_vars("p", param_loc, args, offsets=indices_p)}  // Load the paramaters, once per tile
+    std::vector< range_work_item > items;
+    for (int range_index = 0; range_index < nranges; range_index++) {{
+        int start_x = ranges_x[2 * range_index];
+        int end_x = ranges_x[2 * range_index + 1];
+        long chunk_rows = target_work / row_work[range_index];
+        int nrows = (chunk_rows > 1) ? (int)chunk_rows : 1;
+        for (int istart = start_x; istart < end_x; istart += nrows) {{
+            int iend = (istart + nrows < end_x) ? istart + nrows : end_x;
+            items.push_back({{range_index, istart, iend, (iend - istart) * row_work[range_index]}});
         }}
-    
-        #pragma omp parallel for   
-        for (int i = start_x; i < end_x; i++) {{
-            {xi.declare()}
-            {yj.declare()}
-            {fout.declare()}
-            {acc.declare()}
-            {sum_scheme.declare_temporary_accumulator()}
-            if (nbatchdims == 0) {{
-                {varloader.load_vars("i", xi, args, row_index=i)}
-            }} else {{
-                {varloader.load_vars("i", xi, args, row_index=imstartx, offsets=indices_i)}
+    }}
+    std::stable_sort(items.begin(), items.end(),
+                     [](const range_work_item &a, const range_work_item &b) {{ return a.work > b.work; }});
+    int nitems = items.size();
+
+    #pragma omp parallel
+    {{
+        int indices_i[sizei], indices_j[sizej], indices_p[sizep];  // Buffers for the "broadcasted indices"
+        for (int k = 0; k < sizei; k++) {{ indices_i[k] = 0; }}  // Fill the "offsets" with zeroes,
+        for (int k = 0; k < sizej; k++) {{ indices_j[k] = 0; }}  // the default value when nbatchdims == 0.
+        for (int k = 0; k < sizep; k++) {{ indices_p[k] = 0; }}
+
+        {param_loc.declare()}
+        {varloader.load_vars("p", param_loc, args)}  // If nbatchdims == 0, the parameters are fixed once and for all
+
+        #pragma omp for schedule(dynamic, 1)
+        for (int item = 0; item < nitems; item++) {{
+            int range_index = items[item].range_index;
+            int start_x = ranges_x[2 * range_index];
+            int start_slice = (range_index < 1) ? 0 : slices_x[range_index - 1];
+            int end_slice = slices_x[range_index];
+
+            // If needed, compute the "true" start indices of the range, turning
+            // the "abstract" index start_x into an array of actual "pointers/offsets" stored in indices_i:
+            if (nbatchdims > 0) {{
+                vect_broadcast_index(start_x, nbatchdims, sizei, shapes, shapes_i, indices_i);
+                // And for the parameters, too:
+                vect_broadcast_index(range_index, nbatchdims, sizep, shapes, shapes_p, indices_p);
+                {varloader.load_vars("p", param_loc, args, offsets=indices_p)}  // Load the paramaters, once per tile
             }}
-            {red_formula.InitializeReduction(acc)}
-            {sum_scheme.initialize_temporary_accumulator()}
-            for (int slice = start_slice; slice < end_slice; slice++) {{
-                 int start_y = ranges_y[2 * slice];
-                 int end_y = ranges_y[2 * slice + 1];
-
-                // If needed, compute the "true" start indices of the range, turning
-                // the "abstract" index start_y into an array of actual "pointers/offsets" stored in indices_j:
-                if (nbatchdims > 0) {{
-                    vect_broadcast_index(start_y, nbatchdims, sizej, shapes, shapes_j, indices_j);
-                }}
+
+            for (int i = items[item].start; i < items[item].end; i++) {{
+                {xi.declare()}
+                {yj.declare()}
+                {fout.declare()}
+                {acc.declare()}
+                {sum_scheme.declare_temporary_accumulator()}
                 if (nbatchdims == 0) {{
-                    for (int j = start_y; j < end_y; j++) {{
-                        {varloader.load_vars("j", yj, args, row_index=j)}
-                        {red_formula.formula(fout,table)}
-                        {sum_scheme.accumulate_result(acc, fout, j)}
-                    }}
+                    {varloader.load_vars("i", xi, args, row_index=i)}
                 }} else {{
-                    for (int j = start_y; j < end_y; j++) {{
-                        {varloader.load_vars("j", yj, args, row_index=jmstarty, offsets=indices_j)}
-                        {red_formula.formula(fout,table)}
-                        {sum_scheme.accumulate_result(acc, fout, jmstarty)}
+                    {varloader.load_vars("i", xi, args, row_index=imstartx, offsets=indices_i)}
+                }}
+                {red_formula.InitializeReduction(acc)}
+                {sum_scheme.initialize_temporary_accumulator()}
+                for (int slice = start_slice; slice < end_slice; slice++) {{
+                    int start_y = ranges_y[2 * slice];
+                    int end_y = ranges_y[2 * slice + 1];
+
+                    // If needed, compute the "true" start indices of the range, turning
+                    // the "abstract" index start_y into an array of actual "pointers/offsets" stored in indices_j:
+                    if (nbatchdims > 0) {{
+                        vect_broadcast_index(start_y, nbatchdims, sizej, shapes, shapes_j, indices_j);
+                    }}
+                    if (nbatchdims == 0) {{
+                        for (int j = start_y; j < end_y; j++) {{
+                            {varloader.load_vars("j", yj, args, row_index=j)}
+                            {red_formula.formula(fout,table)}
+                            {sum_scheme.accumulate_result(acc, fout, j)}
+                        }}
+                    }} else {{
+                        for (int j = start_y; j < end_y; j++) {{
+                            {varloader.load_vars("j", yj, args, row_index=jmstarty, offsets=indices_j)}
+                            {red_formula.formula(fout,table)}
+                            {sum_scheme.accumulate_result(acc, fout, jmstarty)}
+                        }}
                     }}
                 }}
+                {sum_scheme.final_operation(acc)}
+                {red_formula.FinalizeOutput(acc, outi, i)}
             }}
-            {sum_scheme.final_operation(acc)}
-            {red_formula.FinalizeOutput(acc, outi, i)}
         }}
     }}
     return 0;
 }}
                     """
 
+        self.code += self.get_code_batch()
+
         self.code += f"""    
  
 #include "stdarg.h"
@@ -235,8 +287,9 @@ int launch_keops_{self.gencode_filename}(int nx, int ny,
                                          int dimout,
                                          std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
                                          int **ranges, 
-                                         TYPE *out, int nargs, TYPE** arg,
-                                         std::vector<std::vector< int >> argshape) {{
+                                         TYPE *out, int64_t *out_ind, int nargs, TYPE** arg,
+                                         std::vector<std::vector< int >> argshape,
+                                         int *argstrides) {{
     
     Sizes< TYPE > SS (nargs, arg, argshape, nx, ny,tagI, use_half,
                       dimout,
@@ -247,8 +300,6 @@ int launch_keops_{self.gencode_filename}(int nx, int ny,
     if (use_half)
       SS.switch_to_half2_indexing();
 
-    Ranges < TYPE > RR(SS, ranges);
-    
     nx = SS.nx;
     ny = SS.ny;
     
@@ -267,11 +318,23 @@ int launch_keops_{self.gencode_filename}(int nx, int ny,
         dimsy = dimsx;
         dimsx = tmp_v;
     }}
+
+    if (SS.nbatchdims > 0 && ranges[6][0] == -1) {{
+        // batch processing without user-defined ranges : we use the dedicated kernel
+        // rather than emulating batches through the block-sparse mode.
+        int M = (tagI==1) ? SS.N : SS.M;
+        int N = (tagI==1) ? SS.M : SS.N;
+        return CpuConv_batch_{self.gencode_filename}< TYPE> (M, N, SS.nbatches, SS.nbatchdims, SS.shapes,
+                                                             indsi, indsj, indsp,
+                                                             out, out_ind, arg, argstrides);
+    }}
+
+    Ranges < TYPE > RR(SS, ranges);
     
     return CpuConv_ranges_{self.gencode_filename}< TYPE> (nx, ny, SS.nbatchdims, SS.shapes,
                                                           indsi, indsj, indsp,
                                                           RR.nranges_x, RR.nranges_y, RR.castedranges,
-                                                          out, arg);
+                                                          out, out_ind, arg, argstrides);
 }}
 
 template < typename TYPE >
@@ -287,9 +350,10 @@ int launch_keops_cpu_{self.gencode_filename}(int dimY,
                                              int dimout,
                                              std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
                                              int **ranges,
-                                             std::vector< int > shapeout, TYPE *out,
+                                             std::vector< int > shapeout, TYPE *out, int64_t *out_ind,
                                              TYPE **arg,
-                                             std::vector< std::vector< int > > argshape) {{
+                                             std::vector< std::vector< int > > argshape,
+                                             int *argstrides) {{
     
 
     
@@ -304,9 +368,101 @@ int launch_keops_cpu_{self.gencode_filename}(int dimY,
                                                         dimsx, dimsy, dimsp,
                                                         ranges,
                                                         out, 
+                                                        out_ind,
                                                         argshape.size(), 
                                                         arg, 
-                                                        argshape);
+                                                        argshape,
+                                                        argstrides);
 }}
                         
                 """
+
+    def get_code_batch(self):
+        # dedicated kernel for batch processing without user-defined ranges :
+        # the broadcasted offsets of all variables are computed once per batch,
+        # and the parallel loop runs over all (batch, i) pairs.
+        i = self.i
+        j = self.j
+        dtype = self.dtype
+        red_formula = self.red_formula
+        fout = self.fout
+        outi = self.outi
+        acc = self.acc
+        arg = self.arg
+        args = self.args
+        xi = self.xi
+        yj = c_array(dtype, self.varloader.dimy, "yj")
+        param_loc = self.param_loc
+        varloader = self.varloader
+        table = varloader.table(xi, yj, param_loc)
+        sum_scheme = self.sum_scheme
+
+        nvarsi, nvarsj, nvarsp = (
+            len(varloader.Varsi),
+            len(varloader.Varsj),
+            len(varloader.Varsp),
+        )
+        offsets_i = c_array("int", nvarsi, "(offsets_i + b * sizei)")
+        offsets_j = c_array("int", nvarsj, "(offsets_j + b * sizej)")
+        offsets_p = c_array("int", nvarsp, "(offsets_p + b * sizep)")
+        ib = c_variable("int", "ib")
+
+        return f"""
+
+template< typename TYPE>
+int CpuConv_batch_{self.gencode_filename}(int nx, int ny, int nbatches,
+                    int nbatchdims, int* shapes,
+                    std::vector< int > indsi, std::vector< int > indsj, std::vector< int > indsp,
+                    TYPE* out, int64_t* out_ind, TYPE **{arg.id}, int *argstrides) {{
+
+    // N.B. here nx and ny are the numbers of "i" and "j" indices in each batch.
+    int sizei = indsi.size();
+    int sizej = indsj.size();
+    int sizep = indsp.size();
+
+    int shapes_i[sizei * (nbatchdims + 1)], shapes_j[sizej * (nbatchdims + 1)], shapes_p[sizep * (nbatchdims + 1)];
+    fill_shapes(nbatchdims, shapes, shapes_i, shapes_j, shapes_p,  {red_formula.tagJ}, indsi, indsj, indsp);
+
+    // offsets of the variables for each batch, taking broadcasting into account
+    std::vector< int > offsets_i_v(nbatches * sizei + 1), offsets_j_v(nbatches * sizej + 1), offsets_p_v(nbatches * sizep + 1);
+    int *offsets_i = offsets_i_v.data(), *offsets_j = offsets_j_v.data(), *offsets_p = offsets_p_v.data();
+    for (int b = 0; b < nbatches; b++) {{
+        vect_broadcast_index(b * nx, nbatchdims, sizei, shapes, shapes_i, offsets_i + b * sizei);
+        vect_broadcast_index(b * ny, nbatchdims, sizej, shapes, shapes_j, offsets_j + b * sizej);
+        vect_broadcast_index(b, nbatchdims, sizep, shapes, shapes_p, offsets_p + b * sizep);
+    }}
+
+    #pragma omp parallel
+    {{
+        {param_loc.declare()}
+        {xi.declare()}
+        {yj.declare()}
+        {fout.declare()}
+        {acc.declare()}
+        {sum_scheme.declare_temporary_accumulator()}
+        int bcur = -1;
+
+        #pragma omp for schedule(static)
+        for (int i = 0; i < nbatches * nx; i++) {{
+            int b = i / nx;
+            int ib = i - b * nx;
+            if (b != bcur) {{
+                {varloader.load_vars("p", param_loc, args, offsets=offsets_p)}
+                bcur = b;
+            }}
+            {varloader.load_vars("i", xi, args, row_index=ib, offsets=offsets_i)}
+            {red_formula.InitializeReduction(acc)}
+            {sum_scheme.initialize_temporary_accumulator()}
+            for (int j = 0; j < ny; j++) {{
+                {varloader.load_vars("j", yj, args, row_index=j, offsets=offsets_j)}
+                {red_formula.formula(fout,table)}
+                {sum_scheme.accumulate_result(acc, fout, j)}
+                {sum_scheme.periodic_accumulate_temporary(acc, j)}
+            }}
+            {sum_scheme.final_operation(acc)}
+            {red_formula.FinalizeOutput(acc, outi, i)}
+        }}
+    }}
+    return 0;
+}}
+                    """
@@ -0,0 +1,86 @@
+from keopscore.formulas.reductions.sum_schemes import kahan_scheme
+from keopscore.mapreduce.cpu.CpuReduc_tiled import CpuReduc_tiled
+from keopscore.utils.code_gen_utils import c_variable
+
+
+class CpuReduc_simd(CpuReduc_tiled):
+    """
+    class for generating the final C++ code, Cpu version with cache blocking and
+    vectorized evaluation of the formula : inside each block of "j" indices, the formula
+    is evaluated for KEOPS_SIMD_LANES consecutive "j" at each step, in a "#pragma omp simd" loop.
+    Each lane has its own accumulator, and the lanes are merged at the end of each block
+    with the ReducePair method of the reduction.
+    N.B. for Arg type reductions, ties between equal values found in different lanes
+    may be resolved in favor of a larger index than in the sequential schemes.
+    """
+
+    def thread_buffers(self):
+        return self.accumulator_buffer(
+            self.accumulator("acc_lane"), "acc_lanes", "KEOPS_SIMD_LANES"
+        )
+
+    def reduce_block(self, table, acc, fout):
+        red_formula = self.red_formula
+        sum_scheme = self.sum_scheme
+        dtype = self.dtype
+        dimy = self.varloader.dimy
+
+        acc_lane = self.accumulator("acc_lane")
+        acc_lane_loc = self.accumulator_pointer(acc_lane, "acc_lanes", "lane")
+        jlane = c_variable("int", "(j + lane)")
+
+        # merging of the lanes into the accumulator of the row : the Kahan compensation
+        # term must be updated, otherwise we simply apply the reduction to the pair.
+        if isinstance(sum_scheme, kahan_scheme):
+            merge = sum_scheme.accumulate_result(acc, acc_lane, jlane)
+        else:
+            merge = red_formula.ReducePair(acc, acc_lane)
+
+        lane_code = f"""
+                            {dtype} *yjrel = yj_tile + (j - jstart + lane) * {dimy};
+                            {acc_lane_loc}
+                            {fout.declare()}
+                            {red_formula.formula(fout, table)}
+                            {red_formula.ReducePairShort(acc_lane, fout, jlane)}
+                        """
+
+        return f"""
+                    for (int lane = 0; lane < KEOPS_SIMD_LANES; lane++) {{
+                        {acc_lane_loc}
+                        {red_formula.InitializeReduction(acc_lane)}
+                    }}
+                    int jsimd = jstart + ((jend - jstart) / KEOPS_SIMD_LANES) * KEOPS_SIMD_LANES;
+                    for (int j = jstart; j < jsimd; j += KEOPS_SIMD_LANES) {{
+                        #pragma omp simd
+                        for (int lane = 0; lane < KEOPS_SIMD_LANES; lane++) {{
+                            {lane_code}
+                        }}
+                    }}
+                    // remaining indices, when the size of the block is not a multiple of KEOPS_SIMD_LANES
+                    {{
+                        int j = jsimd;
+                        for (int lane = 0; lane < jend - jsimd; lane++) {{
+                            {lane_code}
+                        }}
+                    }}
+                    for (int lane = 0; lane < KEOPS_SIMD_LANES; lane++) {{
+                        {acc_lane_loc}
+                        {merge}
+                    }}
+                """
+
+    def get_code(self):
+        super().get_code()
+        # the number of lanes is given by the width of the vector registers
+        # available for the target architecture (which depends on compile flags).
+        simd_defs = f"""
+#if defined(__AVX512F__)
+    #define KEOPS_SIMD_BYTES 64
+#elif defined(__AVX__)
+    #define KEOPS_SIMD_BYTES 32
+#else
+    #define KEOPS_SIMD_BYTES 16
+#endif
+#define KEOPS_SIMD_LANES (KEOPS_SIMD_BYTES / (int)sizeof({self.dtype}))
+"""
+        self.code = simd_defs + self.code
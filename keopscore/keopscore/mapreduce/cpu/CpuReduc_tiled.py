@@ -0,0 +1,202 @@
+from keopscore import debug_ops_at_exec
+from keopscore.binders.cpp.Cpu_link_compile import Cpu_link_compile
+from keopscore.config.tiles import get_tile_sizes
+from keopscore.mapreduce.cpu.CpuAssignZero import CpuAssignZero
+from keopscore.mapreduce.MapReduce import MapReduce
+from keopscore.utils.code_gen_utils import c_array, c_include, sizeof
+import keopscore
+
+
+class CpuReduc_tiled(MapReduce, Cpu_link_compile):
+    """
+    class for generating the final C++ code, Cpu version with cache blocking :
+    the "i" and "j" indices are both split into tiles. For each tile of "i" rows,
+    the "j" variables are copied block after block into a small contiguous buffer,
+    which is then shared by all the rows of the tile (this is the Cpu counterpart
+    of the shared memory used in GpuReduc1D).
+    """
+
+    AssignZero = CpuAssignZero
+
+    def __init__(self, *args):
+        MapReduce.__init__(self, *args)
+        Cpu_link_compile.__init__(self)
+        self.dimy = self.varloader.dimy
+
+    def thread_buffers(self):
+        # returns C++ code declaring additional per-thread buffers (none in this scheme)
+        return ""
+
+    def reduce_block(self, table, acc, fout):
+        # returns C++ code performing the reduction of the current row i
+        # over the current block of "j" indices, stored in yj_tile.
+        red_formula = self.red_formula
+        sum_scheme = self.sum_scheme
+        dtype = self.dtype
+        return f"""
+                    {dtype} *yjrel = yj_tile;
+                    {sum_scheme.initialize_temporary_accumulator_block_init()}
+                    for (int j = jstart; j < jend; j++, yjrel += {self.varloader.dimy}) {{
+                        {red_formula.formula(fout, table)}
+                        {sum_scheme.accumulate_result(acc, fout, self.j)}
+                    }}
+                    {sum_scheme.final_operation(acc)}
+                """
+
+    def get_code(self):
+        super().get_code()
+
+        red_formula = self.red_formula
+        dtype = self.dtype
+        varloader = self.varloader
+        dimx, dimy = varloader.dimx, varloader.dimy
+
+        i = self.i
+        j = self.j
+        fout = self.fout
+        outi = self.outi
+        arg = self.arg
+        args = self.args
+        param_loc = self.param_loc
+        sum_scheme = self.sum_scheme
+
+        tile_i, tile_j = get_tile_sizes(dimy, sizeof(dtype))
+
+        # local copies of the current "i" row and of the current "j" column are
+        # pointers inside the tile buffers, so that the formula is evaluated on cached data.
+        xi = self.xi
+        xiloc = c_array(dtype, dimx, f"(xi_tile + (i - istart) * {dimx})")
+        yjloc = c_array(dtype, dimy, f"(yj_tile + (j - jstart) * {dimy})")
+        yjrel = c_array(dtype, dimy, "yjrel")
+        table = varloader.table(xi, yjrel, param_loc)
+
+        # accumulators of all the rows of the current tile are stored in a buffer
+        acc = self.acc
+        accloc = self.accumulator_pointer(acc, "acc_tile", "i - istart")
+        if hasattr(sum_scheme, "tmp_acc"):
+            dimtmp = sum_scheme.tmp_acc.dim
+            sum_scheme.tmp_acc = c_array(
+                dtype, dimtmp, f"(tmp_tile + (i - istart) * {dimtmp})"
+            )
+        else:
+            dimtmp = 0
+
+        headers = ["cmath", "stdlib.h", "vector"]
+        if keopscore.config.config.use_OpenMP:
+            headers.append("omp.h")
+        if debug_ops_at_exec:
+            headers.append("iostream")
+        self.headers += c_include(*headers)
+
+        self.code = f"""
+{self.headers}
+
+#define TILE_I {tile_i}
+#define TILE_J {tile_j}
+
+template < typename TYPE >
+int CpuConv_tiled_{self.gencode_filename}(int nx, int ny, TYPE* out, int64_t* out_ind, TYPE **{arg.id}, int *argstrides) {{
+    // number of rows of the tiles : at most TILE_I, and less if there are not enough
+    // rows to give TILE_I rows to every thread, so that all the threads are used
+    int nthreads = 1;
+    #ifdef _OPENMP
+    nthreads = omp_get_max_threads();
+    #endif
+    int tile_i = (nx + nthreads - 1) / nthreads;
+    if (tile_i > TILE_I)
+        tile_i = TILE_I;
+    if (tile_i < 1)
+        tile_i = 1;
+
+    #pragma omp parallel
+    {{
+        // per-thread buffers, allocated once and reused for every tile
+        std::vector< {dtype} > xi_tile_v(TILE_I * {max(dimx, 1)});
+        std::vector< {dtype} > yj_tile_v(TILE_J * {max(dimy, 1)});
+        std::vector< {dtype} > tmp_tile_v(TILE_I * {max(dimtmp, 1)});
+        {dtype} *xi_tile = xi_tile_v.data();
+        {dtype} *yj_tile = yj_tile_v.data();
+        {dtype} *tmp_tile = tmp_tile_v.data();
+        {self.accumulator_buffer(acc, "acc_tile", "TILE_I")}
+        {self.thread_buffers()}
+
+        {param_loc.declare()}
+        {varloader.load_vars("p", param_loc, args)}
+        {fout.declare()}
+
+        #pragma omp for schedule(static)
+        for (int istart = 0; istart < nx; istart += tile_i) {{
+            int iend = (istart + tile_i < nx) ? istart + tile_i : nx;
+
+            // load the tile of "i" variables and initialize the accumulators
+            for (int i = istart; i < iend; i++) {{
+                {accloc}
+                {varloader.load_vars("i", xiloc, args, row_index=i)}
+                {red_formula.InitializeReduction(acc)}
+                {sum_scheme.initialize_temporary_accumulator_first_init()}
+            }}
+
+            for (int jstart = 0; jstart < ny; jstart += TILE_J) {{
+                int jend = (jstart + TILE_J < ny) ? jstart + TILE_J : ny;
+
+                // copy the block of "j" variables in the contiguous buffer...
+                for (int j = jstart; j < jend; j++) {{
+                    {varloader.load_vars("j", yjloc, args, row_index=j)}
+                }}
+
+                // ... which is then shared by all the rows of the tile
+                for (int i = istart; i < iend; i++) {{
+                    {dtype} *xi = {xiloc.id};
+                    {accloc}
+                    {self.reduce_block(table, acc, fout)}
+                }}
+            }}
+
+            for (int i = istart; i < iend; i++) {{
+                {accloc}
+                {red_formula.FinalizeOutput(acc, outi, i)}
+            }}
+        }}
+    }}
+    return 0;
+}}
+                    """
+
+        self.code += f"""
+#include "stdarg.h"
+
+template < typename TYPE >
+int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, int64_t *out_ind, TYPE **arg, int *argstrides) {{
+
+    if (tagI==1) {{
+        int tmp = ny;
+        ny = nx;
+        nx = tmp;
+    }}
+
+    return CpuConv_tiled_{self.gencode_filename}< TYPE >(nx, ny, out, out_ind, arg, argstrides);
+
+}}
+template < typename TYPE >
+int launch_keops_cpu_{self.gencode_filename}(int dimY,
+                                             int nx,
+                                             int ny,
+                                             int tagI,
+                                             int tagZero,
+                                             int use_half,
+                                             int dimred,
+                                             int use_chunk_mode,
+                                             std::vector< int > indsi, std::vector< int > indsj, std::vector< int > indsp,
+                                             int dimout,
+                                             std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
+                                             int **ranges,
+                                             std::vector< int > shapeout, TYPE *out, int64_t *out_ind,
+                                             TYPE **arg,
+                                             std::vector< std::vector< int > > argshape,
+                                             int *argstrides) {{
+
+
+    return launch_keops_{self.gencode_filename} < TYPE >(nx, ny, tagI, out, out_ind, arg, argstrides);
+
+}}
+                """
@@ -1,3 +1,9 @@
 from .CpuReduc_ranges import CpuReduc_ranges
 from .CpuReduc import CpuReduc
 from .CpuAssignZero import CpuAssignZero
+from .CpuReduc_tiled import CpuReduc_tiled
+from .CpuReduc_simd import CpuReduc_simd
+from .CpuReduc2D import CpuReduc2D
+from .CpuReduc_chunks import CpuReduc_chunks
+from .CpuReduc_finalchunks import CpuReduc_finalchunks
+from .CpuReducFull import CpuReducFull
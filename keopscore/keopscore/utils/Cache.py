@@ -1,9 +1,84 @@
 import os
 import pickle
+import sqlite3
+import threading
 import keopscore
+from keopscore.config.tiles import get_cpu_scheme
 
-# global configuration parameter to be added for the lookup :
-env_param = keopscore.config.config.cpp_flags
+
+def get_env_param():
+    # global configuration parameter to be added for the lookup. The default Cpu
+    # computation scheme (see keopscore.config.tiles.get_cpu_scheme) and build
+    # profile are used by the bindings, so they must be part of the lookup key as well.
+    return str(keopscore.config.config.cpp_flags) + str(
+        (get_cpu_scheme(), keopscore.config.config.get_build_profile())
+    )
+
+
+class CacheStore:
+    """
+    Persistent index of cached values, stored in a sqlite database located in the
+    build folder. Entries are written as soon as they are computed and looked up one
+    at a time, so that several processes may share the same build folder. Any error
+    of the database (e.g. read-only folder) only disables the persistence.
+    """
+
+    # maximum time (in seconds) to wait for a lock held by another process
+    timeout = 60
+
+    def __init__(self, name, save_folder):
+        self.name = name
+        self.lock = threading.Lock()
+        self.set_folder(save_folder)
+
+    def set_folder(self, save_folder):
+        self.close()
+        self.path = os.path.join(save_folder, self.name + "_cache.db")
+
+    def close(self):
+        connection = getattr(self, "connection", None)
+        if connection is not None and self.pid == os.getpid():
+            connection.close()
+        self.connection, self.pid = None, None
+
+    def connect(self):
+        # connections are not shared with forked processes
+        if self.connection is None or self.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            # write-ahead logging : readers are not blocked by writers
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB)"
+            )
+            self.connection, self.pid = connection, os.getpid()
+        return self.connection
+
+    def get(self, key):
+        with self.lock:
+            try:
+                row = (
+                    self.connect()
+                    .execute("SELECT value FROM cache WHERE key = ?", (key,))
+                    .fetchone()
+                )
+            except sqlite3.Error:
+                return None
+        return None if row is None else pickle.loads(row[0])
+
+    def set(self, key, value):
+        with self.lock:
+            try:
+                self.connect().execute(
+                    "INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)",
+                    (key, pickle.dumps(value)),
+                )
+            except sqlite3.Error:
+                pass
 
 
 class Cache:
@@ -12,61 +87,48 @@ class Cache:
         self.library = {}
         self.use_cache_file = use_cache_file
         if use_cache_file:
-            self.cache_file = os.path.join(save_folder, fun.__name__ + "_cache.pkl")
-            if os.path.isfile(self.cache_file) and os.path.getsize(self.cache_file) > 0:
-                f = open(self.cache_file, "rb")
-                self.library = pickle.load(f)
-                f.close()
-            import atexit
-
-            atexit.register(self.save_cache)
+            self.store = CacheStore(fun.__name__, save_folder)
 
     def __call__(self, *args):
-        str_id = "".join(list(str(arg) for arg in args)) + str(env_param)
+        str_id = "".join(list(str(arg) for arg in args)) + get_env_param()
         if not str_id in self.library:
-            self.library[str_id] = self.fun(*args)
+            res = self.store.get(str_id) if self.use_cache_file else None
+            if res is None:
+                res = self.fun(*args)
+                if self.use_cache_file:
+                    self.store.set(str_id, res)
+            self.library[str_id] = res
         return self.library[str_id]
 
     def reset(self, new_save_folder=None):
         self.library = {}
-        if new_save_folder:
-            self.save_folder = new_save_folder
-
-    def save_cache(self):
-        f = open(self.cache_file, "wb")
-        pickle.dump(self.library, f)
-        f.close()
+        if self.use_cache_file:
+            self.store.set_folder(new_save_folder or os.path.dirname(self.store.path))
 
 
 class Cache_partial:
-    """ """
+    """
+    Cache for objects of class cls : with the cache file, only the attribute params of
+    the objects is stored, and objects are rebuilt with cls(params, fast_init=True).
+    """
 
     def __init__(self, cls, use_cache_file=False, save_folder="."):
         self.cls = cls
         self.library = {}
         self.use_cache_file = use_cache_file
         if self.use_cache_file:
-            self.cache_file = os.path.join(save_folder, cls.__name__ + "_cache.pkl")
-            if os.path.isfile(self.cache_file):
-                f = open(self.cache_file, "rb")
-                self.library_params = pickle.load(f)
-                f.close()
-            else:
-                self.library_params = {}
-            import atexit
-
-            atexit.register(self.save_cache)
+            self.store = CacheStore(cls.__name__, save_folder)
 
     def __call__(self, *args):
-        str_id = "".join(list(str(arg) for arg in args)) + str(env_param)
+        str_id = "".join(list(str(arg) for arg in args)) + get_env_param()
         if not str_id in self.library:
             if self.use_cache_file:
-                if str_id in self.library_params:
-                    params = self.library_params[str_id]
+                params = self.store.get(str_id)
+                if params is not None:
                     self.library[str_id] = self.cls(params, fast_init=True)
                 else:
                     obj = self.cls(*args)
-                    self.library_params[str_id] = obj.params
+                    self.store.set(str_id, obj.params)
                     self.library[str_id] = obj
             else:
                 self.library[str_id] = self.cls(*args)
@@ -75,11 +137,4 @@ class Cache_partial:
     def reset(self, new_save_folder=None):
         self.library = {}
         if self.use_cache_file:
-            self.library_params = {}
-        if new_save_folder:
-            self.save_folder = new_save_folder
-
-    def save_cache(self):
-        f = open(self.cache_file, "wb")
-        pickle.dump(self.library_params, f)
-        f.close()
+            self.store.set_folder(new_save_folder or os.path.dirname(self.store.path))
@@ -0,0 +1,100 @@
+import os
+import re
+import time
+
+from keopscore.config.config import (
+    get_build_folder,
+    get_build_folder_max_size,
+    get_build_folder_max_formulas,
+)
+from keopscore.utils.misc_utils import KeOps_Message
+
+###########################################################
+# Least recently used eviction of the formulas of the build folder. The files of
+# a formula are identified by its hash tag, e.g. 7b9a611f7e.cpp, 7b9a611f7e.nfo,
+# pykeops_cpp_7b9a611f7e.so, pykeops_cpp_7b9a611f7e_native.so or cubin_7b9a611f7e. The time of last use of a formula
+# is the modification time of its info file, which is updated each time a process
+# loads the formula. Other files (jit binaries, cache indices, ...) are never removed.
+
+formula_file_pattern = re.compile(
+    r"^(?:pykeops_cpp_|cubin_|ptx_)?([0-9a-f]{10})(?:[._]|$)"
+)
+
+# formulas modified less than min_age seconds ago may be in use by a build, and
+# are not removed
+min_age = 600
+
+
+def formula_tag(filename):
+    match = formula_file_pattern.match(filename)
+    return match.group(1) if match else None
+
+
+def touch_formula(tag):
+    # records the use of the formula
+    try:
+        os.utime(os.path.join(get_build_folder(), tag + ".nfo"))
+    except OSError:
+        pass
+
+
+def get_formulas(build_folder=None):
+    # returns a dict tag -> (time of last use, total size, list of files)
+    formulas = {}
+    for f in os.scandir(build_folder or get_build_folder()):
+        tag = formula_tag(f.name)
+        if tag is None or not f.is_file():
+            continue
+        stat = f.stat()
+        last_use, size, files = formulas.get(tag, (0, 0, []))
+        formulas[tag] = (
+            max(last_use, stat.st_mtime),
+            size + stat.st_size,
+            files + [f.path],
+        )
+    return formulas
+
+
+def evict_formulas(max_size=None, max_formulas=None, verbose=True):
+    r"""
+    Removes the least recently used formulas of the build folder, until it contains
+    at most **max_formulas** formulas, whose files take at most **max_size** megabytes.
+    By default, the caps set with set_build_folder_max_size and
+    set_build_folder_max_formulas are used ; 0 means no cap.
+
+    Returns:
+        list : the tags of the removed formulas.
+    """
+    if max_size is None:
+        max_size = get_build_folder_max_size()
+    if max_formulas is None:
+        max_formulas = get_build_folder_max_formulas()
+    if not max_size and not max_formulas:
+        return []
+    formulas = get_formulas()
+    total_size = sum(size for _, size, _ in formulas.values())
+    nformulas = len(formulas)
+    now = time.time()
+    evicted = []
+    by_last_use = sorted(formulas.items(), key=lambda formula: formula[1][0])
+    for tag, (last_use, size, files) in by_last_use:
+        if not (
+            (max_formulas and nformulas > max_formulas)
+            or (max_size and total_size > max_size * 1e6)
+        ):
+            break
+        if now - last_use < min_age:
+            continue
+        for f in files:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+        nformulas -= 1
+        total_size -= size
+        evicted.append(tag)
+    if evicted and verbose:
+        KeOps_Message(
+            f"{len(evicted)} least recently used formulas removed from {get_build_folder()}."
+        )
+    return evicted
@@ -16,12 +16,17 @@ def get_hash_name(*args):
 #######################################################################
 
 
+# half precision types used on Cpu for storage only, all computations being done
+# in float (see include/half_storage.h)
+half_storage_dtypes = ("keops_half", "keops_bfloat16")
+
+
 def sizeof(dtype):
     if dtype == "float":
         return 4
     elif dtype == "double":
         return 8
-    elif dtype == "half":
+    elif dtype in ("half", *half_storage_dtypes):
         return 2
     else:
         KeOps_Error("not implemented")
@@ -250,9 +255,13 @@ def infinity(dtype):
 
 def cast_to(dtype, var):
     # returns C++ code string to do a cast ; e.g. "(float)" if dtype is "float" for example
-    simple_dtypes = ["float", "double", "int", "bool"]
+    simple_dtypes = ["float", "double", "int", "int64_t", "bool"]
     if (dtype in simple_dtypes) and (var.dtype in simple_dtypes):
         return f"({dtype})({var.id})"
+    elif dtype in half_storage_dtypes and var.dtype in simple_dtypes:
+        return f"{dtype}((float)({var.id}))"
+    elif dtype in simple_dtypes and var.dtype in half_storage_dtypes:
+        return f"({dtype})((float)({var.id}))"
     elif dtype == "half2" and var.dtype == "float":
         return f"__float2half2_rn({var.id})"
     elif dtype == "float2" and var.dtype == "half2":
@@ -354,6 +363,29 @@ class c_array:
         return string
 
 
+class c_array_pair:
+    # pair of a c_array of values and a c_array of indices, used on Cpu as the
+    # accumulator and the output of the reductions with indices (see
+    # MapReduce.split_indices). Its split method returns the two arrays, as the
+    # split of a single c_array of values followed by indices.
+    def __init__(self, vals, inds):
+        self.vals = vals
+        self.inds = inds
+        self.dtype = vals.dtype
+        self.dim = vals.dim + inds.dim
+
+    def declare(self):
+        return self.vals.declare() + self.inds.declare()
+
+    def split(self, *dims):
+        if dims != (self.vals.dim, self.inds.dim):
+            KeOps_Error("incompatible dimensions for split")
+        return [self.vals, self.inds]
+
+    def assign(self, val):
+        return self.vals.assign(val) + self.inds.assign(val)
+
+
 def VectApply(fun, out, *args):
     # returns C++ code string to apply a scalar operation to fixed-size arrays, following broadcasting rules.
     # - fun is the scalar unary function to be applied, it must accept two c_variable or c_array inputs and output a string
@@ -496,7 +528,7 @@ def GetInds(Vars):
 
 
 class Var_loader:
-    def __init__(self, red_formula):
+    def __init__(self, red_formula, strided_args=()):
         formula = red_formula.formula
         tagI, tagJ = red_formula.tagI, red_formula.tagJ
 
@@ -530,6 +562,12 @@ class Var_loader:
         self.inds = GetInds(formula.Vars_)
         self.nminargs = max(self.inds) + 1 if len(self.inds) > 0 else 0
 
+        # row and column strides of the input arrays which are not contiguous,
+        # given at runtime in the argstrides array
+        self.strides = {
+            k: c_array("int", 2, f"(argstrides + {2 * k})") for k in strided_args
+        }
+
     def table(self, xi, yj, pp):
         return table(
             self.nminargs,
@@ -565,6 +603,7 @@ class Var_loader:
             dims, inds = self.dimsy, self.indsj
         elif cat == "p":
             dims, inds = self.dimsp, self.indsp
+        kwargs.setdefault("strides", self.strides)
         return load_vars(dims, inds, *args, **kwargs)
 
 
@@ -627,7 +666,16 @@ def table4(
     return res
 
 
-def load_vars(dims, inds, xloc, args, row_index=c_zero_int, offsets=None, indsref=None):
+def load_vars(
+    dims,
+    inds,
+    xloc,
+    args,
+    row_index=c_zero_int,
+    offsets=None,
+    indsref=None,
+    strides=None,
+):
     # returns a c++ code used to create a local copy of slices of the input tensors, for evaluating a formula
     # - dims is a list of integers giving dimensions of variables
     # - dims is a list of integers giving indices of variables
@@ -636,6 +684,8 @@ def load_vars(dims, inds, xloc, args, row_index=c_zero_int, offsets=None, indsre
     # - row_index is a c_variable (of dtype="int"), specifying which row of the matrix should be loaded
     # - offsets is an optional c_array (of dtype="int"), specifying variable-dependent offsets (used when broadcasting batch dimensions)
     # - indsref is an optional list of integers, giving index mapping for offsets
+    # - strides is an optional dict, giving for the indices of non contiguous variables
+    #   a c_array (of dtype="int" and dim=2) containing their row and column strides
     #
     # Example: assuming i=c_variable("int", "5"), xloc=c_variable("float", "xi") and px=c_variable("float**", "px"), then
     # if dims = [2,2,3] and inds = [7,9,8], the call to
@@ -687,11 +737,14 @@ def load_vars(dims, inds, xloc, args, row_index=c_zero_int, offsets=None, indsre
             row_index_str = (
                 f"({row_index.id}+{offsets.id}[{l}])" if offsets else row_index.id
             )
+            if strides and inds[u] in strides:
+                rowstride, colstride = strides[inds[u]][0].id, strides[inds[u]][1].id
+                position = f"{row_index_str}*{rowstride}+v*{colstride}"
+            else:
+                position = f"{row_index_str}*{dims[u]}+v"
             string += use_pragma_unroll()
             string += f"for(int v=0; v<{dims[u]}; v++) {{\n"
-            string += (
-                f"    {xloc.id}[a] = {args[inds[u]].id}[{row_index_str}*{dims[u]}+v];\n"
-            )
+            string += f"    {xloc.id}[a] = {args[inds[u]].id}[{position}];\n"
             string += "     a++;\n"
             string += "}\n"
         string += "}\n"
@@ -90,3 +90,50 @@ def find_library_abspath(lib):
     abspath = cast(lmptr, POINTER(LINKMAP)).contents.l_name
 
     return abspath.decode("utf-8")
+
+
+#######################################################################
+# .  Files shared between processes
+#######################################################################
+
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows : builds are not locked
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path):
+    """
+    context manager holding an exclusive lock on the file path (which is created if needed).
+    It is used to build each formula only once when several processes (or threads)
+    share the same build folder : the first one builds, the others wait.
+    """
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def tmp_file_name(path):
+    # name of a temporary file, unique for the current process and thread, which is
+    # renamed to path when complete, so that path is never seen partially written.
+    import os
+    import threading
+
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def write_file_atomically(path, string):
+    import os
+
+    tmp = tmp_file_name(path)
+    with open(tmp, "w") as f:
+        f.write(string)
+    os.replace(tmp, path)
@@ -67,6 +67,7 @@ setup(
             "binders/nvrtc/keops_nvrtc.cpp",
             "binders/nvrtc/nvrtc_jit.cpp",
             "include/CudaSizes.h",
+            "include/half_storage.h",
             "include/ranges_utils.h",
             "include/Ranges.h",
             "include/Sizes.h",
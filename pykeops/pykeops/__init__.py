@@ -35,15 +35,9 @@ with open(
 
 default_device_id = 0  # default Gpu device number
 
-if keopscore.config.config.use_cuda:
-    if not os.path.exists(pykeopsconfig.pykeops_nvrtc_name(type="target")):
-        from .common.keops_io.LoadKeOps_nvrtc import compile_jit_binary
-
-        compile_jit_binary()
-
 
 def clean_pykeops(recompile_jit_binaries=True):
-    import pykeops
+    import pykeops.common.keops_io
 
     keopscore.clean_keops(recompile_jit_binary=recompile_jit_binaries)
     keops_binder = pykeops.common.keops_io.keops_binder
@@ -53,10 +47,10 @@ def clean_pykeops(recompile_jit_binaries=True):
         pykeops.common.keops_io.LoadKeOps_nvrtc.compile_jit_binary()
 
 
-def set_build_folder(path=None):
-    import pykeops
+def set_build_folder(path=None, write_save_file=True):
+    import pykeops.common.keops_io
 
-    keopscore.set_build_folder(path)
+    keopscore.set_build_folder(path, write_save_file=write_save_file)
     keops_binder = pykeops.common.keops_io.keops_binder
     for key in keops_binder:
         keops_binder[key].reset(new_save_folder=get_build_folder())
@@ -70,11 +64,42 @@ def get_build_folder():
     return keops_get_build_folder()
 
 
-if pykeopsconfig.numpy_found:
+# N.B. the numpy and torch bindings, and the cuda libraries, are only loaded when
+# first needed, so that importing pykeops is fast.
+def test_numpy_bindings():
     from .numpy.test_install import test_numpy_bindings
 
-if pykeopsconfig.torch_found:
+    return test_numpy_bindings()
+
+
+def test_torch_bindings():
     from .torch.test_install import test_torch_bindings
 
-# next line is to ensure that cache file for formulas is loaded at import
-from .common import keops_io
+    return test_torch_bindings()
+
+
+def __getattr__(name):
+    # pykeops.numpy and pykeops.torch may be used without being imported
+    if (name == "numpy" and pykeopsconfig.numpy_found) or (
+        name == "torch" and pykeopsconfig.torch_found
+    ):
+        import importlib
+
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# opt-in autotuning of the map-reduce scheme (see pykeops/common/autotune.py)
+from .common.autotune import get_enable_autotune, set_enable_autotune
+
+# concurrent compilation of formulas (see pykeops/common/compile_pool.py)
+from .common.compile_pool import precompile, get_compile_workers, set_compile_workers
+
+# build profiles of the Cpu formulas (see keopscore/config/config.py)
+from keopscore.config.config import get_build_profile, set_build_profile
+
+# precompiled bundles, for machines without compiler (see pykeops/common/bundle.py)
+from .common.bundle import export_bundle, load_bundle
+
+# background calls of reductions (see pykeops/common/call_pool.py)
+from .common.call_pool import get_call_workers, set_call_workers
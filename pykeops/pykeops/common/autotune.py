@@ -0,0 +1,142 @@
+import json
+import os
+import time
+
+from keopscore.utils.code_gen_utils import get_hash_name
+from keopscore.utils.misc_utils import file_lock, write_file_atomically
+
+import pykeops
+from pykeops.common.utils import pyKeOps_Message
+
+###########################################################
+# Opt-in autotuner for the choice of map-reduce scheme : when enabled, the
+# first call of a reduction with backend="auto" benchmarks every candidate
+# scheme, and the fastest one is stored in a small database located in the
+# build folder, so that subsequent calls (and processes) use it directly.
+
+enable_autotune = os.getenv("PYKEOPS_AUTOTUNE") == "1"
+
+
+def get_enable_autotune():
+    global enable_autotune
+    return enable_autotune
+
+
+def set_enable_autotune(val):
+    global enable_autotune
+    if val == 1:
+        enable_autotune = True
+    elif val == 0:
+        enable_autotune = False
+
+
+# number of timed calls for each candidate, after one warm-up call
+n_repeats = 3
+
+# candidate schemes, given as (tag1D2D, cpu_scheme) ; the cpu_scheme (see
+# keopscore.config.tiles.get_cpu_scheme) only has an effect for the Cpu 1D scheme.
+candidates = {
+    0: {
+        "CPU_1D": (0, "1D"),
+        "CPU_1D_tiled": (0, "tiled"),
+        "CPU_1D_simd": (0, "simd"),
+        "CPU_2D": (1, None),
+    },
+    1: {
+        "GPU_1D": (0, None),
+        "GPU_2D": (1, None),
+    },
+}
+
+
+def size_bucket(n):
+    # sizes are grouped by powers of two
+    return int(n).bit_length()
+
+
+def autotune_key(
+    formula, aliases, dtype, optional_flags, tagCPUGPU, tagHostDevice, nx, ny
+):
+    """
+    returns the key identifying a reduction in the decision database : it is made
+    of a hash of the formula and its options, of the device and of the size buckets.
+    """
+    formula_hash = get_hash_name(
+        formula, aliases, dtype, sorted(optional_flags.items())
+    )
+    sizes = f"{size_bucket(nx)}_{size_bucket(ny)}"
+    return f"{formula_hash}_{tagCPUGPU}{tagHostDevice}_{sizes}"
+
+
+class AutotuneDB:
+    """
+    decision database, stored as a json file in the build folder.
+    """
+
+    filename = "autotune_decisions.json"
+
+    def __init__(self):
+        self.decisions = {}
+        self.file = None
+
+    def get_file(self):
+        return os.path.join(pykeops.get_build_folder(), self.filename)
+
+    def load(self):
+        self.file = self.get_file()
+        self.decisions = {}
+        if os.path.isfile(self.file):
+            try:
+                with open(self.file, "r") as f:
+                    self.decisions = json.load(f)
+            except (OSError, ValueError):
+                # unreadable database : decisions will be recomputed
+                self.decisions = {}
+
+    def get(self, key):
+        if self.file != self.get_file() or key not in self.decisions:
+            # the build folder has changed, or the decision was made by another process
+            self.load()
+        return self.decisions.get(key, None)
+
+    def set(self, key, decision):
+        # the lock is held during the read-modify-write, so that the decisions made
+        # at the same time by other threads or processes are not lost ; readers never
+        # see a partial file, since it is written atomically.
+        with file_lock(self.get_file() + ".lock"):
+            self.load()
+            self.decisions[key] = decision
+            write_file_atomically(
+                self.file, json.dumps(self.decisions, indent=1, sort_keys=True)
+            )
+
+
+autotune_db = AutotuneDB()
+
+
+def autotune_conv(make_conv, run_conv, tagCPUGPU, key):
+    """
+    returns the fastest KeOps routine for the reduction identified by key.
+    make_conv(tag1D2D, cpu_scheme) must return the routine compiled for the given
+    scheme, and run_conv(conv) must perform a complete (synchronized) call to it.
+    N.B. the scheme is given to make_conv, and not through the global flags of
+    keopscore, so that compilations running in other threads are not affected.
+    """
+    schemes = candidates[tagCPUGPU]
+    decision = autotune_db.get(key)
+    if decision is None or decision["scheme"] not in schemes:
+        timings = {}
+        for name, (tag1D2D, cpu_scheme) in schemes.items():
+            conv = make_conv(tag1D2D, cpu_scheme)
+            run_conv(conv)
+            elapsed = []
+            for _ in range(n_repeats):
+                start = time.perf_counter()
+                run_conv(conv)
+                elapsed.append(time.perf_counter() - start)
+            timings[name] = min(elapsed)
+        best = min(timings, key=timings.get)
+        pyKeOps_Message(f"Autotuning : using {best} scheme for this reduction.")
+        decision = {"scheme": best, "timings": timings}
+        autotune_db.set(key, decision)
+    return make_conv(*schemes[decision["scheme"]])
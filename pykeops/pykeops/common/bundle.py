@@ -0,0 +1,101 @@
+import json
+import os
+import platform
+import shutil
+
+import keopscore
+import keopscore.config.config
+from keopscore.config.config import get_build_folder, get_cpp_flags_key
+
+from pykeops.common.utils import pyKeOps_Message
+
+###########################################################
+# Precompiled bundles : a bundle is a copy of the build folder containing the
+# compiled formulas and their info files, with a manifest describing the
+# environment they were compiled for. A bundle can be used as build folder
+# on another machine (e.g. a container without compiler and with a read-only
+# file system) : formulas which are not in the bundle then raise an error
+# which reports the missing formula, instead of being compiled.
+
+manifest_name = "keops_bundle.json"
+
+
+def bundle_environment():
+    return {
+        "keops_version": keopscore.__version__,
+        "cpp_flags": get_cpp_flags_key(),
+        "system": platform.system(),
+        "machine": platform.machine(),
+    }
+
+
+def is_bundle_file(name):
+    # lock files, temporary files, cache indices and probes of the environment are
+    # specific to the build folder, and the sources of the pykeops modules and the
+    # precompiled headers are only used for compiling. Modules of the build profiles
+    # other than "portable" (e.g. pykeops_cpp_7b9a611f7e_native.so) are specific
+    # to the instruction set of the current machine.
+    return not (
+        name.endswith((".lock", ".tmp"))
+        or (name.startswith("pykeops_cpp_") and "_" in name[len("pykeops_cpp_") :])
+        or "_cache." in name
+        or name.startswith(("env_probes_", "keops_cpu_prologue_"))
+        or (name.startswith("pykeops_cpp_") and name.endswith(".cpp"))
+        or name == manifest_name
+    )
+
+
+def export_bundle(path):
+    r"""
+    Exports the formulas compiled in the current build folder to the folder **path**.
+
+    The folder can then be loaded with :func:`load_bundle` on a machine with the same
+    version of KeOps, system and architecture, even without compiler.
+
+    Returns:
+        dict : the manifest of the bundle, which lists the exported formulas.
+    """
+    build_folder = get_build_folder()
+    if os.path.abspath(path) == os.path.abspath(build_folder):
+        raise ValueError("[pyKeOps] the bundle should not be the build folder itself.")
+    os.makedirs(path, exist_ok=True)
+    formulas = {}
+    for f in os.scandir(build_folder):
+        if not f.is_file() or not is_bundle_file(f.name):
+            continue
+        shutil.copy2(f.path, os.path.join(path, f.name))
+        if f.name.endswith(".nfo"):
+            with open(f.path) as info:
+                formulas[f.name[:-4]] = info.readline().rstrip()[len("red_formula=") :]
+    manifest = dict(bundle_environment(), formulas=formulas)
+    with open(os.path.join(path, manifest_name), "w") as f:
+        json.dump(manifest, f, indent=1)
+    pyKeOps_Message(f"{len(formulas)} formulas exported to {path}.")
+    return manifest
+
+
+def load_bundle(path, enable_compile=False):
+    r"""
+    Uses the bundle exported by :func:`export_bundle` in the folder **path** as build folder.
+
+    Keyword Args:
+        enable_compile (bool, default False): if False, formulas which are not in the
+            bundle raise an error, instead of being compiled.
+    """
+    import pykeops
+
+    manifest_file = os.path.join(path, manifest_name)
+    if not os.path.isfile(manifest_file):
+        raise ValueError(f"[pyKeOps] {path} is not a KeOps bundle (no {manifest_name}).")
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+    for key, value in bundle_environment().items():
+        if manifest.get(key) != value:
+            raise ValueError(
+                f"[pyKeOps] the bundle {path} is not compatible with the current environment : "
+                f"{key} is {manifest.get(key)} in the bundle and {value} here."
+            )
+    keopscore.config.config.set_enable_compile(int(enable_compile))
+    # the location of the bundle is not saved as default build folder
+    pykeops.set_build_folder(path, write_save_file=False)
+    return manifest
@@ -0,0 +1,27 @@
+from keopscore.utils.Cache import get_env_param
+from pykeops.common.autotune import get_enable_autotune
+
+###########################################################
+# Call plans : a Genred object keeps, for each structure of the inputs it has been
+# called with (shapes, dtypes, strides and device of the arrays, structure of the
+# ranges and of the output, options of the call), the plan made from its first call
+# with this structure (see LoadKeOps_cpp.CallPlan). Later calls with the same
+# structure skip the choice of the backend, the lookup of the formula and the
+# preparation of the arrays describing the inputs, and launch the kernel directly.
+# Plans are only made on Cpu, for calls which need no copy of the inputs.
+
+# maximum number of plans kept by a Genred object
+max_plans = 64
+
+
+def config_key():
+    # global options which change the formula used for a call
+    return get_env_param(), get_enable_autotune()
+
+
+def store_plan(plans, key, plan):
+    if plan is None:
+        return
+    if len(plans) >= max_plans:
+        plans.clear()
+    plans[key] = plan
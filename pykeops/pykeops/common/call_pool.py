@@ -0,0 +1,48 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+###########################################################
+# Pool of threads running the reductions submitted with Genred.submit and
+# LazyTensor.sum_async. The Cpu kernels are launched through ctypes, which
+# releases the GIL during the computation : other Python threads of the process
+# (data loaders, request handlers, ...) run while a kernel is running. Each Cpu
+# kernel uses all the cores with OpenMP, so that by default the submitted calls
+# are run one at a time, in the order of submission.
+
+call_workers = int(os.getenv("PYKEOPS_CALL_WORKERS", "0")) or 1
+
+
+def get_call_workers():
+    global call_workers
+    return call_workers
+
+
+def set_call_workers(val):
+    global call_workers, executor
+    if val < 1:
+        raise ValueError("[pyKeOps] the number of call workers should be positive.")
+    with lock:
+        call_workers = val
+        if executor is not None:
+            # submitted calls are not cancelled
+            executor.shutdown(wait=False)
+            executor = None
+
+
+executor = None
+lock = threading.Lock()
+
+
+def submit_call(fun, *args, **kwargs):
+    """
+    Runs fun(*args, **kwargs) in the pool, and returns the corresponding
+    concurrent.futures.Future.
+    """
+    global executor
+    with lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=call_workers, thread_name_prefix="pykeops_call"
+            )
+        return executor.submit(fun, *args, **kwargs)
@@ -0,0 +1,243 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pykeops.common.operations import grad_specs
+from pykeops.common.utils import pyKeOps_Message
+
+###########################################################
+# Pool of threads running the compilation of the pykeops cpp modules. The
+# generation of the code is done in the calling thread, and only the compiler
+# commands are run in the pool, so that several formulas can be built
+# concurrently. Compilations are identified by the name of the target module :
+# a module which is being compiled is never compiled twice, and its first call
+# waits for the end of the pending compilation. Other tasks (e.g. the generation
+# of the code of the gradients of a formula, see torch GenredAutograd) may also be
+# run in the pool with submit_task.
+
+compile_workers = (
+    int(os.getenv("PYKEOPS_COMPILE_WORKERS", "0")) or os.cpu_count() or 1
+)
+
+
+def get_compile_workers():
+    global compile_workers
+    return compile_workers
+
+
+def set_compile_workers(val):
+    global compile_workers, executor
+    if val < 1:
+        raise ValueError(
+            "[pyKeOps] the number of compile workers should be positive."
+        )
+    with lock:
+        compile_workers = val
+        if executor is not None:
+            # pending compilations are not cancelled
+            executor.shutdown(wait=False)
+            executor = None
+
+
+executor = None
+pending = {}
+lock = threading.Lock()
+
+
+def submit_compile(target, fun, *args):
+    """
+    Runs fun(*args) in the pool to build the module target, unless a compilation of
+    this module is already pending. Returns the corresponding future.
+    """
+    with lock:
+        future = pending.get(target)
+        if future is None:
+            future = get_executor().submit(fun, *args)
+            pending[target] = future
+        return future
+
+
+def submit_task(fun, *args):
+    """
+    Runs fun(*args) in the pool, and returns the corresponding future.
+    """
+    with lock:
+        return get_executor().submit(fun, *args)
+
+
+def get_executor():
+    # N.B. the lock must be held by the caller
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=compile_workers, thread_name_prefix="pykeops_compile"
+        )
+    return executor
+
+
+def wait_compile(target):
+    """
+    Waits for the end of the compilation of the module target, if it is pending.
+    Errors raised during the compilation are raised again here.
+    """
+    with lock:
+        future = pending.get(target)
+    if future is not None:
+        try:
+            future.result()
+        finally:
+            with lock:
+                if pending.get(target) is future:
+                    del pending[target]
+
+
+def compile_reduction(
+    formula,
+    aliases,
+    optional_flags,
+    rec_multVar_highdim,
+    tagCPUGPU,
+    tag1D2D,
+    tagHostDevice,
+    use_ranges,
+    device_id,
+    dtype,
+    lang,
+    strided_args=(),
+    grad_vars=(),
+    batch=True,
+    separate_formula=False,
+):
+    """
+    Generates the code of a reduction, and of its gradients with respect to the
+    variables of indices grad_vars, and submits their compilation. With batch=True,
+    the Cpu formulas are compiled in a single module. With separate_formula=True, the
+    reduction itself is compiled in its own module, so that its first call does not
+    wait for the compilation of its gradients. Returns the list of futures of the
+    submitted compilations.
+    """
+    from pykeops.common.keops_io import keops_binder
+    from pykeops.common.keops_io.LoadKeOps_cpp import compile_batch
+
+    def make_conv(formula_k, aliases_k, flags, rec_multVar_highdim_k):
+        flags = dict(flags, strided_args=strided_args)
+        if lang == "torch":
+            flags["multVar_highdim"] = 1 if rec_multVar_highdim_k else 0
+        return keops_binder["nvrtc" if tagCPUGPU else "cpp"].cls(
+            tagCPUGPU,
+            tag1D2D,
+            tagHostDevice,
+            use_ranges,
+            device_id,
+            formula_k,
+            aliases_k,
+            len(aliases_k),
+            dtype,
+            lang,
+            flags,
+            load=False,
+        )
+
+    conv = None
+    if separate_formula:
+        conv = make_conv(formula, aliases, optional_flags, rec_multVar_highdim)
+    with compile_batch(batch):
+        if conv is None:
+            conv = make_conv(formula, aliases, optional_flags, rec_multVar_highdim)
+        convs = [conv]
+        if grad_vars:
+            specs = grad_specs(
+                formula,
+                aliases,
+                optional_flags,
+                rec_multVar_highdim,
+                conv.params.dim,
+                conv.params.tagI,
+                grad_vars,
+            )
+            convs += [make_conv(*spec[:4]) for spec in specs]
+    futures = []
+    for conv in convs:
+        future = getattr(conv, "compile_future", None)
+        if future is not None and future not in futures:
+            futures.append(future)
+    return futures
+
+
+def precompile(
+    specs, dtype=None, backend="auto", grad=False, batch=True, wait=True
+):
+    r"""
+    Generates and compiles the code of several reductions at once, before their first call.
+
+    The generation of the code is done sequentially, and the compilations are run
+    concurrently by a pool of :func:`get_compile_workers` threads.
+
+    Args:
+        specs (list): reductions to be compiled, given as
+            :mod:`Genred <pykeops.torch.Genred>` objects (from the torch or numpy bindings)
+            or as reduced :class:`LazyTensor` objects which have not been called yet
+            (i.e. obtained with the ``call=False`` option).
+
+    Keyword Args:
+        dtype (string, default None): data type of the input arrays, e.g. ``"float32"``.
+            If None, the dtype of the LazyTensor is used, or ``"float32"`` for Genred objects.
+        backend (string, default ``"auto"``): backend for which the code is compiled,
+            as in a call to :mod:`Genred <pykeops.torch.Genred>`.
+        grad (bool, default False): if True, the formulas of the gradients with respect
+            to every variable (which are used by the torch backward) are also compiled.
+        batch (bool, default True): if True, the Cpu formulas of each reduction (and of
+            its gradients) are compiled in a single module, which saves the startup of
+            the compiler and the parsing of the headers for every formula. If False,
+            every formula is compiled in its own module, concurrently.
+        wait (bool, default True): if False, the function returns immediately, and the
+            first call of each reduction waits for the end of its compilation.
+
+    Returns:
+        list of :class:`concurrent.futures.Future`, one for each compiled module.
+
+    N.B. The code is compiled for dense computations on contiguous arrays without
+    batch dimensions. With the Gpu backend, formulas are compiled sequentially by nvrtc.
+    """
+    from pykeops.common.get_options import get_tag_backend
+    from pykeops import default_device_id
+
+    tagCPUGPU, tag1D2D, _ = get_tag_backend(backend, ())
+    device_id = default_device_id if tagCPUGPU == 1 else -1
+
+    futures = []
+    for spec in specs:
+        spec_dtype = dtype
+        if hasattr(spec, "__GenericLazyTensor__"):
+            if not hasattr(spec, "callfun"):
+                raise ValueError(
+                    "[pyKeOps] LazyTensor objects given to precompile should be reductions with a known dtype."
+                )
+            spec_dtype = spec_dtype or spec._dtype
+            spec = spec.callfun
+        spec_dtype = spec_dtype or "float32"
+        lang = "torch" if "torch" in type(spec).__module__ else "numpy"
+        tagHostDevice = 1 if (tagCPUGPU == 1 and lang == "torch") else 0
+
+        futures += compile_reduction(
+            spec.formula,
+            spec.aliases,
+            spec.optional_flags,
+            # N.B. the numpy bindings set the multVar_highdim flag at init
+            getattr(spec, "rec_multVar_highdim", None),
+            tagCPUGPU,
+            tag1D2D,
+            tagHostDevice,
+            False,
+            device_id,
+            spec_dtype,
+            lang,
+            grad_vars=range(len(spec.aliases)) if grad else (),
+            batch=batch,
+        )
+
+    if wait:
+        for future in futures:
+            future.result()
+        pyKeOps_Message(f"{len(futures)} modules compiled.")
+    return futures
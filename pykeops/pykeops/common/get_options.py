@@ -21,6 +21,8 @@ class SetBackend:
     possible_options_list = [
         "auto",
         "CPU",
+        "CPU_1D",
+        "CPU_2D",
         "GPU",
         "GPU_1D",
         "GPU_1D_device",
@@ -34,6 +36,7 @@ class SetBackend:
         """
         Try to make a good guess for the backend...  available methods are: (host means Cpu, device means Gpu)
            CPU : computations performed with the host from host arrays
+           CPU_2D : computations performed with the host from host arrays, splitting the reduction index between threads
            GPU_1D_device : computations performed on the device from device arrays, using the 1D scheme
            GPU_2D_device : computations performed on the device from device arrays, using the 2D scheme
            GPU_1D_host : computations performed on the device from host arrays, using the 1D scheme
@@ -65,7 +68,7 @@ class SetBackend:
                 self._find_grid(),
                 self._find_mem(variables),
             )
-        elif len(split_backend) == 2:  # GPU_1D or GPU_2D
+        elif len(split_backend) == 2:  # CPU_1D, CPU_2D, GPU_1D or GPU_2D
             return (
                 self.dev[split_backend[0]],
                 self.grid[split_backend[1]],
@@ -3,15 +3,25 @@ from functools import reduce
 
 import numpy as np
 
+from keopscore.config.config import get_build_profile
+from keopscore.config.tiles import get_cpu_scheme
+from keopscore.formulas.GetReduction import GetReduction
 from keopscore.get_keops_dll import get_keops_dll
 from pykeops.common.parse_type import parse_dtype_acc
 
 
+# C++ types used for half precision storage on Cpu
+cpu_half_storage = {"float16": "keops_half", "bfloat16": "keops_bfloat16"}
+
+
 class LoadKeOps:
     null_range = np.array([-1], dtype="int32")
     empty_ranges_new = tuple([null_range.__array_interface__["data"][0]] * 7)
 
-    def __init__(self, *args, fast_init):
+    def __init__(self, *args, fast_init, load=True):
+        # if load is False, the module is only built (possibly in the background),
+        # but not loaded.
+        self.load = load
         if fast_init:
             self.params = args[0]
         else:
@@ -28,7 +38,8 @@ class LoadKeOps:
 
             self.tools = numpytools
 
-        self.init_phase2()
+        if load:
+            self.init_phase2()
 
     def init(
         self,
@@ -77,7 +88,15 @@ class LoadKeOps:
         self.params.enable_chunks = optional_flags["enable_chunks"]
         self.params.enable_final_chunks = -1
         self.params.mult_var_highdim = optional_flags["multVar_highdim"]
+        self.params.strided_args = optional_flags["strided_args"]
         self.params.tagHostDevice = tagHostDevice
+        # compile flags of the Cpu modules (see keopscore/config/config.py)
+        self.params.build_profile = (
+            optional_flags.get("build_profile") or get_build_profile()
+        )
+        # Cpu 1D computation scheme : it is given for a call by the autotuner
+        # (see pykeops/common/autotune.py), and by the global flags otherwise
+        self.params.cpu_scheme = optional_flags.get("cpu_scheme") or get_cpu_scheme()
 
         if dtype == "float32":
             self.params.c_dtype = "float"
@@ -85,6 +104,12 @@ class LoadKeOps:
         elif dtype == "float64":
             self.params.c_dtype = "double"
             self.params.use_half = False
+        elif dtype in ("float16", "bfloat16") and tagCPUGPU == 0:
+            # on Cpu, half precision is used for storage only : input and output
+            # arrays are read and written directly, computations are done in float32.
+            self.params.c_dtype = cpu_half_storage[dtype]
+            self.params.c_dtype_acc = "float"
+            self.params.use_half = False
         elif dtype == "float16":
             self.params.c_dtype = "half2"
             self.params.use_half = True
@@ -94,8 +119,24 @@ class LoadKeOps:
         if not self.params.c_dtype_acc:
             self.params.c_dtype_acc = self.params.c_dtype
 
+        # reductions over both "i" and "j" : on Cpu, they are computed by the kernel
+        # (see keopscore CpuReducFull) ; on Gpu, with ranges or with local copies of
+        # the variables, the rows of the reduction over "j" are summed by genred.
+        self.params.full_reduction = bool(optional_flags.get("full_reduction"))
+        self.params.full_kernel = (
+            self.params.full_reduction
+            and tagCPUGPU == 0
+            and not use_ranges
+            and not self.params.strided_args
+            and dtype in ("float32", "float64")
+        )
+
         if tagCPUGPU == 0:
             map_reduce_id = "CpuReduc"
+            if self.params.full_kernel:
+                map_reduce_id += "Full"
+            elif tag1D2D == 1 and not use_ranges:
+                map_reduce_id += "2D"
         else:
             map_reduce_id = "GpuReduc"
             map_reduce_id += "1D" if tag1D2D == 0 else "2D"
@@ -103,6 +144,28 @@ class LoadKeOps:
         if use_ranges:
             map_reduce_id += "_ranges"
 
+        # arguments of get_keops_dll, kept to generate the code again if the files of
+        # the formula are removed from the build folder (see rebuild_formula)
+        self.params.dll_args = (
+            map_reduce_id,
+            self.params.red_formula_string,
+            self.params.enable_chunks,
+            self.params.enable_final_chunks,
+            self.params.mult_var_highdim,
+            self.params.cpu_scheme,
+            self.params.aliases,
+            nargs,
+            self.params.c_dtype,
+            self.params.c_dtype_acc,
+            self.params.sum_scheme,
+            self.params.tagHostDevice,
+            tagCPUGPU,
+            tag1D2D,
+            self.params.use_half,
+            device_id_request,
+            self.params.strided_args,
+        )
+
         (
             self.params.tag,
             self.params.source_name,
@@ -122,23 +185,7 @@ class LoadKeOps:
             dimsx,
             dimsy,
             dimsp,
-        ) = get_keops_dll(
-            map_reduce_id,
-            self.params.red_formula_string,
-            self.params.enable_chunks,
-            self.params.enable_final_chunks,
-            self.params.mult_var_highdim,
-            self.params.aliases,
-            nargs,
-            self.params.c_dtype,
-            self.params.c_dtype_acc,
-            self.params.sum_scheme,
-            self.params.tagHostDevice,
-            tagCPUGPU,
-            tag1D2D,
-            self.params.use_half,
-            device_id_request,
-        )
+        ) = get_keops_dll(*self.params.dll_args)
 
         # now we switch indsi, indsj and dimsx, dimsy in case tagI=1.
         # This is to be consistent with the convention used in the old
@@ -161,6 +208,16 @@ class LoadKeOps:
         self.params.nargs = nargs
 
         self.params.reduction_op = self.params.red_formula_string.split("(")[0]
+
+        # on Cpu, the reductions with indices (argmin, ...) write their indices in a
+        # separate int64 array (see output_arrays)
+        self.params.dimind = 0
+        if tagCPUGPU == 0:
+            red_formula = GetReduction(
+                self.params.red_formula_string, self.params.aliases
+            )
+            self.params.dimind = red_formula.dimind
+            self.params.dimfout = red_formula.formula.dim
         self.params.axis = 1 - self.params.tagI
 
         self.init_phase1()
@@ -168,6 +225,12 @@ class LoadKeOps:
     def init_phase1(self):
         pass
 
+    def rebuild_formula(self):
+        # the files of the formula have been removed from the build folder (e.g. by
+        # keopscore.utils.build_cache.evict_formulas), while its parameters are still
+        # cached : the code is generated again, without using the cache.
+        get_keops_dll.fun(*self.params.dll_args)
+
     def init_phase2(self):
         pass
 
@@ -188,24 +251,68 @@ class LoadKeOps:
                 args, self.params.aliases_old, self.params.axis, ranges, nx, ny
             )
 
+        # N.B. the params of the modules cached by previous versions of KeOps do not
+        # have these attributes
+        full_kernel = getattr(self.params, "full_kernel", False)
+        sum_rows = getattr(self.params, "full_reduction", False) and not full_kernel
+        if sum_rows and out is not None:
+            raise ValueError(
+                "[KeOps] the out argument of reductions over both i and j is only supported on Cpu, for contiguous float32 or float64 arrays without ranges."
+            )
+
         # get ranges argument
         if not ranges:
-            self.ranges_ptr_new = self.empty_ranges_new
+            ranges_ptr = self.empty_ranges_new
         else:
             ranges_shapes = self.tools.array(
                 [r.shape[0] for r in ranges], dtype="int32", device="cpu"
             )
             ranges = [*ranges, ranges_shapes]
-            self.ranges_ptr_new = tuple([self.tools.get_pointer(r) for r in ranges])
+            ranges_ptr = tuple([self.tools.get_pointer(r) for r in ranges])
 
-        self.args_ptr_new = tuple([self.tools.get_pointer(arg) for arg in args])
+        args_ptr = tuple([self.tools.get_pointer(arg) for arg in args])
 
-        # get all shapes of arguments
-        self.argshapes_new = tuple([arg.shape for arg in args])
+        # get all shapes of arguments, and strides of the non contiguous ones
+        argshapes, argstrides = self.arg_layout(args)
 
         # initialize output array
+        shapeout = self.output_shape(nx, ny, nbatchdims, args)
+        out_vals, out_ind = self.output_arrays(
+            shapeout, args[0].dtype, device_args, out
+        )
+
+        # the pointers and shapes of the call are given to the launch, so that
+        # calls from several threads do not share any state
+        self.call_keops(
+            nx,
+            ny,
+            ranges_ptr,
+            shapeout,
+            self.array_pointer(out_vals),
+            self.array_pointer(out_ind),
+            args_ptr,
+            argshapes,
+            argstrides,
+        )
+        out = self.output_result(out, out_vals, out_ind)
+
+        if self.params.use_half:
+            from pykeops.torch.half2_convert import postprocess_half2
+
+            out = postprocess_half2(out, tag_dummy, self.params.reduction_op, N)
+
+        if sum_rows:
+            out = self.tools.sum_rows(out)
+
+        return out
+
+    genred_pytorch = genred
+    genred_numpy = genred
 
+    def output_shape(self, nx, ny, nbatchdims, args):
         M = nx if self.params.tagI == 0 else ny
+        if getattr(self.params, "full_kernel", False):
+            M = 1
 
         if self.params.use_half:
             M += M % 2
@@ -217,30 +324,83 @@ class LoadKeOps:
             tmp = reduce(
                 np.maximum, batchdims_shapes
             )  # this is faster than np.max(..., axis=0)
-            shapeout = tuple(tmp) + (M, self.params.dim)
+            return tuple(tmp) + (M, self.params.dim)
         else:
-            shapeout = (M, self.params.dim)
-
+            return (M, self.params.dim)
+
+    def output_arrays(self, shapeout, dtype, device, out=None):
+        # returns the arrays written by the kernel : the output array, and the int64
+        # array of the indices of the reductions with indices on Cpu (None for the
+        # other reductions). The values of these reductions have the dtype of the
+        # inputs, and are not written if they are not part of the output (e.g. argmin).
+        dimind = getattr(self.params, "dimind", 0)
+        if not dimind:
+            if out is None:
+                out = self.tools.empty(shapeout, dtype=dtype, device=device)
+            return out, None
+        shape = tuple(shapeout[:-1])
+        out_vals = None
+        if shapeout[-1] > dimind:
+            out_vals = self.tools.empty(
+                shape + (shapeout[-1] - dimind,), dtype=dtype, device=device
+            )
+        out_ind = self.tools.empty(
+            shape + (dimind,), dtype=self.tools.dtype_from_name("int64"), device=device
+        )
+        return out_vals, out_ind
+
+    def output_result(self, out, out_vals, out_ind):
+        # returns the output of the call, from the arrays written by the kernel (see
+        # output_arrays) : for the reductions with indices on Cpu, the indices, or the
+        # pair of the values and the indices. If the output array out is given, they are
+        # copied in it, with the layout of the Gpu output (indices as floats).
+        if out_ind is None:
+            return out_vals
         if out is None:
-            out = self.tools.empty(shapeout, dtype=args[0].dtype, device=device_args)
-        self.out_ptr = self.tools.get_pointer(out)
-
-        self.outshape = out.shape
-
-        self.call_keops(nx, ny)
-
-        if self.params.dtype == "float16":
-            from pykeops.torch.half2_convert import postprocess_half2
-
-            out = postprocess_half2(out, tag_dummy, self.params.reduction_op, N)
-
+            return out_ind if out_vals is None else (out_vals, out_ind)
+        if out_vals is None:
+            out[...] = out_ind
+        else:
+            shape = tuple(out.shape[:-1]) + (-1, self.params.dimfout)
+            out_pairs = self.tools.view(out, shape[:-1] + (2, shape[-1]))
+            out_pairs[..., 0, :] = self.tools.view(out_vals, shape)
+            out_pairs[..., 1, :] = self.tools.view(out_ind, shape)
         return out
 
-    genred_pytorch = genred
-    genred_numpy = genred
-
-    def call_keops(self):
+    def array_pointer(self, x):
+        # address of the data of the array x, or NULL if x is None
+        return 0 if x is None else self.tools.get_pointer(x)
+
+    def arg_layout(self, args):
+        # shapes of the arguments, and row and column strides of the non contiguous
+        # arguments (zeros for the other ones)
+        argshapes = tuple([arg.shape for arg in args])
+        argstrides = []
+        if self.params.strided_args:
+            for k, arg in enumerate(args):
+                if k in self.params.strided_args:
+                    argstrides += self.tools.strides(arg)
+                else:
+                    argstrides += [0, 0]
+        return argshapes, tuple(argstrides)
+
+    def call_keops(
+        self,
+        nx,
+        ny,
+        ranges_ptr,
+        outshape,
+        out_ptr,
+        out_ind_ptr,
+        args_ptr,
+        argshapes,
+        argstrides,
+    ):
         pass
 
+    def make_plan(self, nx, ny, args, ranges, out):
+        # call plans are only available on Cpu (see LoadKeOps_cpp.CallPlan)
+        return None
+
     def import_module(self):
         return self
@@ -1,50 +1,152 @@
+import ctypes
 import os
-import sysconfig
+import platform
+import shutil
+import threading
+from contextlib import contextmanager
 
 import keopscore.config.config
-from keopscore.config.config import get_build_folder
+from keopscore.binders.cpp.precompiled_header import get_precompiled_header_flags
+from keopscore.config.config import get_build_folder, get_profile_flags
+from keopscore.utils.build_cache import evict_formulas, touch_formula
 from keopscore.utils.Cache import Cache_partial
+from keopscore.utils.code_gen_utils import get_hash_name
+from pykeops.common.compile_pool import submit_compile, wait_compile
 from pykeops.common.keops_io.LoadKeOps import LoadKeOps
-from pykeops.common.utils import pyKeOps_Message
-from keopscore.utils.misc_utils import KeOps_OS_Run
-from pykeops.config import pykeops_cpp_name, python_includes
+from pykeops.common.utils import pyKeOps_Message, pyKeOps_Warning
+from keopscore.utils.misc_utils import (
+    KeOps_Error,
+    KeOps_OS_Run,
+    file_lock,
+    tmp_file_name,
+    write_file_atomically,
+)
+from pykeops.config import pykeops_cpp_name
 
 
 class LoadKeOps_cpp_class(LoadKeOps):
-    def __init__(self, *args, fast_init=False):
-        super().__init__(*args, fast_init=fast_init)
+    def __init__(self, *args, fast_init=False, load=True):
+        super().__init__(*args, fast_init=fast_init, load=load)
 
     def init_phase1(self):
-        srcname = pykeops_cpp_name(tag=self.params.tag, extension=".cpp")
-
-        dllname = pykeops_cpp_name(
-            tag=self.params.tag, extension=sysconfig.get_config_var("EXT_SUFFIX")
-        )
-
-        if not os.path.exists(dllname):
-            f = open(srcname, "w")
-            f.write(self.get_pybind11_code())
-            f.close()
-            compile_command = f"{keopscore.config.config.cxx_compiler} {keopscore.config.config.cpp_flags} {python_includes} {srcname} -o {dllname}"
+        # the modules of the formula are specific to its build profile
+        self.module_tag = module_tag(self.params.tag, self.params.build_profile)
+        srcname = pykeops_cpp_name(tag=self.module_tag, extension=".cpp")
+
+        self.compile_future = None
+        self.dllname, self.entry_point = find_module(self.module_tag, self.params.tag)
+        if self.dllname is None:
+            if not keopscore.config.config.get_enable_compile():
+                KeOps_Error(
+                    f"module {os.path.basename(pykeops_cpp_name(tag=self.module_tag, extension='.so'))} (formula {self.params.red_formula_string}) "
+                    f"is not in the build folder {get_build_folder()}, and compilation of new formulas is disabled."
+                )
+            use_pgo = self.params.build_profile == "pgo" and pgo_available()
+            batch = getattr(batch_members, "members", None)
+            if batch is not None and not self.load and not use_pgo:
+                # the module is compiled with the other formulas of the batch
+                batch.append(self)
+                return
+            self.dllname = pykeops_cpp_name(tag=self.module_tag, extension=".so")
+            self.entry_point = "launch_pykeops_cpu"
+            if use_pgo:
+                # the instrumented module, which is built again after its first call
+                self.dllname = pykeops_cpp_name(
+                    tag=self.module_tag + "_gen", extension=".so"
+                )
+            # the compilation is run by the compile pool, and init_phase2 waits for it
             pyKeOps_Message(
-                "Compiling pykeops cpp " + self.params.tag + " module ... ",
+                "Compiling pykeops cpp " + self.module_tag + " module ... ",
                 flush=True,
-                end="",
+                end="" if self.load else "\n",
+            )
+            self.compile_future = submit_compile(
+                self.dllname,
+                self.compile,
+                srcname,
+                self.dllname,
+                "generate" if use_pgo else None,
             )
-            KeOps_OS_Run(compile_command)
-            pyKeOps_Message("OK", use_tag=False, flush=True)
-
-    def init_phase2(self):
-        import importlib
 
-        mylib = importlib.import_module(
-            os.path.basename(pykeops_cpp_name(tag=self.params.tag))
-        )
+    def compile(self, srcname, dllname, pgo=None):
+        # when several processes share the build folder, only the first one compiles
+        # the module, and the others wait for the lock. The module is compiled to a
+        # temporary file and then renamed, so that it is never loaded partially written.
+        with file_lock(dllname + ".lock"):
+            if os.path.exists(dllname):
+                return
+            if not os.path.exists(self.params.source_name):
+                self.rebuild_formula()
+            write_file_atomically(srcname, self.get_dispatch_code() + profile_dump_code)
+            compile_module(srcname, dllname, self.params.build_profile, pgo=pgo)
+        # the build folder may now exceed its size cap
+        evict_formulas()
 
-        self.launch_keops_cpu = mylib.launch_pykeops_cpu
+    def init_phase2(self):
+        if getattr(self, "dllname", None) is None or (
+            self.compile_future is None and not os.path.exists(self.dllname)
+        ):
+            # parameters were loaded from the cache file (or the module is missing)
+            self.init_phase1()
+        wait_compile(self.dllname)
+        if self.compile_future is not None:
+            pyKeOps_Message("OK", use_tag=False, flush=True)
 
-    def call_keops(self, nx, ny):
-        self.launch_keops_cpu(
+        self.load_module()
+        touch_formula(self.params.tag)
+        if self.entry_point != "launch_pykeops_cpu":
+            touch_file(self.dllname)
+        # with an instrumented module, the profile of the first call is used to build
+        # the optimized module (see update_pgo)
+        self.pgo_future = None
+        self.pgo_pending = self.dllname.endswith("_gen.so")
+        # the calls of the formula may run concurrently (see pykeops.common.call_pool) :
+        # only the replacement of the instrumented module is serialized
+        self.pgo_lock = threading.Lock()
+
+        # these arrays do not depend on the call
+        self.indsi_c = c_int_array(self.params.indsi)
+        self.indsj_c = c_int_array(self.params.indsj)
+        self.indsp_c = c_int_array(self.params.indsp)
+        self.dimsx_c = c_int_array(self.params.dimsx)
+        self.dimsy_c = c_int_array(self.params.dimsy)
+        self.dimsp_c = c_int_array(self.params.dimsp)
+
+    def load_module(self):
+        # the module exports the C function launch_pykeops_cpu (or, for a module built
+        # for a batch of formulas, one function launch_pykeops_cpu_<tag> per formula),
+        # with a fixed signature
+        self.module = ctypes.CDLL(self.dllname)
+        self.launch_keops_cpu = getattr(self.module, self.entry_point)
+        self.launch_keops_cpu.argtypes = launch_argtypes
+        self.launch_keops_cpu.restype = ctypes.c_int
+
+    def update_pgo(self):
+        # profile guided optimization : after the first call of the instrumented
+        # module, its profile is written and the optimized module is built by the
+        # compile pool. It is used by the first call after the end of the build.
+        dllname = pykeops_cpp_name(tag=self.module_tag, extension=".so")
+        if self.pgo_future is None:
+            self.module.dump_pykeops_profile()
+            srcname = pykeops_cpp_name(tag=self.module_tag, extension=".cpp")
+            self.pgo_future = submit_compile(
+                dllname, self.compile, srcname, dllname, "use"
+            )
+        elif self.pgo_future.done():
+            self.pgo_pending = False
+            try:
+                wait_compile(dllname)
+            except ValueError as e:
+                # the instrumented module is still used
+                pyKeOps_Warning(f"the optimized module could not be built : {e}")
+            shutil.rmtree(pgo_profile_dir(dllname), ignore_errors=True)
+            if os.path.exists(dllname):
+                self.dllname = dllname
+                self.load_module()
+
+    def launch_head(self, nx, ny):
+        # first arguments of the launch, which do not depend on the arrays
+        return (
             self.params.dimy,
             nx,
             ny,
@@ -53,102 +155,104 @@ class LoadKeOps_cpp_class(LoadKeOps):
             self.params.use_half,
             self.params.dimred,
             self.params.use_chunk_mode,
-            self.params.indsi,
-            self.params.indsj,
-            self.params.indsp,
+            len(self.params.indsi),
+            self.indsi_c,
+            len(self.params.indsj),
+            self.indsj_c,
+            len(self.params.indsp),
+            self.indsp_c,
             self.params.dim,
-            self.params.dimsx,
-            self.params.dimsy,
-            self.params.dimsp,
-            self.ranges_ptr_new,
-            self.outshape,
-            self.out_ptr,
-            self.args_ptr_new,
-            self.argshapes_new,
+            len(self.params.dimsx),
+            self.dimsx_c,
+            len(self.params.dimsy),
+            self.dimsy_c,
+            len(self.params.dimsp),
+            self.dimsp_c,
         )
 
-    def get_pybind11_code(self):
+    def call_keops(
+        self,
+        nx,
+        ny,
+        ranges_ptr,
+        outshape,
+        out_ptr,
+        out_ind_ptr,
+        args_ptr,
+        argshapes,
+        argstrides,
+    ):
+        # N.B. ctypes releases the GIL during the launch
+        self.launch_keops_cpu(
+            *self.launch_head(nx, ny),
+            c_pointer_array(ranges_ptr),
+            len(outshape),
+            c_int_array(outshape),
+            ctypes.c_void_p(out_ptr),
+            ctypes.c_void_p(out_ind_ptr),
+            len(args_ptr),
+            c_pointer_array(args_ptr),
+            c_int_array([len(shape) for shape in argshapes]),
+            c_int_array([n for shape in argshapes for n in shape]),
+            c_int_array(argstrides),
+        )
+        self.check_pgo()
+
+    def check_pgo(self):
+        if self.pgo_pending:
+            with self.pgo_lock:
+                if self.pgo_pending:
+                    self.update_pgo()
+
+    def make_plan(self, nx, ny, args, ranges, out):
+        # plan of a call, which was made with these sizes, arguments, ranges and output
+        params = self.params
+        if getattr(params, "full_reduction", False) and not params.full_kernel:
+            # the output of the kernel is summed afterwards (see LoadKeOps.genred)
+            return None
+        argshapes, argstrides = self.arg_layout(args)
+        nbatchdims = max(len(arg.shape) for arg in args) - 2
+        shapeout = self.output_shape(nx, ny, nbatchdims, args)
+        return CallPlan(self, nx, ny, args, argshapes, argstrides, ranges, shapeout)
+
+    def get_dispatch_code(self, entry_point="launch_pykeops_cpu"):
         return f"""
 #include "{self.params.source_name}"
 
-#include <pybind11/pybind11.h>
-namespace py = pybind11;
-
-template < typename TYPE >
-int launch_pykeops_{self.params.tag}_cpu(int dimY, int nx, int ny,
-                                         int tagI, int tagZero, int use_half,
-                                         int dimred,
-                                         int use_chunk_mode,
-                                         py::tuple py_indsi, py::tuple py_indsj, py::tuple py_indsp,
-                                         int dimout,
-                                         py::tuple py_dimsx, py::tuple py_dimsy, py::tuple py_dimsp,
-                                         py::tuple py_ranges,
-                                         py::tuple py_shapeout,
-                                         long out_void,
-                                         py::tuple py_arg,
-                                         py::tuple py_argshape){{
-
-    /*------------------------------------*/
-    /*         Cast input args            */
-    /*------------------------------------*/
-
-    std::vector< int > indsi_v(py_indsi.size());
-    for (auto i = 0; i < py_indsi.size(); i++)
-        indsi_v[i] = py::cast< int >(py_indsi[i]);
-
-
-    std::vector< int > indsj_v(py_indsj.size());
-    for (auto i = 0; i < py_indsj.size(); i++)
-        indsj_v[i] = py::cast< int >(py_indsj[i]);
-
-
-    std::vector< int > indsp_v(py_indsp.size());
-    for (auto i = 0; i < py_indsp.size(); i++)
-        indsp_v[i] = py::cast< int >(py_indsp[i]);
-
-
-    std::vector< int > dimsx_v(py_dimsx.size());
-    for (auto i = 0; i < py_dimsx.size(); i++)
-        dimsx_v[i] = py::cast< int >(py_dimsx[i]);
-
-
-    std::vector< int > dimsy_v(py_dimsy.size());
-    for (auto i = 0; i < py_dimsy.size(); i++)
-        dimsy_v[i] = py::cast< int >(py_dimsy[i]);
-        
-    
-    std::vector< int > dimsp_v(py_dimsp.size());
-    for (auto i = 0; i < py_dimsp.size(); i++)
-        dimsp_v[i] = py::cast< int >(py_dimsp[i]);
-
-
-    // Cast the ranges arrays
-    std::vector< int* > ranges_v(py_ranges.size());
-    for (int i = 0; i < py_ranges.size(); i++)
-        ranges_v[i] = (int*) py::cast< long >(py_ranges[i]);
-    int **ranges = (int**) ranges_v.data();
-    
-    std::vector< int > shapeout_v(py_shapeout.size());
-    for (auto i = 0; i < py_shapeout.size(); i++)
-        shapeout_v[i] = py::cast< int >(py_shapeout[i]);
-    
-    TYPE *out = (TYPE*) out_void;
-    // std::cout << "out_ptr : " << (long) out << std::endl;
-    
-    std::vector< TYPE* > arg_v(py_arg.size());
-    for (int i = 0; i < py_arg.size(); i++)
-        arg_v[i] = (TYPE*) py::cast< long >(py_arg[i]);
-    TYPE **arg = (TYPE**) arg_v.data();
-    
-    std::vector< std::vector< int > > argshape_v(py_argshape.size());
-    for (auto i = 0; i < py_argshape.size(); i++){{
-        py::tuple tmp = py_argshape[i];
-        std::vector< int > tmp_v(tmp.size());
-        for (auto j =0; j < tmp.size(); j++)
-            tmp_v[j] = py::cast< int >(tmp[j]);
-        argshape_v[i] = tmp_v;
-    }}
-
+#include <vector>
+
+// C entry point of the module, loaded with ctypes : arrays are given as
+// pointers with their sizes, and argshapes contains the concatenated shapes
+// of the arguments, with argndims[i] the number of dimensions of argument i.
+// The int64 array out_ind_void receives the indices of the reductions with
+// indices (argmin, ...), and is NULL for the other reductions.
+extern "C" int {entry_point}(int dimY, int nx, int ny,
+                                  int tagI, int tagZero, int use_half,
+                                  int dimred,
+                                  int use_chunk_mode,
+                                  int nindsi, int *indsi, int nindsj, int *indsj, int nindsp, int *indsp,
+                                  int dimout,
+                                  int ndimsx, int *dimsx, int ndimsy, int *dimsy, int ndimsp, int *dimsp,
+                                  int **ranges,
+                                  int nshapeout, int *shapeout,
+                                  void *out_void, void *out_ind_void,
+                                  int nargs, void **arg_void,
+                                  int *argndims, int *argshapes,
+                                  int *argstrides) {{
+
+    typedef {cpp_dtype[self.params.dtype]} TYPE;
+
+    std::vector< int > indsi_v(indsi, indsi + nindsi);
+    std::vector< int > indsj_v(indsj, indsj + nindsj);
+    std::vector< int > indsp_v(indsp, indsp + nindsp);
+    std::vector< int > dimsx_v(dimsx, dimsx + ndimsx);
+    std::vector< int > dimsy_v(dimsy, dimsy + ndimsy);
+    std::vector< int > dimsp_v(dimsp, dimsp + ndimsp);
+    std::vector< int > shapeout_v(shapeout, shapeout + nshapeout);
+
+    std::vector< std::vector< int > > argshape_v(nargs);
+    for (int i = 0, k = 0; i < nargs; k += argndims[i], i++)
+        argshape_v[i] = std::vector< int >(argshapes + k, argshapes + k + argndims[i]);
 
     return launch_keops_cpu_{self.params.tag}< TYPE >(dimY,
                                                       nx,
@@ -167,19 +271,299 @@ int launch_pykeops_{self.params.tag}_cpu(int dimY, int nx, int ny,
                                                       dimsp_v,
                                                       ranges,
                                                       shapeout_v,
-                                                      out,
-                                                      arg,
-                                                      argshape_v);
-
+                                                      (TYPE*) out_void,
+                                                      (int64_t*) out_ind_void,
+                                                      (TYPE**) arg_void,
+                                                      argshape_v,
+                                                      argstrides);
 }}
-
-PYBIND11_MODULE(pykeops_cpp_{self.params.tag}, m) {{
-    m.doc() = "pyKeOps: KeOps for pytorch through pybind11 (pytorch flavour).";
-    m.def("launch_pykeops_cpu", &launch_pykeops_{self.params.tag}_cpu < {cpp_dtype[self.params.dtype]} >, "Entry point to keops.");
-}}                     
             """
 
 
+def compile_module(srcname, dllname, profile=None, pgo=None):
+    # the shared headers are parsed once, in the precompiled header
+    tmpname = tmp_file_name(dllname)
+    profile_flags = get_profile_flags(profile)
+    flags = (
+        keopscore.config.config.cpp_flags
+        + profile_flags
+        + get_precompiled_header_flags(profile_flags)
+    )
+    if pgo is not None:
+        flags += pgo_flags(srcname, pgo)
+    compile_command = (
+        f"{keopscore.config.config.cxx_compiler} {flags} {srcname} -o {tmpname}"
+    )
+    KeOps_OS_Run(compile_command)
+    if not os.path.exists(tmpname):
+        raise ValueError(
+            f"[pyKeOps] the compilation of the module {os.path.basename(dllname)} "
+            f"failed (see the errors above), with the command :\n{compile_command}"
+        )
+    os.replace(tmpname, dllname)
+
+
+def module_tag(tag, profile):
+    # modules of the portable profile keep the name of the formula
+    return tag if profile == "portable" else f"{tag}_{profile}"
+
+
+###########################################################
+# Profile guided optimization (build profile "pgo") : the module is first built with
+# the instrumentation of GCC, in pykeops_cpp_<tag>_pgo_gen.so. Its first call writes
+# its profile in the folder pykeops_cpp_<tag>_pgo.pgo, and the module is then built
+# again with this profile, in pykeops_cpp_<tag>_pgo.so.
+
+# writes the profile of an instrumented module
+profile_dump_code = """
+#ifdef KEOPS_PROFILE_GENERATE
+extern "C" void __gcov_dump(void);
+extern "C" void dump_pykeops_profile() { __gcov_dump(); }
+#endif
+"""
+
+pgo_supported = None
+
+
+def pgo_available():
+    global pgo_supported
+    if pgo_supported is None:
+        # the instrumentation relies on the options of GCC
+        pgo_supported = platform.system() != "Darwin" and (
+            "clang" not in keopscore.config.config.cxx_compiler
+        )
+        if not pgo_supported:
+            pyKeOps_Warning(
+                "profile guided optimization needs GCC, the pgo build profile is "
+                "used without profile."
+            )
+    return pgo_supported
+
+
+def pgo_profile_dir(dllname):
+    return os.path.splitext(dllname)[0] + ".pgo"
+
+
+def pgo_flags(srcname, mode):
+    # both builds use the same source and -dumpbase option, which identify the
+    # profile files
+    base = os.path.splitext(srcname)[0]
+    if mode == "generate":
+        return (
+            f" -DKEOPS_PROFILE_GENERATE -fprofile-generate={base}.pgo"
+            f" -fprofile-update=prefer-atomic -dumpbase {base}"
+        )
+    return (
+        f" -fprofile-use={base}.pgo -fprofile-correction -Wno-missing-profile"
+        f" -Wno-coverage-mismatch -dumpbase {base}"
+    )
+
+
+def touch_file(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+###########################################################
+# Modules for batches of formulas : related formulas (e.g. a reduction and its
+# gradients) may be compiled in a single module pykeops_cpp_<batch tag>.so, which
+# exports one entry point launch_pykeops_cpu_<tag> per formula. For each formula,
+# the file pykeops_cpp_<tag>.batch contains the tag of its module (with the suffix
+# of the build profile, as for the modules of single formulas).
+
+# macros defined by the code of the formulas, which are undefined between formulas
+formula_macros = [
+    "C_CONTIGUOUS",
+    "USE_HALF",
+    "TILE_I",
+    "TILE_J",
+    "BLOCK_I",
+    "BLOCK_J",
+    "KEOPS_SIMD_BYTES",
+    "KEOPS_SIMD_LANES",
+    "do_keops_checks",
+    "Error_msg_no_cuda",
+]
+
+batch_members = threading.local()
+
+# batch modules being compiled : module tag of a formula -> name of the batch module,
+# entry point of the formula and future of the compilation
+pending_batches = {}
+
+
+def find_module(module_tag, tag):
+    # returns the name of the module containing the formula, and its entry point,
+    # or (None, None) if the formula has not been compiled
+    dllname = pykeops_cpp_name(tag=module_tag, extension=".so")
+    if os.path.exists(dllname):
+        return dllname, "launch_pykeops_cpu"
+    pending = pending_batches.get(module_tag)
+    if pending is not None:
+        if not pending[2].done():
+            # the first call waits for the compilation of the batch (see init_phase2)
+            return pending[:2]
+        pending_batches.pop(module_tag, None)
+    try:
+        with open(pykeops_cpp_name(tag=module_tag, extension=".batch")) as f:
+            batch_dllname = pykeops_cpp_name(tag=f.read(), extension=".so")
+    except OSError:
+        return None, None
+    if os.path.exists(batch_dllname):
+        return batch_dllname, "launch_pykeops_cpu_" + tag
+    return None, None
+
+
+@contextmanager
+def compile_batch(enable=True):
+    """
+    Context manager : the formulas which are not compiled yet, initialized in the
+    context with load=False, are compiled in a single module (for each build
+    profile), when exiting the context. Their attribute compile_future is then the
+    future of this compilation.
+    """
+    if not enable or getattr(batch_members, "members", None) is not None:
+        yield
+        return
+    batch_members.members = members = []
+    try:
+        yield
+    finally:
+        batch_members.members = None
+    profiles = {}
+    for conv in members:
+        profiles.setdefault(conv.params.build_profile, {})[conv.params.tag] = conv
+    for profile, convs in profiles.items():
+        convs = list(convs.values())
+        if len(convs) == 1:
+            # a single formula is compiled in its own module
+            convs[0].init_phase1()
+            continue
+        tag = module_tag(
+            get_hash_name(*sorted(conv.params.tag for conv in convs)), profile
+        )
+        dllname = pykeops_cpp_name(tag=tag, extension=".so")
+        pyKeOps_Message(
+            f"Compiling pykeops cpp {tag} module ({len(convs)} formulas) ... ",
+            flush=True,
+        )
+        future = submit_compile(dllname, compile_batch_module, convs, tag, profile)
+        for conv in convs:
+            conv.dllname = dllname
+            conv.entry_point = "launch_pykeops_cpu_" + conv.params.tag
+            conv.compile_future = future
+            pending_batches[conv.module_tag] = (dllname, conv.entry_point, future)
+
+
+def compile_batch_module(members, tag, profile):
+    srcname = pykeops_cpp_name(tag=tag, extension=".cpp")
+    dllname = pykeops_cpp_name(tag=tag, extension=".so")
+    with file_lock(dllname + ".lock"):
+        if not os.path.exists(dllname):
+            code = ""
+            for conv in members:
+                if not os.path.exists(conv.params.source_name):
+                    conv.rebuild_formula()
+                code += "".join(f"#undef {macro}\n" for macro in formula_macros)
+                code += conv.get_dispatch_code(
+                    entry_point="launch_pykeops_cpu_" + conv.params.tag
+                )
+            write_file_atomically(srcname, code)
+            compile_module(srcname, dllname, profile)
+        if os.path.exists(dllname):
+            for conv in members:
+                write_file_atomically(
+                    pykeops_cpp_name(tag=conv.module_tag, extension=".batch"), tag
+                )
+    # the build folder may now exceed its size cap
+    evict_formulas()
+
+
+class CallPlan:
+    """
+    Call of a Cpu reduction, resolved for given shapes, dtypes and strides of the
+    input arrays, structure of the ranges and output : it is made from a regular
+    call of the reduction, and then launches the kernel directly, with the arrays
+    describing the inputs and the output built once.
+    """
+
+    def __init__(self, conv, nx, ny, args, argshapes, argstrides, ranges, shapeout):
+        self.conv = conv
+        self.get_pointer = conv.tools.get_pointer
+        self.outshape = tuple(shapeout)
+        self.dtype = args[0].dtype
+        self.device = conv.tools.device(args[0])
+        self.head = conv.launch_head(nx, ny)
+        self.outshape_c = c_int_array(self.outshape)
+        self.nargs = len(argshapes)
+        # dimensions, shapes and strides of the arguments
+        self.argarrays = (
+            c_int_array([len(shape) for shape in argshapes]),
+            c_int_array([n for shape in argshapes for n in shape]),
+            c_int_array(argstrides),
+        )
+        self.ranges_shapes = None
+        if ranges:
+            self.ranges_shapes = conv.tools.array(
+                [r.shape[0] for r in ranges], dtype="int32", device="cpu"
+            )
+        self.empty_ranges = c_pointer_array(conv.empty_ranges_new)
+
+    def __call__(self, args, ranges=None, out=None):
+        get_pointer = self.get_pointer
+        conv = self.conv
+        out_vals, out_ind = conv.output_arrays(
+            self.outshape, self.dtype, self.device, out
+        )
+        if ranges:
+            ranges_ptr = c_pointer_array(
+                [get_pointer(r) for r in ranges] + [get_pointer(self.ranges_shapes)]
+            )
+        else:
+            ranges_ptr = self.empty_ranges
+        # N.B. the module of the formula may change (see LoadKeOps_cpp_class.update_pgo)
+        conv.launch_keops_cpu(
+            *self.head,
+            ranges_ptr,
+            len(self.outshape),
+            self.outshape_c,
+            ctypes.c_void_p(conv.array_pointer(out_vals)),
+            ctypes.c_void_p(conv.array_pointer(out_ind)),
+            self.nargs,
+            c_pointer_array([get_pointer(arg) for arg in args]),
+            *self.argarrays,
+        )
+        conv.check_pgo()
+        return conv.output_result(out, out_vals, out_ind)
+
+
+def c_int_array(values):
+    return (ctypes.c_int * len(values))(*values)
+
+
+def c_pointer_array(pointers):
+    return (ctypes.c_void_p * len(pointers))(*pointers)
+
+
+c_int_p = ctypes.POINTER(ctypes.c_int)
+c_void_p_p = ctypes.POINTER(ctypes.c_void_p)
+
+# types of the arguments of launch_pykeops_cpu (see get_dispatch_code)
+launch_argtypes = (
+    [ctypes.c_int] * 8  # dimY, nx, ny, tagI, tagZero, use_half, dimred, use_chunk_mode
+    + [ctypes.c_int, c_int_p] * 3  # indsi, indsj, indsp
+    + [ctypes.c_int]  # dimout
+    + [ctypes.c_int, c_int_p] * 3  # dimsx, dimsy, dimsp
+    + [c_void_p_p]  # ranges
+    + [ctypes.c_int, c_int_p]  # shapeout
+    + [ctypes.c_void_p, ctypes.c_void_p]  # out_void, out_ind_void
+    + [ctypes.c_int, c_void_p_p]  # arg_void
+    + [c_int_p, c_int_p, c_int_p]  # argndims, argshapes, argstrides
+)
+
+
 LoadKeOps_cpp = Cache_partial(
     LoadKeOps_cpp_class, use_cache_file=True, save_folder=get_build_folder()
 )
@@ -189,4 +573,6 @@ cpp_dtype = {
     "float32": "float",
     "double": "double",
     "float64": "double",
+    "float16": "keops_half",
+    "bfloat16": "keops_bfloat16",
 }
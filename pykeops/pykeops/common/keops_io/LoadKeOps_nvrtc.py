@@ -4,6 +4,7 @@ import keopscore.config.config
 from keopscore.config.config import get_build_folder
 import pykeops
 from keopscore.binders.nvrtc.Gpu_link_compile import Gpu_link_compile
+from keopscore.utils.build_cache import touch_formula
 from keopscore.utils.Cache import Cache_partial
 from pykeops.common.keops_io.LoadKeOps import LoadKeOps
 from pykeops.common.utils import pyKeOps_Message
@@ -11,13 +12,16 @@ from keopscore.utils.misc_utils import KeOps_OS_Run
 
 
 class LoadKeOps_nvrtc_class(LoadKeOps):
-    def __init__(self, *args, fast_init=False):
-        super().__init__(*args, fast_init=fast_init)
+    def __init__(self, *args, fast_init=False, load=True):
+        super().__init__(*args, fast_init=fast_init, load=load)
 
     def init_phase2(self):
-        import importlib
+        if not os.path.exists(self.params.low_level_code_file):
+            # parameters were loaded from the cache file, but the formula is missing
+            self.rebuild_formula()
+        touch_formula(self.params.tag)
 
-        pykeops_nvrtc = importlib.import_module("pykeops_nvrtc")
+        pykeops_nvrtc = import_pykeops_nvrtc()
 
         if self.params.c_dtype == "float":
             self.launch_keops = pykeops_nvrtc.KeOps_module_float(
@@ -38,7 +42,19 @@ class LoadKeOps_nvrtc_class(LoadKeOps):
                 self.params.low_level_code_file,
             )
 
-    def call_keops(self, nx, ny):
+    def call_keops(
+        self,
+        nx,
+        ny,
+        ranges_ptr,
+        outshape,
+        out_ptr,
+        out_ind_ptr,
+        args_ptr,
+        argshapes,
+        argstrides,
+    ):
+        # N.B. on Gpu, indices are encoded as floats in the output array
         self.launch_keops(
             self.params.tagHostDevice,
             self.params.dimy,
@@ -58,23 +74,38 @@ class LoadKeOps_nvrtc_class(LoadKeOps):
             self.params.dimsx,
             self.params.dimsy,
             self.params.dimsp,
-            self.ranges_ptr_new,
-            self.outshape,
-            self.out_ptr,
-            self.args_ptr_new,
-            self.argshapes_new,
+            ranges_ptr,
+            outshape,
+            out_ptr,
+            args_ptr,
+            argshapes,
         )
 
     def import_module(self):
         return self
 
 
+def import_pykeops_nvrtc():
+    # the module is loaded from its path, since the build folder is not in sys.path
+    import importlib.util
+    import sys
+
+    if "pykeops_nvrtc" not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            "pykeops_nvrtc", pykeops.config.pykeops_nvrtc_name(type="target")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules["pykeops_nvrtc"] = module
+    return sys.modules["pykeops_nvrtc"]
+
+
 def compile_jit_binary():
     """
     This function compile the main .so entry point to keops_nvrt binder...
     """
     compile_command = Gpu_link_compile.get_compile_command(
-        extra_flags=pykeops.config.python_includes,
+        extra_flags=pykeops.config.get_python_includes(),
         sourcename=pykeops.config.pykeops_nvrtc_name(type="src"),
         dllname=pykeops.config.pykeops_nvrtc_name(type="target"),
     )
@@ -1,7 +1,13 @@
+import os
 import keopscore.config
 
 if keopscore.config.config.use_cuda:
     from . import LoadKeOps_nvrtc, LoadKeOps_cpp
+    import pykeops.config
+
+    # the jit binary of pykeops is built when the binders are first needed
+    if not os.path.exists(pykeops.config.pykeops_nvrtc_name(type="target")):
+        LoadKeOps_nvrtc.compile_jit_binary()
 
     keops_binder = {
         "nvrtc": LoadKeOps_nvrtc.LoadKeOps_nvrtc,
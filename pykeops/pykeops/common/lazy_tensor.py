@@ -1,5 +1,6 @@
 import copy
 import re
+from concurrent.futures import Future
 
 import math
 
@@ -27,6 +28,18 @@ def is_complex_lazytensor(x):
     return isinstance(x, ComplexGenericLazyTensor)
 
 
+# Genred objects of the reductions of LazyTensors, identified by their formulas
+# (with the variables numbered by fixvariables), reduction and options : a reduction
+# built again with new arrays, e.g. at each iteration of a loop, reuses the object
+# of the first one, and its call plans.
+cached_genreds = {}
+max_cached_genreds = 256
+
+# variables of the formulas, before and after fixvariables
+var_id_pattern = re.compile(r"\bVar\((\d+),\d+,([012])\)")
+var_label_pattern = re.compile(r"\bVar\((\d+),")
+
+
 class GenericLazyTensor:
     r"""Symbolic wrapper for NumPy arrays and PyTorch tensors. This is the abstract class,
     end user should use :class:`pykeops.numpy.LazyTensor` or :class:`pykeops.torch.LazyTensor`.
@@ -280,27 +293,27 @@ class GenericLazyTensor:
             if device is not None:
                 break
         i = self.new_variable_index()
+        # categories of the variables "Var(idv,dim,cat)" of the formulas, by idv
+        cats = {}
+        for idv, cat in var_id_pattern.findall(self.formula + self.formula2):
+            cats.setdefault(int(idv), cat)
+        labels = {}
         # So let's loop over our tensors, and give them labels:
         for v in self.variables:
             idv = id(v)
             if type(v) == list and self._dtype is not None:
                 v = self.tools.array(v, self._dtype, device)
 
-            # Replace "Var(idv," by "Var(i," and increment 'i' :
-            tag = "Var({},".format(idv)
-            if tag in self.formula + self.formula2:
-                self.formula = self.formula.replace(tag, "Var({},".format(i))
-                self.formula2 = self.formula2.replace(tag, "Var({},".format(i))
+            # "Var(idv," will be replaced by "Var(i," and 'i' is incremented :
+            if idv in cats and idv not in labels:
+                labels[idv] = i
                 if hasattr(
                     v, "shape"
                 ):  # (because v might still be a Python list of floats)
                     # here we add dummy dims to v ( i.e. replace v by v[None,..,None,...])
                     # if needed.
                     # First we detect if v is meant to be used as a variable or as a parameter:
-                    str_cat_v = re.search(
-                        r"Var\({},\d+,([012])\)".format(i), self.formula + self.formula2
-                    ).group(1)
-                    is_variable = 1 if str_cat_v in ("0", "1") else 0
+                    is_variable = 1 if cats[idv] in ("0", "1") else 0
                     dims_to_pad = self.nbatchdims + 1 + is_variable - len(v.shape)
                     padded_v = self.tools.view(v, (1,) * dims_to_pad + v.shape)
                     newvars += (padded_v,)
@@ -313,6 +326,14 @@ class GenericLazyTensor:
                     self.rec_multVar_highdim = i
                 i += 1
 
+        # all the labels are set in a single pass over the formulas
+        def label(match):
+            idv = int(match.group(1))
+            return f"Var({labels[idv]}," if idv in labels else match.group(0)
+
+        self.formula = var_label_pattern.sub(label, self.formula)
+        self.formula2 = var_label_pattern.sub(label, self.formula2)
+
         # "VarSymb(..)" appear when users rely on the "LazyTensor(Ind,Dim,Cat)" syntax,
         # for the sake of disambiguation:
         self.formula = self.formula.replace(
@@ -325,12 +346,43 @@ class GenericLazyTensor:
             self.formula2 = None  # The pre-processing step is now over
         self.variables = newvars
 
+    def get_genred(self, kwargs_init):
+        r"""Returns the :mod:`Genred()` object of the reduction, once its variables are fixed."""
+        # the formulas do not depend on the arrays after fixvariables : the object is
+        # shared by the reductions with the same structure (see cached_genreds)
+        key = (
+            self.Genred,
+            self.formula,
+            self.formula2,
+            self.reduction_op,
+            self.axis,
+            repr(self.opt_arg),
+            repr(kwargs_init),
+            self.rec_multVar_highdim,
+        )
+        genred = cached_genreds.get(key)
+        if genred is None:
+            genred = self.Genred(
+                self.formula,
+                [],
+                reduction_op=self.reduction_op,
+                axis=self.axis,
+                opt_arg=self.opt_arg,
+                formula2=self.formula2,
+                **kwargs_init,
+                rec_multVar_highdim=self.rec_multVar_highdim,
+            )
+            if len(cached_genreds) >= max_cached_genreds:
+                cached_genreds.clear()
+            cached_genreds[key] = genred
+        return genred
+
     def separate_kwargs(self, kwargs):
         # separating keyword arguments for Genred init vs Genred call...
-        # Currently the only four additional optional keyword arguments that are passed to Genred init
+        # Currently the only additional optional keyword arguments that are passed to Genred init
         # are accuracy options: dtype_acc, use_double_acc and sum_scheme,
         # chunk mode option enable_chunks,
-        # and compiler option optional_flags.
+        # and compiler options optional_flags and build_profile.
         kwargs_init = []
         kwargs_call = []
         for key in kwargs:
@@ -340,6 +392,7 @@ class GenericLazyTensor:
                 "sum_scheme",
                 "enable_chunks",
                 "optional_flags",
+                "build_profile",
             ):
                 kwargs_init += [(key, kwargs[key])]
             else:
@@ -662,7 +715,8 @@ class GenericLazyTensor:
           opt_arg: typically, some integer needed by ArgKMin reductions ; depends on the reduction.
           axis (integer): The axis with respect to which the reduction should be performed.
             Supported values are **nbatchdims** and **nbatchdims + 1**, where **nbatchdims** is the number of "batch" dimensions before the last three
-            (:math:`i` indices, :math:`j` indices, variables' dimensions).
+            (:math:`i` indices, :math:`j` indices, variables' dimensions). For the "Sum" reduction, the tuple
+            **(nbatchdims, nbatchdims + 1)** reduces over both :math:`i` and :math:`j` indices, with an output of a single line.
           dim (integer): alternative keyword for the **axis** argument.
           call (True or False): Should we actually perform the reduction on the current variables?
             If **True**, the returned object will be a NumPy array or a PyTorch tensor.
@@ -702,6 +756,9 @@ class GenericLazyTensor:
                 accuracy for large sized data.
           enable_chunks (bool, default True): enable automatic selection of special "chunked" computation mode for accelerating reductions
                                 with formulas involving large dimension variables.
+          build_profile (string, default None): for Cpu mode only, compile flags of the module, e.g. ``"native"``
+            or ``"pgo"`` (see :class:`Genred <pykeops.torch.Genred>`). If None, the global profile set with
+            ``pykeops.set_build_profile`` is used.
           out (2d NumPy array or PyTorch Tensor, None by default): The output numerical array, for in-place computation.
               If provided, the output array should all have the same ``dtype``, be **contiguous** and be stored on
               the **same device** as the arguments. Moreover it should have the correct shape for the output.
@@ -715,10 +772,19 @@ class GenericLazyTensor:
 
         if axis is None:
             axis = dim  # NumPy uses axis, PyTorch uses dim...
-        if axis - self.nbatchdims not in (0, 1):
+        if isinstance(axis, (tuple, list)):
+            # reduction over both i and j (see Genred)
+            if sorted(axis) != [self.nbatchdims, self.nbatchdims + 1]:
+                raise ValueError(
+                    "Reductions over both i and j must be called with 'axis' (or 'dim') equal to the number of batch dimensions + (0, 1)."
+                )
+            red_axis = (0, 1)
+        elif axis - self.nbatchdims not in (0, 1):
             raise ValueError(
                 "Reductions must be called with 'axis' (or 'dim') equal to the number of batch dimensions + 0 or 1."
             )
+        else:
+            red_axis = axis - self.nbatchdims
 
         if other is None:
             res = self.init(is_complex=is_complex)  # ~ self.copy()
@@ -729,14 +795,18 @@ class GenericLazyTensor:
 
         res.formula = self.formula
         res.reduction_op = reduction_op
-        res.axis = axis - self.nbatchdims
+        res.axis = red_axis
         res.opt_arg = opt_arg
 
         kwargs_init, kwargs_call = self.separate_kwargs(kwargs)
 
         res.kwargs = kwargs_call
         res.ndim = self.ndim
-        if reduction_op == "Sum" and hasattr(self, "rec_multVar_highdim"):
+        if (
+            reduction_op == "Sum"
+            and hasattr(self, "rec_multVar_highdim")
+            and red_axis != (0, 1)
+        ):
             # this means we have detected that the reduction is of the form Sum(F*V) with V a high dimension variable.
             if res.axis != self.rec_multVar_highdim[1].axis:
                 # special case of multiplication with a variable V : we define a special tag to enable factorization in case
@@ -755,16 +825,7 @@ class GenericLazyTensor:
         if res._dtype is not None:
             res.fixvariables()  # Turn the "id(x)" numbers into consecutive labels
             # "res" now becomes a callable object:
-            res.callfun = res.Genred(
-                res.formula,
-                [],
-                reduction_op=res.reduction_op,
-                axis=res.axis,
-                opt_arg=res.opt_arg,
-                formula2=res.formula2,
-                **kwargs_init,
-                rec_multVar_highdim=res.rec_multVar_highdim,
-            )
+            res.callfun = res.get_genred(kwargs_init)
         if call and len(res.symbolic_variables) == 0 and res._dtype is not None:
             return res()
         else:
@@ -895,6 +956,13 @@ class GenericLazyTensor:
         r"""
         Executes a :mod:`Genred <pykeops.torch.Genred>` or :mod:`KernelSolve <pykeops.torch.KernelSolve>` call on the input data, as specified by **self.formula** .
         """
+        args = self.prepare_call(args, kwargs)
+        return self.callfun(*args, *self.variables, **self.kwargs)
+
+    def prepare_call(self, args, kwargs):
+        r"""
+        Builds the :mod:`Genred <pykeops.torch.Genred>` or :mod:`KernelSolve <pykeops.torch.KernelSolve>` object of a call, and returns its arguments.
+        """
         if not hasattr(self, "reduction_op"):
             raise ValueError(
                 "A LazyTensor object may be called only if it corresponds to the output of a reduction operation or solve operation."
@@ -930,16 +998,7 @@ class GenericLazyTensor:
                     rec_multVar_highdim=self.rec_multVar_highdim,
                 )
             else:
-                self.callfun = self.Genred(
-                    self.formula,
-                    [],
-                    self.reduction_op,
-                    self.axis,
-                    opt_arg=self.opt_arg,
-                    formula2=self.formula2,
-                    **kwargs_init,
-                    rec_multVar_highdim=self.rec_multVar_highdim,
-                )
+                self.callfun = self.get_genred(kwargs_init)
 
         if self.reduction_op == "Solve" and len(self.other.symbolic_variables) == 0:
             # here args should be empty, according to our rule
@@ -948,7 +1007,7 @@ class GenericLazyTensor:
             # we replace by other
             args = (self.other.variables[0],)
 
-        return self.callfun(*args, *self.variables, **self.kwargs)
+        return args
 
     def __str__(self):
         r"""
@@ -1862,13 +1921,14 @@ class GenericLazyTensor:
 
           - if **axis or dim = 0**, return the sum reduction of **self** over the "i" indexes.
           - if **axis or dim = 1**, return the sum reduction of **self** over the "j" indexes.
+          - if **axis or dim = (0, 1)**, return the sum reduction of **self** over both the "i" and "j" indexes, as a single line.
           - if **axis or dim = 2**, return a new :class:`LazyTensor` object representing the sum of the values of the vector **self**,
 
         Keyword Args:
           axis (integer): reduction dimension, which should be equal to the number
             of batch dimensions plus 0 (= reduction over :math:`i`),
-            1 (= reduction over :math:`j`) or 2 (i.e. -1, sum along the
-            dimension of the vector variable).
+            1 (= reduction over :math:`j`), (0, 1) (= reduction over both) or 2
+            (i.e. -1, sum along the dimension of the vector variable).
           dim (integer): alternative keyword for the axis parameter.
           **kwargs: optional parameters that are passed to the :meth:`reduction` method.
 
@@ -1896,6 +1956,36 @@ class GenericLazyTensor:
         """
         return self.reduction("Sum", axis=axis, dim=dim, **kwargs)
 
+    def sum_async(self, axis=None, dim=None, **kwargs):
+        r"""
+        Sum reduction, computed in the background.
+
+        ``sum_async(axis, dim, **kwargs)`` prepares the sum reduction of **self**, as
+        :meth:`sum_reduction`, and runs it in the pool of
+        :func:`pykeops.get_call_workers` threads. It returns a
+        :class:`concurrent.futures.Future`, whose result is the output of the reduction.
+
+        Keyword Args:
+          axis (integer): reduction dimension, which should be equal to the number
+            of batch dimensions plus 0 (= reduction over :math:`i`),
+            or 1 (= reduction over :math:`j`).
+          dim (integer): alternative keyword for the axis parameter.
+          **kwargs: optional parameters that are passed to the :meth:`reduction` method.
+
+        """
+        res = self.sum_reduction(axis=axis, dim=dim, call=False, **kwargs)
+        if not isinstance(res, GenericLazyTensor):
+            # the reduction has been computed as a product (see reduction)
+            future = Future()
+            future.set_result(res)
+            return future
+        if len(res.symbolic_variables) > 0 or res._dtype is None:
+            raise ValueError(
+                "[pyKeOps] sum_async requires a LazyTensor without symbolic variables."
+            )
+        args = res.prepare_call((), {})
+        return res.callfun.submit(*args, *res.variables, **res.kwargs)
+
     def logsumexp(self, axis=None, dim=None, weight=None, **kwargs):
         r"""
         Log-Sum-Exp reduction.
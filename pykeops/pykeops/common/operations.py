@@ -28,6 +28,75 @@ def preprocess(reduction_op, formula2):
     return reduction_op_internal, formula2
 
 
+def grad_specs(
+    formula, aliases, optional_flags, rec_multVar_highdim, dim, tagI, grad_vars
+):
+    # formulas of the gradients with respect to the variables of indices grad_vars, as
+    # built by GenredAutograd.backward for the torch bindings. For sum reductions, the
+    # gradients with respect to the variables indexed by i and the parameters are
+    # computed by a single reduction over j, and those with respect to the variables
+    # indexed by j by a single reduction over i (see GradConcat_WithSavedForward).
+    # The gradients with respect to parameters only are reductions over both i and
+    # j, which do not allocate an array of size M for their output ; the output of
+    # such a reduction, and its gradient, are parameters (see LoadKeOps.genred).
+    # Returns a list of (formula, aliases, optional_flags, rec_multVar_highdim,
+    # indices of the variables of the gradients), in the order of grad_vars.
+    from keopscore.formulas.GetReduction import GetReduction
+    from keopscore.formulas.reductions import (
+        Max_SumShiftExpWeight_Reduction,
+        Sum_Reduction,
+    )
+    from pykeops.common.parse_type import get_type
+
+    nargs = len(aliases)
+    full_reduction = bool(optional_flags.get("full_reduction"))
+    cat_out = 2 if full_reduction else tagI
+    eta = f"Var({nargs},{dim},{cat_out})"
+    resvar = f"Var({nargs + 1},{dim},{cat_out})"
+    aliases_g = aliases + [eta, resvar]
+    variables = []
+    for var_ind, sig in enumerate(aliases):
+        name, cat, dimvar, pos = get_type(sig, position_in_list=var_ind)
+        variables.append((name, cat, f"Var({pos},{dimvar},{cat})", pos))
+    red_formula = GetReduction(
+        formula, [f"{name}={var}" for name, _, var, _ in variables if name]
+    )
+    fuse = isinstance(red_formula, (Sum_Reduction, Max_SumShiftExpWeight_Reduction))
+    groups = {}
+    for var_ind in grad_vars:
+        _, cat, var, pos = variables[var_ind]
+        if not isinstance(rec_multVar_highdim, bool) and pos == rec_multVar_highdim:
+            # the gradient with respect to the high dimension variable V of a
+            # reduction of the type sum(F*V) is of the same type : it is computed
+            # separately, as such
+            groups["var", var_ind] = ([var], [var_ind], [cat], nargs)
+        else:
+            key = ("cat", cat % 2) if fuse else ("var", var_ind)
+            group = groups.setdefault(key, ([], [], [], None))
+            group[0].append(var)
+            group[1].append(var_ind)
+            group[2].append(cat)
+    res = []
+    for vars_g, var_inds, cats, rec_multVar_highdim_g in groups.values():
+        flags = optional_flags
+        full_reduction_g = fuse and all(cat == 2 for cat in cats)
+        if full_reduction or full_reduction_g:
+            flags = dict(optional_flags, full_reduction=full_reduction_g)
+        if len(vars_g) == 1:
+            formula_g = (
+                f"Grad_WithSavedForward({formula}, {vars_g[0]}, {eta}, {resvar})"
+            )
+        else:
+            formula_g = (
+                f"GradConcat_WithSavedForward({formula}, [{','.join(vars_g)}], "
+                f"{eta}, {resvar})"
+            )
+        res.append(
+            (formula_g, aliases_g, flags, rec_multVar_highdim_g, var_inds)
+        )
+    return res
+
+
 def postprocess(out, binding, reduction_op, nout, opt_arg, dtype):
     tools = get_tools(binding)
     # Post-processing of the output:
@@ -36,6 +105,7 @@ def postprocess(out, binding, reduction_op, nout, opt_arg, dtype):
         out = out[..., 2:] / out[..., 1][..., None]
     elif reduction_op == "ArgMin" or reduction_op == "ArgMax":
         # outputs are encoded as floats but correspond to indices, so we cast to integers
+        # (on Cpu, indices are already written as integers and nothing is done)
         out = tools.long(out)
     elif (
         reduction_op == "Min_ArgMin"
@@ -45,11 +115,11 @@ def postprocess(out, binding, reduction_op, nout, opt_arg, dtype):
     ):
         # output is one array of size N x 2D, giving min and argmin value for each dimension.
         # We convert to one array of floats of size NxD giving mins, and one array of size NxD giving argmins (casted to integers)
-        shape_out = out.shape
-        tmp = tools.view(out, shape_out[:-1] + (2, -1))
-        vals = tmp[..., 0, :]
-        indices = tmp[..., 1, :]
-        out = (vals, tools.long(indices))
+        # N.B. on Cpu the mins and the argmins are already written in two arrays.
+        if not isinstance(out, tuple):
+            shape_out = out.shape
+            tmp = tools.view(out, shape_out[:-1] + (2, -1))
+            out = (tmp[..., 0, :], tools.long(tmp[..., 1, :]))
     elif reduction_op == "KMin":
         # output is of size N x KD giving K minimal values for each dim. We convert to array of size N x K x D
         shape_out = out.shape
@@ -65,10 +135,15 @@ def postprocess(out, binding, reduction_op, nout, opt_arg, dtype):
             out = out.squeeze(-1)
     elif reduction_op == "KMin_ArgKMin" or reduction_op == "KMinArgKMin":
         # output is of size N x 2KD giving K min and argmin for each dim. We convert to 2 arrays of size N x K x D
-        # and cast to integers the second array
-        shape_out = out.shape
-        out = tools.view(out, shape_out[:-1] + (opt_arg, 2, -1))
-        out = (out[..., 0, :], tools.long(out[..., 1, :]))
+        # and cast to integers the second array (on Cpu, they are already written in two arrays)
+        if isinstance(out, tuple):
+            vals, indices = out
+            shape_out = vals.shape[:-1] + (opt_arg, -1)
+            out = (tools.view(vals, shape_out), tools.view(indices, shape_out))
+        else:
+            shape_out = out.shape
+            out = tools.view(out, shape_out[:-1] + (opt_arg, 2, -1))
+            out = (out[..., 0, :], tools.long(out[..., 1, :]))
         if out[0].shape[-1] == 1:
             out = (out[0].squeeze(-1), out[1].squeeze(-1))
     elif reduction_op == "LogSumExp":
@@ -1,6 +1,7 @@
 import re
 from collections import OrderedDict
 
+from keopscore.config.config import build_profiles
 from pykeops.common.utils import pyKeOps_Message
 
 categories = OrderedDict([("Vi", 0), ("Vj", 1), ("Pm", 2)])
@@ -128,7 +129,12 @@ def get_type(type_str, position_in_list=None):
 
 
 def get_optional_flags(
-    reduction_op_internal, dtype_acc, use_double_acc, sum_scheme, enable_chunks
+    reduction_op_internal,
+    dtype_acc,
+    use_double_acc,
+    sum_scheme,
+    enable_chunks,
+    build_profile=None,
 ):
     # 1. Options for accuracy
 
@@ -196,6 +202,22 @@ def get_optional_flags(
     else:
         optional_flags["enable_chunks"] = 0
 
+    # 3. Indices of the non contiguous input arrays, which are set at call time
+    # (on Cpu, 2D arrays may be used with arbitrary row and column strides)
+
+    optional_flags["strided_args"] = ()
+
+    # 4. Build profile of the Cpu modules (None means the global build profile, see
+    # keopscore/config/config.py)
+
+    if build_profile is not None and build_profile not in build_profiles:
+        raise ValueError(
+            pyKeOps_Message(
+                f"invalid value for option build_profile : should be one of {', '.join(build_profiles)}."
+            )
+        )
+    optional_flags["build_profile"] = build_profile
+
     return optional_flags
 
 
@@ -206,9 +228,9 @@ def parse_dtype_acc(dtype_acc, dtype):
         raise ValueError(
             "[KeOps] invalid parameter dtype_acc : should be either 'float32' or 'float64' when dtype is 'float32'"
         )
-    elif dtype == "float16" and dtype_acc not in ("float16", "float32"):
+    elif dtype in ("float16", "bfloat16") and dtype_acc not in (dtype, "float32"):
         raise ValueError(
-            "[KeOps] invalid parameter dtype_acc : should be either 'float16' or 'float32' when dtype is 'float16'"
+            f"[KeOps] invalid parameter dtype_acc : should be either '{dtype}' or 'float32' when dtype is '{dtype}'"
         )
     elif dtype == "float64" and dtype_acc not in "float64":
         raise ValueError(
@@ -224,6 +246,9 @@ def parse_dtype_acc(dtype_acc, dtype):
             dtype_acc = "float"
     elif dtype_acc == "float16":
         dtype_acc = "half2"
+    elif dtype_acc == "bfloat16":
+        # bfloat16 is a storage type only (Cpu), accumulation is done in float32
+        dtype_acc = "float"
     else:
         raise ValueError(
             '[KeOps] invalid value for option dtype_acc : should be one of "auto", "float16", "float32" or "float64".'
@@ -34,6 +34,25 @@ def cat2axis(cat):
         raise ValueError("Category should be Vi or Vj.")
 
 
+def parse_full_axis(axis, reduction_op):
+    """
+    Reductions over both "i" and "j" indices are requested with axis=(0, 1). They
+    are computed as reductions over "j" whose rows are summed (in the kernel on Cpu).
+    :param axis: 0, 1 or (0, 1)
+    :return: axis, full_reduction: the axis of the reduction over "j" (1) and True
+        for a reduction over both indices, axis and False otherwise
+    """
+    if not isinstance(axis, (tuple, list)):
+        return axis, False
+    if sorted(axis) != [0, 1]:
+        raise ValueError("Axis should be 0, 1 or (0, 1).")
+    if reduction_op != "Sum":
+        raise ValueError(
+            "[pyKeOps] reductions over both i and j are only implemented for the Sum reduction."
+        )
+    return 1, True
+
+
 def get_tools(lang):
     """
     get_tools is used to simulate template as in Cpp code. Depending on the langage
@@ -1,5 +1,5 @@
+import functools
 import importlib.util
-import sys
 import sysconfig
 from os.path import join, dirname, realpath
 
@@ -9,10 +9,20 @@ from os.path import join, dirname, realpath
 numpy_found = importlib.util.find_spec("numpy") is not None
 torch_found = importlib.util.find_spec("torch") is not None
 
-from keopscore.config.config import use_cuda as gpu_available
+import keopscore.config.config
 from keopscore.config.config import get_build_folder
 
 
+def __getattr__(name):
+    # gpu_available is only probed when first needed (see keopscore/config/config.py) ;
+    # it may be redefined later (e.g. by pykeops.torch)
+    if name == "gpu_available":
+        return keopscore.config.config.use_cuda
+    if name == "python_includes":
+        return get_python_includes()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def pykeops_nvrtc_name(type="src"):
     basename = "pykeops_nvrtc"
     extension = ".cpp" if type == "src" else sysconfig.get_config_var("EXT_SUFFIX")
@@ -32,4 +42,12 @@ def pykeops_cpp_name(tag="", extension=""):
     )
 
 
-python_includes = "$({python3} -m pybind11 --includes)".format(python3=sys.executable)
+@functools.lru_cache(maxsize=None)
+def get_python_includes():
+    # include flags of Python and pybind11 : they are only needed to compile the
+    # nvrtc binder (the Cpu modules are plain C shared objects, see LoadKeOps_cpp)
+    import pybind11
+
+    paths = sysconfig.get_paths()
+    includes = [paths["include"], paths["platinclude"], pybind11.get_include()]
+    return " ".join(f"-I{path}" for path in dict.fromkeys(includes))
@@ -1,9 +1,12 @@
 import numpy as np
 
+from pykeops.common.autotune import get_enable_autotune, autotune_key, autotune_conv
+from pykeops.common.call_plan import config_key, store_plan
+from pykeops.common.call_pool import submit_call
 from pykeops.common.get_options import get_tag_backend
 from pykeops.common.operations import preprocess, postprocess
 from pykeops.common.parse_type import get_sizes, complete_aliases, get_optional_flags
-from pykeops.common.utils import axis2cat
+from pykeops.common.utils import axis2cat, parse_full_axis
 from pykeops import default_device_id
 from pykeops.common.utils import pyKeOps_Warning
 
@@ -64,6 +67,7 @@ class Genred:
         sum_scheme="auto",
         enable_chunks=True,
         rec_multVar_highdim=False,
+        build_profile=None,
     ):
         r"""
         Instantiate a new generic operation.
@@ -103,6 +107,8 @@ class Genred:
 
                   - **axis** = 0: reduction with respect to :math:`i`, outputs a ``Vj`` or ":math:`j`" variable.
                   - **axis** = 1: reduction with respect to :math:`j`, outputs a ``Vi`` or ":math:`i`" variable.
+                  - **axis** = (0, 1): reduction with respect to both :math:`i` and :math:`j`, outputs a single line.
+                    Only the ``"Sum"`` reduction is supported.
 
             opt_arg (int, default = None): If **reduction_op** is in ``["KMin", "ArgKMin", "KMinArgKMin"]``,
                 this argument allows you to specify the number ``K`` of neighbors to consider.
@@ -135,6 +141,13 @@ class Genred:
                                 with formulas involving large dimension variables. Beware ! This will only work if the formula has the very special form
                                 that allows such computation mode.
 
+            build_profile (string, default None): for Cpu mode only, compile flags of the module, which is compiled
+                                for each profile. If None, the global profile set with ``pykeops.set_build_profile`` is used.
+                                The supported values are ``"portable"`` (the default global profile), ``"native"`` (the
+                                instruction set of the current machine), ``"native-fast-math"`` (with ``-ffast-math``, which
+                                may change rounding errors) and ``"pgo"`` (profile guided optimization : the module is built
+                                again with the profile of its first call).
+
         """
 
         if dtype:
@@ -146,6 +159,7 @@ class Genred:
                 "keyword argument cuda_type in Genred is deprecated ; argument is ignored."
             )
 
+        axis, full_reduction = parse_full_axis(axis, reduction_op)
         self.reduction_op = reduction_op
         reduction_op_internal, formula2 = preprocess(reduction_op, formula2)
 
@@ -155,7 +169,11 @@ class Genred:
             use_double_acc,
             sum_scheme,
             enable_chunks,
+            build_profile,
         )
+        if full_reduction:
+            # the rows of the reduction over "j" are summed (see LoadKeOps.genred)
+            self.optional_flags["full_reduction"] = True
 
         if rec_multVar_highdim:
             self.optional_flags["multVar_highdim"] = 1
@@ -176,6 +194,7 @@ class Genred:
             + ")"
         )
         self.aliases = complete_aliases(self.formula, aliases)
+        self.plans = {}
 
         self.axis = axis
         self.opt_arg = opt_arg
@@ -208,6 +227,7 @@ class Genred:
 
                     - ``"auto"`` (default): let KeOps decide which backend is best suited to your data, based on the tensors' shapes. ``"GPU_1D"`` will be chosen in most cases.
                     - ``"CPU"``: use a simple C++ ``for`` loop on a single CPU core.
+                    - ``"CPU_2D"``: on the CPU, split the reduction index between the threads and merge the partial results, which is faster when the number of output lines is small.
                     - ``"GPU_1D"``: use a `simple multithreading scheme <https://github.com/getkeops/keops/blob/main/keops/core/GpuConv1D.cu>`_ on the GPU - basically, one thread per value of the output index.
                     - ``"GPU_2D"``: use a more sophisticated `2D parallelization scheme <https://github.com/getkeops/keops/blob/main/keops/core/GpuConv2D.cu>`_ on the GPU.
                     - ``"GPU"``: let KeOps decide which one of the ``"GPU_1D"`` or the ``"GPU_2D"`` scheme will run faster on the given input.
@@ -284,6 +304,23 @@ class Genred:
             that is inferred from the **formula**.
         """
 
+        # calls with arrays of the same structure use the plan of the first one
+        plan_key = (
+            tuple((arg.shape, arg.dtype, arg.strides) for arg in args),
+            ranges and tuple((r.shape, r.strides) for r in ranges),
+            out is not None and (out.shape, out.dtype, out.strides),
+            backend,
+            device_id,
+            config_key(),
+        )
+        plan = self.plans.get(plan_key)
+        if plan is not None:
+            plan, nout, dtype = plan
+            out = plan(args, ranges, out)
+            return postprocess(
+                out, "numpy", self.reduction_op, nout, self.opt_arg, dtype
+            )
+
         # Get tags
         tagCPUGPU, tag1D2D, tagHostDevice = get_tag_backend(backend, args)
 
@@ -300,22 +337,39 @@ class Genred:
 
         from pykeops.common.keops_io import keops_binder
 
-        self.myconv = keops_binder["nvrtc" if tagCPUGPU else "cpp"](
-            tagCPUGPU,
-            tag1D2D,
-            tagHostDevice,
-            use_ranges,
-            device_id,
-            self.formula,
-            self.aliases,
-            len(args),
-            dtype,
-            "numpy",
-            self.optional_flags,
-        ).import_module()
-
-        # N.B.: KeOps C++ expects contiguous data arrays
-        test_contig = all(arg.flags["C_CONTIGUOUS"] for arg in args)
+        def make_conv(tag1D2D, cpu_scheme=None):
+            # the Cpu 1D scheme may be given by the autotuner (see autotune_conv)
+            flags = optional_flags
+            if cpu_scheme is not None:
+                flags = dict(optional_flags, cpu_scheme=cpu_scheme)
+            return keops_binder["nvrtc" if tagCPUGPU else "cpp"](
+                tagCPUGPU,
+                tag1D2D,
+                tagHostDevice,
+                use_ranges,
+                device_id,
+                self.formula,
+                self.aliases,
+                len(args),
+                dtype,
+                "numpy",
+                flags,
+            ).import_module()
+
+        # N.B.: KeOps C++ expects contiguous data arrays, except on Cpu where
+        # 2D arrays can be read with arbitrary row and column strides.
+        strided_args = ()
+        if tagCPUGPU == 0 and nbatchdims == 0:
+            strided_args = tuple(
+                k
+                for k, arg in enumerate(args)
+                if arg.ndim == 2 and not arg.flags["C_CONTIGUOUS"]
+            )
+        optional_flags = dict(self.optional_flags, strided_args=strided_args)
+        test_contig = all(
+            arg.flags["C_CONTIGUOUS"] or k in strided_args
+            for k, arg in enumerate(args)
+        )
         if not test_contig:
             pyKeOps_Warning(
                 "at least one of the input tensors is not contiguous. "
@@ -324,16 +378,43 @@ class Genred:
             args = tuple(np.ascontiguousarray(arg) for arg in args)
 
         # N.B.: KeOps C++ expects contiguous integer arrays as ranges
+        use_plan = test_contig
         if ranges:
+            use_plan = use_plan and all(r.flags["C_CONTIGUOUS"] for r in ranges)
             ranges = tuple(np.ascontiguousarray(r) for r in ranges)
 
         nx, ny = get_sizes(self.aliases, *args)
+
+        if backend == "auto" and get_enable_autotune() and not use_ranges:
+            # the map-reduce scheme is chosen by benchmarking the candidates, which
+            # write in a scratch output array, so that out is only written by the call
+            scratch = None if out is None else np.empty_like(out)
+
+            def run_conv(conv):
+                conv.genred_numpy(-1, ranges, nx, ny, nbatchdims, scratch, *args)
+
+            key = autotune_key(
+                self.formula,
+                self.aliases,
+                dtype,
+                optional_flags,
+                tagCPUGPU,
+                tagHostDevice,
+                nx,
+                ny,
+            )
+            myconv = autotune_conv(make_conv, run_conv, tagCPUGPU, key)
+        else:
+            myconv = make_conv(tag1D2D)
+        self.myconv = myconv
+
         nout, nred = (nx, ny) if self.axis == 1 else (ny, nx)
 
-        if "Arg" in self.reduction_op:
-            # when using Arg type reductions,
+        if "Arg" in self.reduction_op and tagCPUGPU == 1:
+            # when using Arg type reductions on Gpu,
             # if nred is greater than 16 millions and dtype=float32, the result is not reliable
-            # because we encode indices as floats, so we raise an exception ;
+            # because we encode indices as floats, so we raise an exception (on Cpu
+            # indices are accumulated and written as integers) ;
             # same with float16 type and nred>2048
             if nred > 1.6e7 and dtype in ("float32", "float"):
                 raise ValueError(
@@ -344,6 +425,19 @@ class Genred:
                     "size of input array is too large for Arg type reduction with float16 dtype.."
                 )
 
-        out = self.myconv.genred_numpy(-1, ranges, nx, ny, nbatchdims, out, *args)
+        out = myconv.genred_numpy(-1, ranges, nx, ny, nbatchdims, out, *args)
+
+        if use_plan:
+            plan = myconv.make_plan(nx, ny, args, ranges, out)
+            store_plan(self.plans, plan_key, plan and (plan, nout, dtype))
 
         return postprocess(out, "numpy", self.reduction_op, nout, self.opt_arg, dtype)
+
+    def submit(self, *args, **kwargs):
+        r"""
+        Same as :meth:`__call__`, but the reduction is run in the background by the
+        pool of :func:`pykeops.get_call_workers` threads : returns a
+        :class:`concurrent.futures.Future`, whose result is the output of the call.
+        The input arrays should not be modified before the end of the call.
+        """
+        return submit_call(self, *args, **kwargs)
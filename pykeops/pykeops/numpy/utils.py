@@ -40,6 +40,10 @@ class numpytools:
     def contiguous(x):
         return np.ascontiguousarray(x)
 
+    @staticmethod
+    def sum_rows(x):
+        return x.sum(axis=-2, keepdims=True)
+
     @staticmethod
     def numpy(x):
         return x
@@ -62,7 +66,7 @@ class numpytools:
 
     @staticmethod
     def long(x):
-        return x.astype("int64")
+        return x.astype("int64", copy=False)
 
     @staticmethod
     def dtype(x):
@@ -95,6 +99,14 @@ class numpytools:
     def dtypename(dtype):
         return dtype.name
 
+    @staticmethod
+    def dtype_from_name(name):
+        return np.dtype(name)
+
+    @staticmethod
+    def strides(x):
+        return [s // x.itemsize for s in x.strides]
+
     @staticmethod
     def rand(m, n, dtype):
         return np.random.rand(m, n).astype(dtype)
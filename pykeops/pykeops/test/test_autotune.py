@@ -0,0 +1,98 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from pykeops.numpy import Genred
+from pykeops.torch import LazyTensor
+
+import keopscore.config.tiles
+import pykeops
+from pykeops.common import autotune
+from pykeops.common.autotune import autotune_db
+from pykeops.numpy.generic import generic_red
+
+M, N, D = 10, 2000, 3
+
+torch.manual_seed(0)
+x = torch.rand(M, 1, D)
+y = torch.rand(1, N, D)
+
+
+def test_autotune():
+    pykeops.set_enable_autotune(1)
+    try:
+        Dxy = ((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)
+        out_keops = Dxy.sum(dim=1)
+        out_torch = ((x - y) ** 2).sum(dim=2).sum(dim=1, keepdim=True)
+        assert torch.allclose(out_keops, out_torch, atol=1e-4)
+        # the decision is stored in the build folder, and reused
+        with open(autotune_db.get_file(), "r") as f:
+            decisions = json.load(f)
+        assert len(decisions) > 0
+        out_keops = Dxy.sum(dim=1)
+        assert torch.allclose(out_keops, out_torch, atol=1e-4)
+    finally:
+        pykeops.set_enable_autotune(0)
+
+
+def test_autotune_runs(tmp_path, monkeypatch):
+    # the candidates are benchmarked once for a given key, without writing in out
+    db = autotune.AutotuneDB()
+    monkeypatch.setattr(db, "get_file", lambda: str(tmp_path / db.filename))
+    monkeypatch.setattr(autotune, "autotune_db", db)
+    runs = []
+
+    def counting_autotune_conv(make_conv, run_conv, tagCPUGPU, key):
+        def counting_run_conv(conv):
+            run_conv(conv)
+            runs.append(key)
+            assert np.isnan(out).all()
+
+        return autotune.autotune_conv(make_conv, counting_run_conv, tagCPUGPU, key)
+
+    monkeypatch.setattr(generic_red, "autotune_conv", counting_autotune_conv)
+    fun = Genred("SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], reduction_op="Sum", axis=1)
+    xn, yn = x[:, 0].numpy(), y[0].numpy()
+    expected = ((xn[:, None, :] - yn[None, :, :]) ** 2).sum((1, 2))[:, None]
+    pykeops.set_enable_autotune(1)
+    try:
+        out = np.full((M, 1), np.nan, dtype="float32")
+        assert fun(xn, yn, out=out) is out
+        assert np.allclose(out, expected, rtol=1e-4)
+        n_runs = len(runs)
+        assert n_runs == len(autotune.candidates[0]) * (autotune.n_repeats + 1)
+        out = np.full((M, 1), np.nan, dtype="float32")
+        fun(xn, yn, out=out)
+        assert len(runs) == n_runs
+        assert np.allclose(out, expected, rtol=1e-4)
+    finally:
+        pykeops.set_enable_autotune(0)
+
+
+def test_autotune_db_threads(tmp_path, monkeypatch):
+    # decisions made at the same time by several threads are all stored
+    db = autotune.AutotuneDB()
+    monkeypatch.setattr(db, "get_file", lambda: str(tmp_path / db.filename))
+    keys = [f"key_{k}" for k in range(16)]
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda key: db.set(key, {"scheme": "CPU_1D"}), keys))
+    with open(db.get_file(), "r") as f:
+        assert sorted(json.load(f)) == sorted(keys)
+
+
+def test_autotune_schemes(tmp_path, monkeypatch):
+    # the schemes are given to make_conv, the global flags of keopscore are unchanged
+    db = autotune.AutotuneDB()
+    monkeypatch.setattr(db, "get_file", lambda: str(tmp_path / db.filename))
+    monkeypatch.setattr(autotune, "autotune_db", db)
+    schemes = []
+
+    def make_conv(*scheme):
+        schemes.append(scheme)
+        assert keopscore.config.tiles.get_cpu_scheme() == "tiled"
+
+    autotune.autotune_conv(make_conv, lambda conv: None, 0, "key")
+    assert set(schemes[:-1]) == set(autotune.candidates[0].values())
+    assert schemes[-1] in autotune.candidates[0].values()
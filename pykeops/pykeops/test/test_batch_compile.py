@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+import threading
+
+import torch
+
+import pykeops
+from pykeops.torch import Genred
+from pykeops.torch.generic import generic_red
+
+script = """
+import torch
+from pykeops.torch import LazyTensor
+
+torch.manual_seed(0)
+x = torch.rand(100, 3, requires_grad=True)
+y = torch.rand(150, 3, requires_grad=True)
+b = torch.rand(150, 2)
+x_i, y_j, b_j = LazyTensor(x[:, None]), LazyTensor(y[None]), LazyTensor(b[None])
+out = ((-((x_i - y_j) ** 2).sum(-1)).exp() * b_j).sum(1)
+gx, gy = torch.autograd.grad(out.sum(), [x, y])
+
+K = (-((x[:, None] - y[None]) ** 2).sum(-1)).exp()
+gx2, gy2 = torch.autograd.grad((K @ b).sum(), [x, y])
+print("checks", torch.allclose(out, K @ b, atol=1e-5),
+      torch.allclose(gx, gx2, atol=1e-4), torch.allclose(gy, gy2, atol=1e-4))
+"""
+
+
+def run(home):
+    env = dict(os.environ, HOME=str(home))
+    res = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True
+    )
+    assert res.returncode == 0, res.stdout + res.stderr
+    files = [f for _, _, fs in os.walk(home) for f in fs]
+    return res.stdout, files
+
+
+def test_batch_compile(tmp_path):
+    out, files = run(tmp_path)
+    assert "checks True True True" in out
+    # the two gradients are compiled in a single module, and the forward in its own
+    # module, so that it does not wait for them
+    assert "module (2 formulas)" in out
+    modules = [f for f in files if f.startswith("pykeops_cpp_") and f.endswith(".so")]
+    assert len(modules) == 2
+    assert len([f for f in files if f.endswith(".batch")]) == 2
+    # the formulas are then loaded from this module
+    out, _ = run(tmp_path)
+    assert "checks True True True" in out and "Compiling" not in out
+
+
+def test_batch_compile_errors(monkeypatch, capsys):
+    def compile_reduction(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(generic_red, "compile_reduction", compile_reduction)
+    monkeypatch.setattr(generic_red, "autograd_batches", {})
+    monkeypatch.setattr(generic_red, "autograd_batch_failures", set())
+    monkeypatch.setattr(pykeops, "verbose", True)
+    x = torch.rand(10, 3, requires_grad=True)
+    y = torch.rand(15, 3)
+    for error, sum_scheme in [
+        (NotImplementedError(), "block_sum"),
+        (RuntimeError("codegen"), "kahan_scheme"),
+    ]:
+        fun = Genred("SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], sum_scheme=sum_scheme)
+        for _ in range(2):
+            fun(x, y, backend="CPU")
+        for task in generic_red.autograd_batches.values():
+            task.result()
+    # the formulas are still computed, the gradients of each formula are submitted
+    # once, and the unexpected error is reported once
+    out = capsys.readouterr().out
+    assert out.count("could not be compiled") == 1 and "codegen" in out
+    assert len(generic_red.autograd_batches) == 2
+    assert len(generic_red.autograd_batch_failures) == 2
+
+
+def test_background_gradients(monkeypatch):
+    # the code of the gradients is generated in the compile pool, for the calls
+    # recorded by autograd only
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compile_reduction(*args, **kwargs):
+        calls.append(kwargs["grad_vars"])
+        started.set()
+        assert release.wait(60)
+
+    monkeypatch.setattr(generic_red, "compile_reduction", compile_reduction)
+    monkeypatch.setattr(generic_red, "autograd_batches", {})
+    x = torch.rand(10, 3, requires_grad=True)
+    y = torch.rand(15, 3)
+    fun = Genred("SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], sum_scheme="direct_sum")
+    with torch.no_grad():
+        fun(x, y, backend="CPU")
+    assert not generic_red.autograd_batches
+    # the forward returns while the code of the gradients is generated
+    fun(x, y, backend="CPU")
+    assert started.wait(60) and calls == [[0]]
+    release.set()
+    for task in generic_red.autograd_batches.values():
+        task.result()
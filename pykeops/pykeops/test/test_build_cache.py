@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+setup = """
+import os, time
+import numpy as np
+from pykeops.numpy import Genred
+from keopscore.utils.build_cache import get_formulas, evict_formulas
+
+x = np.arange(30, dtype="float32").reshape(10, 3)
+formulas = ["SqDist(x,y)", "Norm2(x-y)", "(x|y)"]
+
+def reduce(formula):
+    fun = Genred(formula, ["x=Vi(3)", "y=Vj(3)"], reduction_op="Sum", axis=1)
+    return fun(x, x, backend="CPU").sum()
+"""
+
+build_script = (
+    setup
+    + """
+tags, results = [], []
+for formula in formulas:
+    before = set(get_formulas())
+    results.append(float(reduce(formula)))
+    tags.append(sorted(set(get_formulas()) - before))
+# the formulas were used one, two and three hours ago
+now = time.time()
+for k, new_tags in enumerate(tags):
+    for tag in new_tags:
+        for f in get_formulas()[tag][2]:
+            os.utime(f, (now - 3600 * (3 - k), now - 3600 * (3 - k)))
+print("results", results)
+print("tags", tags)
+"""
+)
+
+use_script = (
+    setup
+    + """
+first = float(reduce(formulas[0]))
+# the use of the first formula is recorded : the second one is evicted
+print("evicted", sorted(evict_formulas(max_formulas=len(get_formulas()) - 1)))
+print("results", [first, float(reduce(formulas[1]))])
+"""
+)
+
+
+def run(script, home):
+    env = dict(os.environ, HOME=str(home))
+    res = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True
+    )
+    assert res.returncode == 0, res.stdout + res.stderr
+    return res.stdout
+
+
+def test_build_cache_eviction(tmp_path):
+    out = run(build_script, tmp_path)
+    tags = eval(out.split("tags")[-1])
+    expected = eval(out.split("results")[-1].split("\n")[0])
+    assert all(len(new_tags) == 1 for new_tags in tags)
+    out = run(use_script, tmp_path)
+    assert f"evicted {tags[1]}" in out
+    # the evicted formula is built again from its cached parameters
+    assert "Generating code" in out
+    assert eval(out.split("results")[-1]) == expected[:2]
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+# each process computes the same reduction, in the same (new) build folder
+script = """
+import numpy as np
+from pykeops.numpy import Genred
+
+x = np.arange(30, dtype="float32").reshape(10, 3)
+fun = Genred("SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], axis=1)
+print("result", fun(x, x, backend="CPU").sum())
+"""
+
+
+def test_build_lock(tmp_path):
+    # the build folder is located in the home directory
+    env = dict(os.environ, HOME=str(tmp_path))
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", script],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        for _ in range(3)
+    ]
+    outputs = [p.communicate()[0] for p in procs]
+    assert all(p.returncode == 0 for p in procs), outputs
+    results = [line for out in outputs for line in out.split("\n") if "result" in line]
+    assert len(results) == 3 and len(set(results)) == 1
+    # the code is generated once, and no temporary file remains
+    assert sum(out.count("Generating code") for out in outputs) == 1
+    files = [f for _, _, fs in os.walk(tmp_path) for f in fs]
+    assert len([f for f in files if f.endswith(".so")]) == 1
+    assert not any(f.endswith(".tmp") for f in files)
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import pykeops
+from pykeops.numpy import Genred
+
+script = """
+import time
+import numpy as np
+from pykeops.numpy import Genred
+
+x = np.arange(300, dtype="float32").reshape(100, 3) / 100
+funs = {
+    profile: Genred(
+        "Exp(-SqDist(x,y))", ["x=Vi(3)", "y=Vj(3)"], axis=1, build_profile=profile
+    )
+    for profile in ["portable", "native", "pgo"]
+}
+for profile, fun in funs.items():
+    print("result", profile, fun(x, x, backend="CPU").sum())
+# the pgo module is built again after its first call, and used when it is built
+for k in range(600):
+    if not funs["pgo"].myconv.pgo_pending:
+        break
+    funs["pgo"](x, x, backend="CPU")
+    time.sleep(0.1)
+print("switched", funs["pgo"].myconv.dllname)
+print("result pgo", funs["pgo"](x, x, backend="CPU").sum())
+"""
+
+
+def test_build_profiles(tmp_path):
+    env = dict(os.environ, HOME=str(tmp_path))
+    res = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True
+    )
+    assert res.returncode == 0, res.stdout + res.stderr
+    results = {}
+    for line in res.stdout.split("\n"):
+        if line.startswith("result"):
+            _, profile, value = line.split()
+            results.setdefault(profile, []).append(float(value))
+    assert all(
+        abs(value - results["portable"][0]) < 1e-3 * abs(results["portable"][0])
+        for values in results.values()
+        for value in values
+    )
+    # every profile has its own module, and the optimized pgo module is used
+    assert "_pgo.so" in res.stdout.split("switched")[1].split("\n")[0]
+    files = [f for _, _, fs in os.walk(tmp_path) for f in fs]
+    modules = [f[len("pykeops_cpp_") : -3] for f in files if f.endswith(".so")]
+    for suffix in ["", "_native", "_pgo", "_pgo_gen"]:
+        assert any(module[10:] == suffix for module in modules)
+
+
+def test_invalid_build_profile():
+    with pytest.raises(ValueError):
+        Genred("SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], build_profile="turbo")
+    assert pykeops.get_build_profile() == "portable"
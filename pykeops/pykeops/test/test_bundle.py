@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+build_script = """
+import numpy as np
+import pykeops
+from pykeops.numpy import Genred
+
+x = np.arange(30, dtype="float32").reshape(10, 3)
+Genred("SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], axis=1)(x, x, backend="CPU")
+manifest = pykeops.export_bundle({bundle!r})
+print("exported", len(manifest["formulas"]))
+"""
+
+load_script = """
+import numpy as np
+import pykeops
+from pykeops.numpy import Genred
+
+pykeops.load_bundle({bundle!r})
+x = np.arange(30, dtype="float32").reshape(10, 3)
+out = Genred("SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], axis=1)(x, x, backend="CPU")
+print("result", out.sum())
+try:
+    Genred("Norm2(x-y)", ["x=Vi(3)", "y=Vj(3)"], axis=1)(x, x, backend="CPU")
+except Exception as e:
+    print("miss", "Norm2" in str(e), "compilation of new formulas is disabled" in str(e))
+"""
+
+
+def run(script, home, **env):
+    env = dict(os.environ, HOME=str(home), **env)
+    res = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True
+    )
+    assert res.returncode == 0, res.stdout + res.stderr
+    return res.stdout
+
+
+def test_bundle(tmp_path):
+    bundle = str(tmp_path / "bundle")
+    out = run(build_script.format(bundle=bundle), tmp_path / "build")
+    assert "exported 1" in out
+    # the bundle is used on another machine (with another home folder), without compiler
+    out = run(load_script.format(bundle=bundle), tmp_path / "prod", CXX="no-compiler")
+    assert "Compiling" not in out and "Generating code" not in out
+    x = [[3 * i + k for k in range(3)] for i in range(10)]
+    expected = sum(
+        sum((a - b) ** 2 for a, b in zip(xi, xj)) for xi in x for xj in x
+    )
+    assert f"result {float(expected)}" in out
+    assert "miss True True" in out
@@ -0,0 +1,55 @@
+import multiprocessing
+
+from keopscore.utils.Cache import Cache, CacheStore
+
+
+def square(x):
+    square.ncalls += 1
+    return x * x
+
+
+square.ncalls = 0
+
+
+def write_entries(folder, start):
+    store = CacheStore("test", folder)
+    for k in range(start, start + 20):
+        store.set(f"key{k}", k)
+
+
+def test_cache_store_incremental(tmp_path):
+    cache = Cache(square, use_cache_file=True, save_folder=str(tmp_path))
+    assert cache(3) == 9 and square.ncalls == 1
+    # the entry is written immediately, and read by a new cache (e.g. in another process)
+    other = Cache(square, use_cache_file=True, save_folder=str(tmp_path))
+    assert other(3) == 9 and square.ncalls == 1
+    assert other(4) == 16 and square.ncalls == 2
+
+
+def test_cache_store_processes(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    procs = [
+        ctx.Process(target=write_entries, args=(str(tmp_path), 20 * i))
+        for i in range(4)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+        assert p.exitcode == 0
+    store = CacheStore("test", str(tmp_path))
+    assert all(store.get(f"key{k}") == k for k in range(80))
+    assert store.get("missing") is None
+
+
+def test_cache_store_reset(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    cache = Cache(square, use_cache_file=True, save_folder=str(tmp_path / "a"))
+    cache(5)
+    ncalls = square.ncalls
+    # the entries of the previous build folder are not used anymore
+    cache.reset(new_save_folder=str(tmp_path / "b"))
+    cache(5)
+    assert square.ncalls == ncalls + 1
+    assert (tmp_path / "b" / "square_cache.db").exists()
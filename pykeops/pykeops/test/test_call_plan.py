@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+import torch
+
+from pykeops.numpy import Genred as Genred_numpy
+from pykeops.torch import Genred as Genred_torch
+
+formula = "SqDist(x,y) * b"
+aliases = ["x=Vi(3)", "y=Vj(3)", "b=Vj(1)"]
+
+
+def reference(x, y, b):
+    return (((x[:, None, :] - y[None, :, :]) ** 2).sum(-1) * b[:, 0]).sum(1)[:, None]
+
+
+def test_call_plan_numpy():
+    fun = Genred_numpy(formula, aliases, reduction_op="Sum", axis=1)
+    x, y, b = (np.random.rand(n, d) for n, d in [(10, 3), (12, 3), (12, 1)])
+    res = fun(x, y, b, backend="CPU")
+    assert len(fun.plans) == 1
+    # later calls with the same structure use the plan, with the new values
+    for _ in range(3):
+        x, y, b = (np.random.rand(n, d) for n, d in [(10, 3), (12, 3), (12, 1)])
+        res = fun(x, y, b, backend="CPU")
+        assert np.allclose(res, reference(x, y, b))
+    out = np.empty((10, 1))
+    assert fun(x, y, b, backend="CPU", out=out) is out
+    assert np.allclose(out, reference(x, y, b))
+    # a new shape or dtype makes a new plan
+    fun(x[:7], y, b, backend="CPU")
+    fun(x.astype("float32"), y.astype("float32"), b.astype("float32"), backend="CPU")
+    assert len(fun.plans) == 4
+    # strided arrays are read in place, with their own plan
+    for _ in range(2):
+        res = fun(np.asfortranarray(x), y[::2], b[::2], backend="CPU")
+        assert np.allclose(res, reference(x, y[::2], b[::2]))
+    assert len(fun.plans) == 5
+
+
+def test_call_plan_ranges():
+    fun = Genred_numpy(formula, aliases, reduction_op="Sum", axis=1)
+    x, y, b = (np.random.rand(n, d) for n, d in [(10, 3), (12, 3), (12, 1)])
+    # the first rows are reduced over the first columns only
+    ranges_i = np.array([[0, 4], [4, 10]], dtype="int32")
+    slices_i = np.array([1, 2], dtype="int32")
+    redranges_j = np.array([[0, 5], [0, 12]], dtype="int32")
+    ranges_j = np.array([[0, 5], [5, 12]], dtype="int32")
+    slices_j = np.array([2, 3], dtype="int32")
+    redranges_i = np.array([[0, 4], [4, 10], [4, 10]], dtype="int32")
+    ranges = (ranges_i, slices_i, redranges_j, ranges_j, slices_j, redranges_i)
+    expected = reference(x, y, b)
+    expected[:4] = reference(x[:4], y[:5], b[:5])
+    for _ in range(2):
+        res = fun(x, y, b, backend="CPU", ranges=ranges)
+        assert np.allclose(res, expected)
+    assert len(fun.plans) == 1
+
+
+def test_call_plan_torch():
+    fun = Genred_torch(formula, aliases, reduction_op="Sum", axis=1)
+    x, y, b = (torch.rand(n, d) for n, d in [(10, 3), (12, 3), (12, 1)])
+    for _ in range(2):
+        res = fun(x, y, b, backend="CPU")
+        assert torch.allclose(res, reference(x, y, b))
+    assert len(fun.plans) == 1
+    # calls recorded by autograd do not use plans
+    x.requires_grad_(True)
+    res = fun(x, y, b, backend="CPU")
+    assert res.grad_fn is not None and len(fun.plans) == 1
+    (g,) = torch.autograd.grad(res.sum(), [x])
+    assert g.shape == x.shape
+    with torch.no_grad():
+        res = fun(x, y, b, backend="CPU")
+    assert res.grad_fn is None and torch.allclose(res, reference(x, y, b))
+
+
+def test_call_plan_layout():
+    # a plan is made from the arrays of its own call, even if the formula has been
+    # called with other shapes or strides in the meantime (e.g. by another thread)
+    fun = Genred_numpy(formula, aliases, reduction_op="Sum", axis=1)
+    x, y, b = (np.random.rand(n, d) for n, d in [(10, 3), (12, 3), (12, 1)])
+    out = fun(x, y, b, backend="CPU")
+    fun(x[:7], y[:5], b[:5], backend="CPU")
+    plan = fun.myconv.make_plan(10, 12, (x, y, b), None, out)
+    assert np.allclose(plan((x, y, b)), reference(x, y, b))
@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+import torch
+
+import pykeops
+from pykeops.numpy import Genred, LazyTensor
+from pykeops.torch import Genred as Genred_torch
+from pykeops.torch import LazyTensor as LazyTensor_torch
+
+formula = "Exp(-SqDist(x,y)) * b"
+aliases = ["x=Vi(3)", "y=Vj(3)", "b=Vj(1)"]
+
+
+def data(M, N):
+    return np.random.rand(M, 3), np.random.rand(N, 3), np.random.rand(N, 1)
+
+
+def test_submit_releases_gil():
+    fun = Genred(formula, aliases, reduction_op="Sum", axis=1)
+    x, y, b = data(4000, 4000)
+    expected = fun(x, y, b, backend="CPU")
+    future = fun.submit(x, y, b, backend="CPU")
+    # the main thread runs during the computation
+    count = 0
+    while not future.done():
+        count += 1
+    assert count > 10
+    assert np.allclose(future.result(), expected)
+
+
+def test_calls_of_the_same_formula_overlap():
+    fun = Genred(formula, aliases, reduction_op="Sum", axis=1)
+    fun(*data(10, 10), backend="CPU")
+    future = fun.submit(*data(4000, 4000), backend="CPU")
+    while not future.running():
+        pass
+    time.sleep(0.05)
+    # a call with new shapes, i.e. without plan, is not blocked by the running one
+    args = data(11, 13)
+    res = fun(*args, backend="CPU")
+    assert not future.done()
+    assert np.allclose(res, fun(*args, backend="CPU"))
+    future.result()
+
+
+def test_submit_concurrent_calls():
+    fun = Genred(formula, aliases, reduction_op="Sum", axis=1)
+    workers = pykeops.get_call_workers()
+    pykeops.set_call_workers(4)
+    try:
+        inputs = [data(100 + k, 200 - k) for k in range(16)]
+        futures = [fun.submit(*args, backend="CPU") for args in inputs]
+        for args, future in zip(inputs, futures):
+            assert np.allclose(future.result(), fun(*args, backend="CPU"))
+    finally:
+        pykeops.set_call_workers(workers)
+
+
+def test_sum_async():
+    x, y, b = data(100, 200)
+    K = (-((LazyTensor(x[:, None, :]) - LazyTensor(y[None, :, :])) ** 2).sum(2)).exp()
+    K = K * LazyTensor(b[None, :, :])
+    future = K.sum_async(dim=1, backend="CPU")
+    assert np.allclose(future.result(), K.sum(dim=1, backend="CPU"))
+
+
+def test_sum_async_torch():
+    x, y, b = (torch.tensor(a) for a in data(100, 200))
+    x.requires_grad_(True)
+    x_i, y_j = LazyTensor_torch(x[:, None, :]), LazyTensor_torch(y[None, :, :])
+    K = (-((x_i - y_j) ** 2).sum(2)).exp() * LazyTensor_torch(b[None, :, :])
+    res = K.sum_async(dim=1, backend="CPU").result()
+    assert torch.allclose(res, K.sum(dim=1, backend="CPU"))
+    # the call is recorded by autograd as in the calling thread
+    (g,) = torch.autograd.grad(res.sum(), [x])
+    assert g.shape == x.shape
+    with torch.no_grad():
+        future = Genred_torch(formula, aliases, axis=1).submit(x, y, b, backend="CPU")
+    assert future.result().grad_fn is None
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+import pytest
+import torch
+from pykeops.torch import LazyTensor
+
+M, N, D, DV = 3, 5003, 3, 2
+
+dtype = torch.float32
+
+torch.manual_seed(0)
+x = torch.rand(M, 1, D, dtype=dtype)
+y = torch.rand(1, N, D, dtype=dtype)
+b = torch.randn(N, DV, dtype=dtype)
+
+
+@pytest.mark.parametrize("sum_scheme", ["direct_sum", "block_sum", "kahan_scheme"])
+def test_cpu_2D_sum(sum_scheme):
+    Kxy = (-((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)).exp()
+    out_keops = Kxy.__matmul__(b, sum_scheme=sum_scheme, backend="CPU_2D")
+    out_torch = (-((x - y) ** 2).sum(dim=2)).exp() @ b
+    assert torch.allclose(out_keops, out_torch, atol=1e-4)
+
+
+def test_cpu_2D_logsumexp():
+    Dxy_keops = ((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)
+    Dxy_torch = ((x - y) ** 2).sum(dim=2)
+    out_keops = (-Dxy_keops).logsumexp(dim=1, backend="CPU_2D")
+    out_torch = (-Dxy_torch).logsumexp(dim=1, keepdim=True)
+    assert torch.allclose(out_keops, out_torch, atol=1e-4)
+
+
+def test_cpu_2D_argkmin():
+    Dxy = ((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)
+    ind_keops = Dxy.argKmin(5, dim=1, backend="CPU_2D")
+    ind_torch = ((x - y) ** 2).sum(dim=2).topk(5, dim=1, largest=False).indices
+    assert torch.equal(ind_keops, ind_torch)
+
+
+thread_limit_script = """
+import torch
+from pykeops.torch import LazyTensor
+
+x = torch.rand(3, 1, 3, dtype=torch.float64)
+y = torch.rand(1, 5003, 3, dtype=torch.float64)
+Dxy = ((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)
+expected = ((x - y) ** 2).sum(dim=2).max(dim=1, keepdim=True).values
+assert torch.equal(Dxy.max(dim=1, backend="CPU_2D"), expected)
+print("ok")
+"""
+
+
+def test_cpu_2D_thread_limit():
+    # OpenMP starts less threads than requested : the "j" ranges are split between
+    # the threads of the team
+    env = dict(os.environ, OMP_NUM_THREADS="8", OMP_THREAD_LIMIT="2")
+    res = subprocess.run(
+        [sys.executable, "-c", thread_limit_script],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert res.returncode == 0 and "ok" in res.stdout, res.stdout + res.stderr
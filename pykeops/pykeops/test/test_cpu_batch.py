@@ -0,0 +1,27 @@
+import pytest
+import torch
+from pykeops.torch import LazyTensor
+
+D = 3
+
+torch.manual_seed(0)
+# batch dimensions (2,3), with broadcasting for x, y and the parameter p
+x = torch.rand(2, 1, 100, 1, D)
+y = torch.rand(1, 3, 1, 150, D)
+p = torch.rand(2, 3, 1, 1, 1)
+b = torch.randn(2, 3, 150, 2)
+
+
+@pytest.mark.parametrize("sum_scheme", ["direct_sum", "block_sum", "kahan_scheme"])
+def test_cpu_batch_sum(sum_scheme):
+    Kxy = (-(LazyTensor(p) * (LazyTensor(x) - LazyTensor(y)) ** 2).sum(-1)).exp()
+    out_keops = Kxy.__matmul__(b, sum_scheme=sum_scheme, backend="CPU")
+    out_torch = (-(p * (x - y) ** 2).sum(-1)).exp() @ b
+    assert torch.allclose(out_keops, out_torch, atol=1e-4)
+
+
+def test_cpu_batch_argmin_over_i():
+    Dxy = ((LazyTensor(x) - LazyTensor(y)) ** 2).sum(-1)
+    ind_keops = Dxy.argmin(dim=2, backend="CPU").view(2, 3, 150)
+    ind_torch = ((x - y) ** 2).sum(-1).argmin(dim=2)
+    assert torch.equal(ind_keops.long(), ind_torch)
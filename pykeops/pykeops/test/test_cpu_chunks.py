@@ -0,0 +1,30 @@
+import math
+import pytest
+import torch
+from pykeops.torch import LazyTensor
+
+M, N, D, DV = 100, 700, 784, 300
+
+dtype = torch.float32
+
+torch.manual_seed(0)
+x = torch.rand(M, 1, D, dtype=dtype) / math.sqrt(D)
+y = torch.rand(1, N, D, dtype=dtype) / math.sqrt(D)
+b = torch.randn(N, DV, dtype=dtype)
+
+
+def test_cpu_chunks_argkmin():
+    # high dimensional squared distances are computed by chunks
+    Dxy = ((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)
+    ind_keops = Dxy.argKmin(5, dim=1, backend="CPU")
+    ind_torch = ((x - y) ** 2).sum(dim=2).topk(5, dim=1, largest=False).indices
+    assert torch.equal(ind_keops, ind_torch)
+
+
+@pytest.mark.parametrize("sum_scheme", ["direct_sum", "block_sum", "kahan_scheme"])
+def test_cpu_finalchunks(sum_scheme):
+    # kernel sum with high dimensional b_j, with chunks on both D and DV
+    Kxy = (-((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)).exp()
+    out_keops = Kxy.__matmul__(b, sum_scheme=sum_scheme, backend="CPU")
+    out_torch = (-((x - y) ** 2).sum(dim=2)).exp() @ b
+    assert torch.allclose(out_keops, out_torch, atol=1e-4)
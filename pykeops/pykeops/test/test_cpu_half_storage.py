@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import torch
+from pykeops.numpy import Genred
+from pykeops.torch import LazyTensor
+
+M, N, D, DV = 100, 1003, 3, 2
+
+torch.manual_seed(0)
+x = torch.rand(M, 1, D)
+y = torch.rand(1, N, D)
+b = torch.randn(N, DV)
+
+# inputs are rounded once, so that the reference only measures the error on the output
+tol = {torch.float16: 2e-3, torch.bfloat16: 2e-2}
+
+
+def gaussian_conv(xh, yh, bh, **kwargs):
+    Kxy = (-((LazyTensor(xh) - LazyTensor(yh)) ** 2).sum(dim=2)).exp()
+    return Kxy.__matmul__(bh, **kwargs)
+
+
+@pytest.mark.parametrize("dtype", [torch.float16, torch.bfloat16])
+@pytest.mark.parametrize("backend", ["CPU", "CPU_2D"])
+def test_cpu_half_storage_sum(dtype, backend):
+    xh, yh, bh = x.to(dtype), y.to(dtype), b.to(dtype)
+    out_keops = gaussian_conv(xh, yh, bh, backend=backend)
+    out_torch = (-((xh.float() - yh.float()) ** 2).sum(dim=2)).exp() @ bh.float()
+    assert out_keops.dtype == dtype
+    # the accumulation is done in float32, so the error does not grow with N
+    err = (out_keops.float() - out_torch).abs() / out_torch.abs().clamp(min=1)
+    assert err.max() < tol[dtype]
+
+
+@pytest.mark.parametrize("dtype", [torch.float16, torch.bfloat16])
+def test_cpu_half_storage_ranges(dtype):
+    xh, yh, bh = x.to(dtype), y.to(dtype), b.to(dtype)
+    ranges_i = torch.tensor([[0, M]], dtype=torch.int32)
+    slices_i = torch.tensor([1], dtype=torch.int32)
+    redranges_j = torch.tensor([[0, N // 2]], dtype=torch.int32)
+    ranges = (ranges_i, slices_i, redranges_j) * 2
+    Kxy = (-((LazyTensor(xh) - LazyTensor(yh)) ** 2).sum(dim=2)).exp()
+    Kxy.ranges = ranges
+    out_keops = (Kxy @ bh).float()
+    xf, yf = xh.float(), yh.float()[:, : N // 2]
+    out_torch = (-((xf - yf) ** 2).sum(dim=2)).exp() @ bh.float()[: N // 2]
+    err = (out_keops - out_torch).abs() / out_torch.abs().clamp(min=1)
+    assert err.max() < tol[dtype]
+
+
+def test_cpu_half_storage_argmin():
+    xh, yh = x.half(), y.half()
+    ind_keops = ((LazyTensor(xh) - LazyTensor(yh)) ** 2).sum(dim=2).argmin(dim=1)
+    ind_torch = ((xh.float() - yh.float()) ** 2).sum(dim=2).argmin(dim=1)
+    assert torch.equal(ind_keops.view(-1).long(), ind_torch)
+
+
+def test_cpu_half_storage_numpy():
+    formula = "SqDist(x,y) * b"
+    aliases = [f"x = Vi({D})", f"y = Vj({D})", f"b = Vj({DV})"]
+    xn, yn, bn = (t.reshape(-1, t.shape[-1]).numpy() for t in (x, y, b))
+    xn, yn, bn = xn.astype(np.float16), yn.astype(np.float16), bn.astype(np.float16)
+    out_keops = Genred(formula, aliases, axis=1)(xn, yn, bn, backend="CPU")
+    xf, yf, bf = xn.astype(np.float32), yn.astype(np.float32), bn.astype(np.float32)
+    out_np = ((xf[:, None, :] - yf[None, :, :]) ** 2).sum(2) @ bf
+    assert out_keops.dtype == np.float16
+    assert np.allclose(out_keops.astype(np.float32), out_np, rtol=2e-3, atol=2e-3)
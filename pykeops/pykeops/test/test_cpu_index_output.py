@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+import torch
+from pykeops.numpy import Genred
+from pykeops.numpy import LazyTensor as LazyTensor_np
+from pykeops.torch import LazyTensor
+
+M, N, D = 10, 2003, 3
+
+torch.manual_seed(0)
+x = torch.rand(M, 1, D)
+y = torch.rand(1, N, D)
+Dxy_torch = ((x - y) ** 2).sum(dim=2)
+
+
+def Dxy_keops(x, y):
+    return ((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)
+
+
+@pytest.mark.parametrize("backend", ["CPU", "CPU_2D"])
+def test_cpu_argmin_int64(backend):
+    ind = Dxy_keops(x, y).argmin(dim=1, backend=backend)
+    assert ind.dtype == torch.int64
+    assert torch.equal(ind.view(-1), Dxy_torch.argmin(dim=1))
+
+
+def test_cpu_argkmin_int64():
+    ind = Dxy_keops(x, y).argKmin(5, dim=1)
+    assert ind.dtype == torch.int64
+    assert torch.equal(ind, Dxy_torch.topk(5, dim=1, largest=False).indices)
+
+
+def test_cpu_min_argmin():
+    vals, ind = Dxy_keops(x, y).min_argmin(dim=1)
+    assert vals.dtype == torch.float32 and ind.dtype == torch.int64
+    assert torch.allclose(vals.view(-1), Dxy_torch.min(dim=1).values)
+    assert torch.equal(ind.view(-1), Dxy_torch.argmin(dim=1))
+
+
+def test_cpu_argkmin_numpy():
+    xn, yn = x.numpy(), y.numpy()
+    Dxy = ((LazyTensor_np(xn) - LazyTensor_np(yn)) ** 2).sum(axis=2)
+    ind = Dxy.argKmin(5, axis=1)
+    assert ind.dtype == np.int64
+    assert (ind == Dxy_torch.topk(5, dim=1, largest=False).indices.numpy()).all()
+
+
+def test_cpu_argmin_large_index():
+    # 2**24 + 1 cannot be represented exactly as a float32 number
+    n = 2**24 + 2
+    yl = torch.zeros(1, n, 1)
+    yl[0, n - 1, 0] = -1
+    xl = -torch.ones(1, 1, 1)
+    ind = Dxy_keops(xl, yl).argmin(dim=1)
+    assert ind.item() == n - 1
+
+
+@pytest.mark.parametrize("backend", ["CPU", "CPU_2D"])
+def test_cpu_kmin_argkmin(backend):
+    vals, ind = Dxy_keops(x, y).Kmin_argKmin(5, dim=1, backend=backend)
+    assert vals.dtype == torch.float32 and ind.dtype == torch.int64
+    ref = Dxy_torch.topk(5, dim=1, largest=False)
+    assert torch.allclose(vals, ref.values)
+    assert torch.equal(ind, ref.indices)
+
+
+def test_cpu_min_argmin_out():
+    # the output array of the Gpu layout (values and indices as floats) is filled
+    aliases = ["x=Vi(3)", "y=Vj(3)"]
+    fun = Genred("SqDist(x,y)", aliases, reduction_op="Min_ArgMin", axis=1)
+    xn, yn = x[:, 0].numpy(), y[0].numpy()
+    out = np.zeros((M, 2), dtype="float32")
+    vals, ind = fun(xn, yn, backend="CPU", out=out)
+    assert (out[:, 0] == vals[:, 0]).all() and (out[:, 1] == ind[:, 0]).all()
+    assert np.allclose(vals[:, 0], Dxy_torch.min(dim=1).values.numpy())
+    assert (ind[:, 0] == Dxy_torch.argmin(dim=1).numpy()).all()
+
+
+def test_cpu_argmin_ranges():
+    # the reduction over j is restricted to the first 1000 points for the first
+    # half of the rows, and to the next ones for the second half
+    ranges_i = torch.tensor([[0, M // 2], [M // 2, M]], dtype=torch.int32)
+    slices_i = torch.tensor([1, 2], dtype=torch.int32)
+    redranges_j = torch.tensor([[0, 1000], [1000, N]], dtype=torch.int32)
+    ranges = (ranges_i, slices_i, redranges_j, redranges_j, slices_i, ranges_i)
+    D_ij = Dxy_keops(x, y)
+    D_ij.ranges = ranges
+    vals, ind = D_ij.min_argmin(dim=1)
+    assert ind.dtype == torch.int64
+    for rows, (start, end) in zip(ranges_i.tolist(), redranges_j.tolist()):
+        rows = slice(*rows)
+        ref = Dxy_torch[rows, start:end].min(dim=1)
+        assert torch.allclose(vals[rows].view(-1), ref.values)
+        assert torch.equal(ind[rows].view(-1), ref.indices + start)
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from pykeops.common.keops_io.LoadKeOps_cpp import compile_module, launch_argtypes
+from pykeops.numpy import Genred
+
+
+def test_compile_module_error(tmp_path):
+    # a failed compilation raises an error giving the compile command
+    srcname = tmp_path / "invalid.cpp"
+    srcname.write_text("this is not C++ code\n")
+    dllname = tmp_path / "invalid.so"
+    with pytest.raises(ValueError, match="invalid.cpp"):
+        compile_module(str(srcname), str(dllname))
+    assert not dllname.exists()
+
+
+def test_launch_argtypes():
+    fun = Genred("SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], reduction_op="Sum", axis=1)
+    x = np.random.rand(10, 3)
+    assert np.allclose(fun(x, x, backend="CPU"), fun(x, x, backend="CPU_2D"))
+    assert fun.myconv.launch_keops_cpu.argtypes == launch_argtypes
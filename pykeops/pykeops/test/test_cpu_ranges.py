@@ -0,0 +1,39 @@
+import torch
+from pykeops.torch import LazyTensor
+from pykeops.torch.cluster import from_matrix
+
+D = 3
+
+torch.manual_seed(0)
+
+# one large cluster followed by many small ones : the work per range is unbalanced
+sizes_i = [500] + [3] * 200
+sizes_j = [700] + [5] * 200
+M, N = sum(sizes_i), sum(sizes_j)
+x = torch.rand(M, D)
+y = torch.rand(N, D)
+b = torch.randn(N, 2)
+
+
+def cluster_ranges(sizes):
+    ends = torch.tensor(sizes).cumsum(0)
+    return torch.stack((ends - torch.tensor(sizes), ends), dim=1).int()
+
+
+ranges_i, ranges_j = cluster_ranges(sizes_i), cluster_ranges(sizes_j)
+keep = torch.rand(len(sizes_i), len(sizes_j)) > 0.9
+keep[0, 0] = True
+keep[0, 1:] = False
+
+
+def test_cpu_ranges():
+    K = (-((LazyTensor(x[:, None, :]) - LazyTensor(y[None, :, :])) ** 2).sum(-1)).exp()
+    K.ranges = from_matrix(ranges_i, ranges_j, keep)
+    out_keops = K.__matmul__(b, backend="CPU")
+
+    # dense computation with the same block-sparsity mask
+    labels_i = torch.arange(len(sizes_i)).repeat_interleave(torch.tensor(sizes_i))
+    labels_j = torch.arange(len(sizes_j)).repeat_interleave(torch.tensor(sizes_j))
+    mask = keep[labels_i][:, labels_j]
+    K_torch = (-((x[:, None, :] - y[None, :, :]) ** 2).sum(-1)).exp() * mask
+    assert torch.allclose(out_keops, K_torch @ b, atol=1e-4)
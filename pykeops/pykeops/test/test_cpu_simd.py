@@ -0,0 +1,41 @@
+import math
+import pytest
+import torch
+from pykeops.torch import LazyTensor
+
+import keopscore.config.tiles
+
+M, N, D, DV = 150, 1031, 3, 2
+
+dtype = torch.float32
+
+torch.manual_seed(0)
+x = torch.rand(M, 1, D, dtype=dtype)
+y = torch.rand(1, N, D, dtype=dtype)
+b = torch.randn(N, DV, dtype=dtype)
+
+
+@pytest.fixture
+def enable_simd():
+    keopscore.config.tiles.set_enable_simd(1)
+    yield
+    keopscore.config.tiles.set_enable_simd(0)
+
+
+@pytest.mark.parametrize("sum_scheme", ["direct_sum", "block_sum", "kahan_scheme"])
+def test_cpu_simd_sum(enable_simd, sum_scheme):
+    Kxy = (-((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)).exp()
+    out_keops = Kxy.__matmul__(b, sum_scheme=sum_scheme, backend="CPU")
+    out_torch = (-((x - y) ** 2).sum(dim=2)).exp() @ b
+    assert torch.allclose(out_keops, out_torch, atol=1e-4)
+
+
+def test_cpu_simd_min_argkmin(enable_simd):
+    Dxy_keops = ((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)
+    Dxy_torch = ((x - y) ** 2).sum(dim=2)
+    vals, inds = Dxy_keops.min_argmin(dim=1, backend="CPU")
+    assert torch.allclose(vals.view(-1), Dxy_torch.min(dim=1).values, atol=1e-6)
+    assert torch.equal(inds.view(-1).long(), Dxy_torch.argmin(dim=1))
+    ind_keops = Dxy_keops.argKmin(5, dim=1, backend="CPU")
+    ind_torch = Dxy_torch.topk(5, dim=1, largest=False).indices
+    assert torch.equal(ind_keops, ind_torch)
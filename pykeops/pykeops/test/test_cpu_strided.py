@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import torch
+from pykeops.numpy import Genred as Genred_np
+from pykeops.torch import Genred
+
+M, N, D, DV = 100, 1003, 3, 2
+
+formula = "Exp(-SqDist(x,y)) * b"
+aliases = [f"x = Vi({D})", f"y = Vj({D})", f"b = Vj({DV})"]
+
+torch.manual_seed(0)
+# wide arrays, of which we only use column slices
+X = torch.rand(M, 2 * D)
+Y = torch.rand(N, 2 * D)
+b = torch.randn(N, DV)
+
+
+def conv(x, y, b, backend="CPU"):
+    return Genred(formula, aliases, axis=1)(x, y, b, backend=backend)
+
+
+@pytest.mark.parametrize("backend", ["CPU", "CPU_2D"])
+def test_cpu_strided_column_slice(backend, capsys):
+    x, y = X[:, D:], Y[:, 1 : D + 1]
+    assert not x.is_contiguous() and not y.is_contiguous()
+    out = conv(x, y, b, backend=backend)
+    # no copy is made for non contiguous arguments
+    assert "not contiguous" not in capsys.readouterr().out
+    assert torch.allclose(out, conv(x.contiguous(), y.contiguous(), b), atol=1e-6)
+
+
+def test_cpu_strided_transpose():
+    xt = X[:, :D].t().contiguous().t()
+    bt = b.t().contiguous().t()
+    assert not xt.is_contiguous() and not bt.is_contiguous()
+    out = conv(xt, Y[:, :D], bt)
+    assert torch.allclose(out, conv(X[:, :D].contiguous(), Y[:, :D], b), atol=1e-6)
+
+
+def test_cpu_strided_grad():
+    x = X[:, :D].clone().requires_grad_()
+    y = Y[:, ::2]
+    out = conv(x, y, b)
+    (g,) = torch.autograd.grad(out.sum(), [x])
+    x2 = x.detach().clone().requires_grad_()
+    (g2,) = torch.autograd.grad(conv(x2, y.contiguous(), b).sum(), [x2])
+    assert torch.allclose(g, g2, atol=1e-5)
+
+
+def test_cpu_strided_numpy():
+    Xn, Yn, bn = X.numpy(), Y.numpy(), b.numpy()
+    x, y = Xn[:, ::2], Yn[:, D:]
+    out = Genred_np(formula, aliases, axis=1)(x, y, bn, backend="CPU")
+    expected = Genred_np(formula, aliases, axis=1)(
+        np.ascontiguousarray(x), np.ascontiguousarray(y), bn, backend="CPU"
+    )
+    assert np.allclose(out, expected, atol=1e-6)
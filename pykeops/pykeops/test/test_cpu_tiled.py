@@ -0,0 +1,76 @@
+import math
+import os
+import subprocess
+import sys
+
+import pytest
+import torch
+from pykeops.torch import LazyTensor
+
+import keopscore.config.tiles
+
+M, N, D, DV = 150, 1031, 50, 2
+
+dtype = torch.float32
+
+torch.manual_seed(0)
+x = torch.rand(M, 1, D, dtype=dtype) / math.sqrt(D)
+y = torch.rand(1, N, D, dtype=dtype) / math.sqrt(D)
+b = torch.randn(N, DV, dtype=dtype)
+
+
+def fun(x, y, b, backend, sum_scheme="block_sum"):
+    if "keops" in backend:
+        x = LazyTensor(x)
+        y = LazyTensor(y)
+    Dxy = ((x - y).square()).sum(dim=2)
+    Kxy = (-Dxy).exp()
+    if "keops" in backend:
+        out = Kxy.__matmul__(b, sum_scheme=sum_scheme, backend="CPU")
+    else:
+        out = Kxy @ b
+    return out
+
+
+@pytest.mark.parametrize("sum_scheme", ["direct_sum", "block_sum", "kahan_scheme"])
+def test_cpu_tiled(sum_scheme):
+    # N and M are not multiples of the tile sizes, so that incomplete tiles are tested
+    assert keopscore.config.tiles.get_enable_tiles()
+    out_keops = fun(x, y, b, "keops", sum_scheme=sum_scheme)
+    out_torch = fun(x, y, b, "torch")
+    assert torch.allclose(out_keops, out_torch, atol=1e-5)
+
+
+def test_cpu_tiled_argkmin():
+    Dxy = ((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)
+    ind_keops = Dxy.argKmin(5, dim=1, backend="CPU")
+    ind_torch = ((x - y) ** 2).sum(dim=2).topk(5, dim=1, largest=False).indices
+    assert torch.equal(ind_keops, ind_torch)
+
+
+small_nx_script = """
+import torch
+from pykeops.torch import LazyTensor
+
+for M in (1, 7, 64, 67, 300):
+    x = torch.rand(M, 1, 3, dtype=torch.float64)
+    y = torch.rand(1, 1031, 3, dtype=torch.float64)
+    b = torch.randn(1031, 2, dtype=torch.float64)
+    Kxy = (-((LazyTensor(x) - LazyTensor(y)) ** 2).sum(dim=2)).exp()
+    expected = (-((x - y) ** 2).sum(dim=2)).exp() @ b
+    assert torch.allclose(Kxy @ b, expected), M
+print("ok")
+"""
+
+
+def test_cpu_tiled_small_nx():
+    # with few rows, the tiles have less than TILE_I rows so that all the threads
+    # are used : the results do not depend on the number of threads
+    env = dict(os.environ, OMP_NUM_THREADS="8")
+    res = subprocess.run(
+        [sys.executable, "-c", small_nx_script],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert res.returncode == 0 and "ok" in res.stdout, res.stdout + res.stderr
@@ -0,0 +1,146 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+import torch
+
+from pykeops.common.operations import grad_specs
+from pykeops.numpy import Genred, LazyTensor
+from pykeops.torch import Genred as Genred_torch
+from pykeops.torch import LazyTensor as LazyTensor_torch
+
+formula = "Exp(-s * SqDist(x,y)) * b"
+aliases = ["x=Vi(3)", "y=Vj(3)", "b=Vj(2)", "s=Pm(1)"]
+
+
+def data(M, N):
+    x, y, b = np.random.rand(M, 3), np.random.rand(N, 3), np.random.rand(N, 2)
+    return x, y, b, np.array([0.7])
+
+
+def reference(x, y, b, s):
+    exp = np.exp if isinstance(x, np.ndarray) else torch.exp
+    K = exp(-s * ((x[..., :, None, :] - y[..., None, :, :]) ** 2).sum(-1))
+    return (K @ b).sum(-2)[..., None, :]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float64"])
+def test_full_reduction(dtype):
+    fun = Genred(formula, aliases, reduction_op="Sum", axis=(0, 1))
+    args = [a.astype(dtype) for a in data(100, 130)]
+    res = fun(*args, backend="CPU")
+    assert res.shape == (1, 2) and res.dtype == dtype
+    assert np.allclose(res, reference(*args), rtol=1e-4)
+    # the output is written in place
+    out = np.zeros((1, 2), dtype=dtype)
+    assert fun(*args, backend="CPU", out=out) is out
+    assert np.allclose(out, res)
+
+
+def test_full_reduction_fallback():
+    # non contiguous arrays and ranges : the rows of the reduction over j are summed
+    fun = Genred(formula, aliases, reduction_op="Sum", axis=(1, 0))
+    x, y, b, s = data(100, 130)
+    res = fun(np.asfortranarray(x), y, b, s, backend="CPU")
+    assert np.allclose(res, reference(x, y, b, s))
+    ranges = (
+        np.array([[0, 50], [50, 100]], dtype="int32"),
+        np.array([1, 2], dtype="int32"),
+        np.array([[0, 130], [0, 130]], dtype="int32"),
+    )
+    ranges = ranges + ranges
+    res = fun(x, y, b, s, backend="CPU", ranges=ranges)
+    assert np.allclose(res, reference(x, y, b, s))
+
+
+thread_limit_script = """
+import numpy as np
+from pykeops.numpy import Genred
+
+x, y = np.random.rand(1000, 3), np.random.rand(130, 3)
+fun = Genred("SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], reduction_op="Sum", axis=(0, 1))
+expected = ((x[:, None, :] - y[None, :, :]) ** 2).sum()
+assert np.allclose(fun(x, y, backend="CPU"), expected)
+print("ok")
+"""
+
+
+def test_full_reduction_thread_limit():
+    # OpenMP starts less threads than requested : the "i" ranges are split between
+    # the threads of the team
+    env = dict(os.environ, OMP_NUM_THREADS="8", OMP_THREAD_LIMIT="2")
+    res = subprocess.run(
+        [sys.executable, "-c", thread_limit_script],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert res.returncode == 0 and "ok" in res.stdout, res.stdout + res.stderr
+
+
+def test_full_reduction_errors():
+    with pytest.raises(ValueError):
+        Genred(formula, aliases, reduction_op="Max", axis=(0, 1))
+    with pytest.raises(ValueError):
+        Genred(formula, aliases, reduction_op="Sum", axis=(0, 0))
+
+
+def test_full_reduction_lazytensor():
+    x, y, b, s = data(100, 130)
+    x_i, y_j = LazyTensor(x[:, None, :]), LazyTensor(y[None, :, :])
+    K_ij = (-float(s[0]) * ((x_i - y_j) ** 2).sum(-1)).exp()
+    K_ij = K_ij * LazyTensor(b[None, :, :])
+    assert np.allclose(K_ij.sum(dim=(0, 1), backend="CPU"), reference(x, y, b, s))
+    # batch dimensions
+    x, y = np.random.rand(2, 10, 1, 3), np.random.rand(2, 1, 12, 3)
+    b = np.random.rand(12)
+    K_ij = (-((LazyTensor(x) - LazyTensor(y)) ** 2).sum(-1)).exp()
+    K_ij = K_ij * LazyTensor(b[None, None, :, None])
+    res = K_ij.sum(axis=(1, 2), backend="CPU")
+    expected = reference(x[:, :, 0], y[:, 0], b[:, None], 1.0)
+    assert res.shape == (2, 1, 1) and np.allclose(res, expected)
+
+
+def test_full_reduction_grad():
+    fun = Genred_torch(formula, aliases, reduction_op="Sum", axis=(0, 1))
+    args = [torch.tensor(a, requires_grad=True) for a in data(100, 130)]
+    res = fun(*args, backend="CPU")
+    grads = torch.autograd.grad((res**2).sum(), args, create_graph=True)
+    expected = torch.autograd.grad(
+        (reference(*args) ** 2).sum(), args, create_graph=True
+    )
+    for g, e in zip(grads, expected):
+        assert g.shape == e.shape and torch.allclose(g, e)
+    (gg,) = torch.autograd.grad(grads[3].sum(), [args[0]])
+    (ee,) = torch.autograd.grad(expected[3].sum(), [args[0]])
+    assert torch.allclose(gg, ee)
+
+
+def test_parameter_grad():
+    # the gradient with respect to a parameter is a reduction over both i and j
+    red_formula = f"Sum_Reduction({formula},0)"
+    (spec,) = grad_specs(red_formula, aliases, {}, None, 2, 0, [3])
+    assert spec[2]["full_reduction"]
+    specs = grad_specs(red_formula, aliases, {}, None, 2, 0, [0, 3])
+    assert not specs[0][2].get("full_reduction")
+    fun = Genred_torch(formula, aliases, reduction_op="Sum", axis=1)
+    x, y, b, s = (torch.tensor(a) for a in data(100, 130))
+    s.requires_grad_(True)
+    (g,) = torch.autograd.grad((fun(x, y, b, s, backend="CPU") ** 2).sum(), [s])
+    K = (-s * ((x[:, None, :] - y[None, :, :]) ** 2).sum(-1)).exp()
+    (e,) = torch.autograd.grad(((K @ b) ** 2).sum(), [s])
+    assert g.shape == e.shape and torch.allclose(g, e)
+
+
+def test_full_reduction_lazytensor_grad():
+    x = torch.rand(2, 10, 1, 3, dtype=torch.float64, requires_grad=True)
+    y = torch.rand(1, 1, 12, 3, dtype=torch.float64, requires_grad=True)
+    K_ij = (-((LazyTensor_torch(x) - LazyTensor_torch(y)) ** 2).sum(-1)).exp()
+    res = K_ij.sum(dim=(1, 2), backend="CPU")
+    grads = torch.autograd.grad((res**2).sum(), [x, y])
+    K = (-((x - y) ** 2).sum(-1)).exp()
+    expected = torch.autograd.grad((K.sum((1, 2)) ** 2).sum(), [x, y])
+    for g, e in zip(grads, expected):
+        assert g.shape == e.shape and torch.allclose(g, e)
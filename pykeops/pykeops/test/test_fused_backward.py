@@ -0,0 +1,58 @@
+import torch
+
+from pykeops.common.operations import grad_specs
+from pykeops.torch import Genred, LazyTensor
+
+formula = "Exp(-s * SqDist(x,y)) * b"
+aliases = ["x=Vi(3)", "y=Vj(3)", "b=Vj(2)", "s=Pm(1)"]
+
+
+def reference(x, y, b, s):
+    K = (-s * ((x[..., :, None, :] - y[..., None, :, :]) ** 2).sum(-1)).exp()
+    return K @ b
+
+
+def test_grad_specs():
+    red_formula = f"Sum_Reduction({formula},0)"
+    specs = grad_specs(red_formula, aliases, {}, None, 2, 0, range(4))
+    # one reduction over j for x and s, one reduction over i for y and b
+    assert [spec[-1] for spec in specs] == [[0, 3], [1, 2]]
+    assert specs[0][0].startswith("GradConcat_WithSavedForward(")
+    specs = grad_specs(red_formula, aliases, {}, None, 2, 0, [2])
+    assert [spec[-1] for spec in specs] == [[2]]
+    assert specs[0][0].startswith("Grad_WithSavedForward(")
+    # reductions whose gradients are not sum reductions are not fused
+    specs = grad_specs(f"Min_Reduction({formula},0)", aliases, {}, None, 2, 0, [0, 3])
+    assert [spec[-1] for spec in specs] == [[0], [3]]
+
+
+def test_fused_backward():
+    fun = Genred(formula, aliases, reduction_op="Sum", axis=1)
+    x, y, b = torch.rand(10, 3), torch.rand(12, 3), torch.rand(12, 2)
+    s = torch.tensor([0.7])
+    args = [a.double().requires_grad_(True) for a in (x, y, b, s)]
+    res = fun(*args, backend="CPU")
+    grads = torch.autograd.grad((res**2).sum(), args, create_graph=True)
+    expected = torch.autograd.grad(
+        (reference(*args) ** 2).sum(), args, create_graph=True
+    )
+    for g, e in zip(grads, expected):
+        assert g.shape == e.shape and torch.allclose(g, e)
+    # second order gradients go through the fused reductions
+    (gg,) = torch.autograd.grad(grads[0].sum() + grads[3].sum(), [args[1]])
+    (ee,) = torch.autograd.grad(expected[0].sum() + expected[3].sum(), [args[1]])
+    assert torch.allclose(gg, ee)
+
+
+def test_fused_backward_batch():
+    # broadcasted batch dimensions, and the high dimension variable of sum(F*b)
+    x = torch.rand(2, 10, 1, 3, dtype=torch.float64, requires_grad=True)
+    y = torch.rand(1, 1, 12, 3, dtype=torch.float64, requires_grad=True)
+    b = torch.rand(1, 1, 12, 200, dtype=torch.float64, requires_grad=True)
+    K_ij = (-((LazyTensor(x) - LazyTensor(y)) ** 2).sum(-1)).exp()
+    res = (K_ij * LazyTensor(b)).sum(2, backend="CPU")
+    grads = torch.autograd.grad(res.sum(), [x, y, b])
+    K = (-((x - y) ** 2).sum(-1)).exp()
+    expected = torch.autograd.grad((K @ b[:, 0]).sum(), [x, y, b])
+    for g, e in zip(grads, expected):
+        assert g.shape == e.shape and torch.allclose(g, e)
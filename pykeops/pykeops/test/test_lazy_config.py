@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import_script = """
+import sys
+import pykeops
+import keopscore.config.config as config
+
+# importing pykeops does not probe the environment, nor load the bindings
+print("probed", [name for name in config.lazy_probes if name in vars(config)])
+print("loaded", [m for m in ("torch", "keopscore.get_keops_dll") if m in sys.modules])
+print("gpu", pykeops.config.gpu_available == config.use_cuda)
+"""
+
+
+def run(script, home):
+    env = dict(os.environ, HOME=str(home))
+    res = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True
+    )
+    assert res.returncode == 0, res.stdout + res.stderr
+    return res.stdout
+
+
+def test_lazy_config(tmp_path):
+    out = run(import_script, tmp_path)
+    assert "probed []" in out and "loaded []" in out and "gpu True" in out
+    # the results of the probes are stored in the build folder
+    files = [f for _, _, fs in os.walk(tmp_path) for f in fs]
+    assert len([f for f in files if f.startswith("env_probes_")]) == 1
+
+switches_script = """
+import numpy as np
+import keopscore.config.config as config
+from pykeops.numpy import Genred
+
+# the switches set before the first compilation disable cuda and OpenMP
+config.use_cuda = False
+config.use_OpenMP = False
+fun = Genred("SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], reduction_op="Sum", axis=1)
+x = np.random.rand(10, 3)
+expected = ((x[:, None] - x) ** 2).sum(axis=(1, 2))[:, None]
+print("result", np.allclose(fun(x, x), expected))
+print("switches", config.use_cuda, config.use_OpenMP, config.cuda_available is not None)
+print("openmp flags", "-fopenmp" in config.cpp_flags)
+"""
+
+
+def test_config_switches(tmp_path):
+    out = run(switches_script, tmp_path)
+    assert "result True" in out
+    assert "switches False False True" in out and "openmp flags False" in out
@@ -0,0 +1,45 @@
+import numpy as np
+import torch
+
+from pykeops.numpy import LazyTensor
+from pykeops.torch import LazyTensor as LazyTensor_torch
+
+
+def gaussian_sum(x, y, b, LazyTensor):
+    x_i, y_j = LazyTensor(x[:, None, :]), LazyTensor(y[None, :, :])
+    K_ij = (-((x_i - y_j) ** 2).sum(-1)).exp()
+    return (K_ij * LazyTensor(b[None, :, :])).sum(1, call=False)
+
+
+def reference(x, y, b):
+    return np.exp(-((x[:, None, :] - y[None, :, :]) ** 2).sum(-1)) @ b
+
+
+def test_lazytensor_cache():
+    reductions = []
+    for M, N in [(10, 12), (10, 12), (7, 20)]:
+        x, y, b = np.random.rand(M, 3), np.random.rand(N, 3), np.random.rand(N, 2)
+        res = gaussian_sum(x, y, b, LazyTensor)
+        assert np.allclose(res(backend="CPU"), reference(x, y, b))
+        reductions.append(res)
+    # the expressions built with new arrays share their Genred object
+    assert reductions[0].callfun is reductions[1].callfun is reductions[2].callfun
+    assert len(reductions[0].callfun.plans) == 2
+    # other structures have their own
+    x, y, b = np.random.rand(10, 3), np.random.rand(12, 3), np.random.rand(12, 1)
+    assert gaussian_sum(x, y, b, LazyTensor).callfun is not reductions[0].callfun
+    res = gaussian_sum(*(torch.tensor(a) for a in (x, y, b)), LazyTensor_torch)
+    assert res.callfun is not reductions[0].callfun
+    assert np.allclose(res(backend="CPU").numpy(), reference(x, y, b))
+
+
+def test_lazytensor_same_variable():
+    # a variable used twice, and two variables with the same values
+    x = np.random.rand(10, 3)
+    x_i, x_j = LazyTensor(x[:, None, :]), LazyTensor(x[None, :, :])
+    res = ((x_i - x_j) ** 2 + x_i).sum(1, backend="CPU")
+    expected = (((x[:, None, :] - x[None, :, :]) ** 2) + x[:, None, :]).sum(1)
+    assert np.allclose(res, expected)
+    y = x.copy()
+    res = ((x_i - LazyTensor(y[None, :, :])) ** 2).sum(1, backend="CPU")
+    assert np.allclose(res, ((x[:, None, :] - y[None, :, :]) ** 2).sum(1))
@@ -0,0 +1,57 @@
+import threading
+
+import numpy as np
+import torch
+import pykeops
+from pykeops.common.compile_pool import submit_compile, wait_compile
+from pykeops.numpy import Genred as Genred_np
+from pykeops.torch import Genred, LazyTensor
+
+M, N, D = 100, 150, 3
+
+torch.manual_seed(0)
+x = torch.rand(M, D)
+y = torch.rand(N, D)
+b = torch.rand(N, 1)
+
+
+def test_submit_compile_dedup():
+    event = threading.Event()
+    f1 = submit_compile("dummy_target", event.wait)
+    f2 = submit_compile("dummy_target", event.wait)
+    assert f1 is f2
+    event.set()
+    wait_compile("dummy_target")
+    assert f1.done()
+
+
+def test_precompile_genred():
+    genred_torch = Genred(
+        "Exp(-SqDist(x,y)) * b", ["x=Vi(3)", "y=Vj(3)", "b=Vj(1)"], axis=1
+    )
+    genred_np = Genred_np(
+        "SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], reduction_op="Min", axis=1
+    )
+    pykeops.precompile([genred_torch, genred_np], backend="CPU")
+    out = genred_torch(x, y, b, backend="CPU")
+    expected = (-((x[:, None] - y[None]) ** 2).sum(-1)).exp() @ b
+    assert torch.allclose(out, expected, atol=1e-5)
+    out_np = genred_np(x.numpy(), y.numpy(), backend="CPU")
+    expected_np = ((x[:, None] - y[None]) ** 2).sum(-1).min(1).values.numpy()
+    assert np.allclose(out_np.ravel(), expected_np, atol=1e-6)
+
+
+def test_precompile_lazytensor_grad():
+    xr = x.clone().requires_grad_()
+    x_i, y_j = LazyTensor(xr[:, None, :]), LazyTensor(y[None, :, :])
+    red = ((x_i - y_j) ** 2).sum(-1).sum(dim=1, call=False)
+    futures = pykeops.precompile([red], backend="CPU", grad=True, wait=False)
+    # forward formula, and gradients with respect to x and y
+    # (except those which were compiled by a previous run)
+    assert len(futures) <= 3
+    out = red()
+    (g,) = torch.autograd.grad(out.sum(), [xr])
+    for future in futures:
+        future.result()
+    expected = 2 * (N * x - y.sum(0))
+    assert torch.allclose(g, expected, atol=1e-3)
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+script = """
+import numpy as np
+from pykeops.numpy import Genred
+
+x = np.arange(30, dtype="float32").reshape(10, 3)
+for formula in ["SqDist(x,y)", "Norm2(x-y)"]:
+    fun = Genred(formula, ["x=Vi(3)", "y=Vj(3)"], reduction_op="Sum", axis=1)
+    print("result", fun(x, x, backend="CPU").sum())
+"""
+
+
+def run(home, **env):
+    env = dict(os.environ, HOME=str(home), **env)
+    res = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True
+    )
+    assert res.returncode == 0, res.stdout + res.stderr
+    files = [f for _, _, fs in os.walk(home) for f in fs]
+    return res.stdout, [f for f in files if f.endswith(".gch")]
+
+
+def test_precompiled_header(tmp_path):
+    out, gch = run(tmp_path / "pch")
+    # the headers are precompiled once, and used for both formulas
+    assert out.count("Precompiling Cpu headers ... OK") == 1 and len(gch) == 1
+    out_nopch, gch = run(tmp_path / "nopch", KEOPS_PRECOMPILED_HEADER="0")
+    assert "Precompiling" not in out_nopch and len(gch) == 0
+    results = [line for line in out.split("\n") if line.startswith("result")]
+    assert results == [l for l in out_nopch.split("\n") if l.startswith("result")]
@@ -1,23 +1,98 @@
+import threading
+
 import torch
 
+from pykeops.common.autotune import get_enable_autotune, autotune_key, autotune_conv
+from pykeops.common.call_plan import config_key, store_plan
+from pykeops.common.call_pool import submit_call
+from pykeops.common.compile_pool import compile_reduction, submit_task
 from pykeops.common.get_options import get_tag_backend
-from pykeops.common.operations import preprocess, postprocess
+from pykeops.common.operations import grad_specs, preprocess, postprocess
 from pykeops.common.parse_type import (
     get_type,
     get_sizes,
     complete_aliases,
     get_optional_flags,
 )
-from pykeops.common.utils import axis2cat
+from pykeops.common.utils import axis2cat, parse_full_axis
 from pykeops import default_device_id
 from pykeops.common.utils import pyKeOps_Warning
 
+# reductions which can not be differentiated
+grad_not_supported = [
+    "Min_ArgMin_Reduction",
+    "Min_Reduction",
+    "Max_ArgMax_Reduction",
+    "Max_Reduction",
+    "KMin_ArgKMin_Reduction",
+    "KMin_Reduction",
+]
+
+# formulas (with their options) whose gradients are compiled in the background, with
+# the futures of the generation of their code, and formulas whose gradients could not
+# be compiled
+autograd_batches = {}
+autograd_batch_failures = set()
+autograd_lock = threading.Lock()
+
+
+def compile_gradients(ctx):
+    # submits the generation and the compilation of the code of the gradients of a
+    # call recorded by autograd (see GenredAutograd.forward) to the compile pool
+    if ctx.gradients is None:
+        return
+    batch_key, args, kwargs = ctx.gradients
+    with autograd_lock:
+        if batch_key in autograd_batch_failures:
+            return
+        task = autograd_batches.get(batch_key)
+        if task is None:
+            task = submit_task(compile_gradients_task, batch_key, args, kwargs)
+            autograd_batches[batch_key] = task
+    ctx.gradient_task = task
+
+
+def compile_gradients_task(batch_key, args, kwargs):
+    try:
+        compile_reduction(*args, **kwargs)
+    except NotImplementedError:
+        # the formula can not be differentiated : the backward raises the error, if
+        # it is called
+        autograd_batch_failures.add(batch_key)
+    except Exception as e:
+        autograd_batch_failures.add(batch_key)
+        pyKeOps_Warning(
+            "the gradients of the formula could not be compiled in the background, "
+            f"they are compiled when they are first called ({e})."
+        )
+
+
+class NoGradContext:
+    # context of the calls to GenredAutograd.forward which are not recorded by
+    # autograd (see Genred.__call__)
+    needs_input_grad = ()
+
+    def save_for_backward(self, *args):
+        pass
+
 
 class GenredAutograd(torch.autograd.Function):
     """
     This class is the entry point to pytorch auto grad engine.
     """
 
+    @classmethod
+    def apply(cls, *args):
+        # the forward always runs with the grad mode disabled : the grad mode of the
+        # call is read here, and the gradients of the calls recorded by autograd are
+        # compiled in the background (see compile_gradients)
+        grad_enabled = torch.is_grad_enabled()
+        result = super().apply(*args)
+        out = result[0] if isinstance(result, tuple) else result
+        if grad_enabled and out.grad_fn is not None:
+            compile_gradients(out.grad_fn)
+        return result
+
     @staticmethod
     def forward(
         ctx,
@@ -74,19 +149,125 @@ class GenredAutograd(torch.autograd.Function):
 
         from pykeops.common.keops_io import keops_binder
 
-        myconv = keops_binder["nvrtc" if tagCPUGPU else "cpp"](
-            tagCPUGPU,
-            tag1D2D,
-            tagHostDevice,
-            use_ranges,
-            device_id_request,
-            formula,
-            aliases,
-            len(args),
-            dtype,
-            "torch",
-            optional_flags,
-        ).import_module()
+        def make_conv(tag1D2D, cpu_scheme=None):
+            # the Cpu 1D scheme may be given by the autotuner (see autotune_conv)
+            flags = optional_flags
+            if cpu_scheme is not None:
+                flags = dict(optional_flags, cpu_scheme=cpu_scheme)
+            return keops_binder["nvrtc" if tagCPUGPU else "cpp"](
+                tagCPUGPU,
+                tag1D2D,
+                tagHostDevice,
+                use_ranges,
+                device_id_request,
+                formula,
+                aliases,
+                len(args),
+                dtype,
+                "torch",
+                flags,
+            ).import_module()
+
+        # N.B.: KeOps C++ expects contiguous data arrays, except on Cpu where
+        # 2D arrays can be read with arbitrary row and column strides.
+        strided_args = ()
+        if tagCPUGPU == 0 and nbatchdims == 0:
+            strided_args = tuple(
+                k
+                for k, arg in enumerate(args)
+                if arg.dim() == 2 and not arg.is_contiguous()
+            )
+        optional_flags = dict(optional_flags, strided_args=strided_args)
+        test_contig = all(
+            arg.is_contiguous() or k in strided_args for k, arg in enumerate(args)
+        )
+        if not test_contig:
+            pyKeOps_Warning(
+                "at least one of the input tensors is not contiguous. "
+                + "Consider using contiguous data arrays to avoid unnecessary copies."
+            )
+            args = tuple(arg.contiguous() for arg in args)
+
+        # N.B.: KeOps C++ expects contiguous integer arrays as ranges
+        if ranges:
+            ranges = tuple(r.contiguous() for r in ranges)
+
+        autotune = backend == "auto" and get_enable_autotune() and not use_ranges
+        ctx.gradients = None
+        if tagCPUGPU == 0 and not autotune and any(ctx.needs_input_grad[11:]):
+            # the gradients which will be needed by the backward are generated and
+            # compiled in a single module by the compile pool, if the call is
+            # recorded by autograd (see apply) : the formula is compiled in its own
+            # module, so that its calls do not wait for them
+            batch_key = (
+                formula,
+                tuple(aliases),
+                dtype,
+                tag1D2D,
+                bool(use_ranges),
+                strided_args,
+                rec_multVar_highdim,
+                # N.B. multVar_highdim is given by rec_multVar_highdim
+                tuple(
+                    sorted(
+                        (key, val)
+                        for key, val in ctx.optional_flags.items()
+                        if key != "multVar_highdim"
+                    )
+                ),
+                ctx.needs_input_grad[11:],
+            )
+            if not formula.startswith(tuple(grad_not_supported)):
+                grad_vars = [
+                    k for k, need in enumerate(ctx.needs_input_grad[11:]) if need
+                ]
+                ctx.gradients = (
+                    batch_key,
+                    (
+                        formula,
+                        aliases,
+                        ctx.optional_flags,
+                        rec_multVar_highdim,
+                        tagCPUGPU,
+                        tag1D2D,
+                        tagHostDevice,
+                        bool(use_ranges),
+                        device_id_request,
+                        dtype,
+                        "torch",
+                    ),
+                    dict(
+                        strided_args=strided_args,
+                        grad_vars=grad_vars,
+                        separate_formula=True,
+                    ),
+                )
+
+        if autotune:
+            # the map-reduce scheme is chosen by benchmarking the candidates, which
+            # write in a scratch output array, so that out is only written by the call
+            scratch = None if out is None else torch.empty_like(out)
+
+            def run_conv(conv):
+                conv.genred_pytorch(
+                    device_args, ranges, nx, ny, nbatchdims, scratch, *args
+                )
+                if tagCPUGPU == 1:
+                    torch.cuda.synchronize()
+
+            key = autotune_key(
+                formula,
+                aliases,
+                dtype,
+                optional_flags,
+                tagCPUGPU,
+                tagHostDevice,
+                nx,
+                ny,
+            )
+            myconv = autotune_conv(make_conv, run_conv, tagCPUGPU, key)
+        else:
+            myconv = make_conv(tag1D2D)
 
         # Context variables: save everything to compute the gradient:
         ctx.formula = formula
@@ -100,31 +281,22 @@ class GenredAutograd(torch.autograd.Function):
         ctx.nx = nx
         ctx.ny = ny
 
-        # N.B.: KeOps C++ expects contiguous data arrays
-        test_contig = all(arg.is_contiguous() for arg in args)
-        if not test_contig:
-            pyKeOps_Warning(
-                "at least one of the input tensors is not contiguous. "
-                + "Consider using contiguous data arrays to avoid unnecessary copies."
-            )
-            args = tuple(arg.contiguous() for arg in args)
-
-        # N.B.: KeOps C++ expects contiguous integer arrays as ranges
-        if ranges:
-            ranges = tuple(r.contiguous() for r in ranges)
-
         result = myconv.genred_pytorch(
             device_args, ranges, nx, ny, nbatchdims, out, *args
         )
 
         # relying on the 'ctx.saved_variables' attribute is necessary  if you want to be able to differentiate the output
         #  of the backward once again. It helps pytorch to keep track of 'who is who'.
-        ctx.save_for_backward(*args, result)
+        # N.B. on Cpu, the reductions with indices return the values and the indices
+        # in two tensors (see LoadKeOps.output_result)
+        ctx.save_for_backward(
+            *args, result[0] if isinstance(result, tuple) else result
+        )
 
         return result
 
     @staticmethod
-    def backward(ctx, G):
+    def backward(ctx, G, *G_ind):
         formula = ctx.formula
         aliases = ctx.aliases
         backend = ctx.backend
@@ -139,15 +311,7 @@ class GenredAutograd(torch.autograd.Function):
         nargs = len(args)
         result = ctx.saved_tensors[-1].detach()
 
-        not_supported = [
-            "Min_ArgMin_Reduction",
-            "Min_Reduction",
-            "Max_ArgMax_Reduction",
-            "Max_Reduction",
-            "KMin_ArgKMin_Reduction",
-            "KMin_Reduction",
-        ]
-        for red in not_supported:
+        for red in grad_not_supported:
             if formula.startswith(red):
                 raise NotImplementedError(
                     "As of today, KeOps does not support "
@@ -162,103 +326,81 @@ class GenredAutograd(torch.autograd.Function):
                     + "tensor containing the relevant 'minimal' values."
                 )
 
-        # If formula takes 5 variables (numbered from 0 to 4), then the gradient
-        # wrt. the output, G, should be given as a 6-th variable (numbered 5),
-        # with the same dim-cat as the formula's output.
-        eta = (
-            "Var("
-            + str(nargs)
-            + ","
-            + str(myconv.dimout)
-            + ","
-            + str(myconv.tagIJ)
-            + ")"
-        )
-
-        # there is also a new variable for the formula's output
-        resvar = (
-            "Var("
-            + str(nargs + 1)
-            + ","
-            + str(myconv.dimout)
-            + ","
-            + str(myconv.tagIJ)
-            + ")"
-        )
+        # the code of the gradients may be generated in the background : it is waited
+        # for, so that their modules are not built twice
+        task = getattr(ctx, "gradient_task", None)
+        if task is not None:
+            task.result()
 
         # convert to contiguous:
         G = G.contiguous()
 
-        grads = []  # list of gradients wrt. args;
-
-        for var_ind, (sig, arg_ind) in enumerate(
-            zip(aliases, args)
-        ):  # Run through the arguments
-            # If the current gradient is to be discarded immediatly...
-            if not ctx.needs_input_grad[
-                var_ind + 11
-            ]:  # because of (formula, aliases, backend, dtype, device_id_request, ranges, optional_flags, rec_multVar_highdim, nx, ny, out)
-                grads.append(None)  # Don't waste time computing it.
+        # Only the gradients which are really needed by the user are computed :
+        # because of (formula, aliases, backend, dtype, device_id_request, ranges, optional_flags, rec_multVar_highdim, nx, ny, out)
+        grad_vars = [
+            var_ind
+            for var_ind in range(nargs)
+            if ctx.needs_input_grad[var_ind + 11]
+        ]
+        # If formula takes 5 variables (numbered from 0 to 4), then the gradient
+        # wrt. the output, G, is given as a 6-th variable (numbered 5), with the same
+        # dim-cat as the formula's output, and the formula's output as a 7-th variable.
+        # Adding new aliases is way too dangerous if we want to compute second
+        # derivatives, etc. So we make explicit references to Var<ind,dim,cat> instead.
+        # The gradients with respect to the variables with the same index of
+        # reduction are computed together, by a single reduction (see grad_specs).
+        specs = grad_specs(
+            formula,
+            aliases,
+            optional_flags,
+            ctx.rec_multVar_highdim,
+            myconv.dimout,
+            myconv.tagIJ,
+            grad_vars,
+        )
+        if optional_flags.get("full_reduction"):
+            # the output of a reduction over both i and j is a parameter
+            G = G.squeeze(-2)
+            result = result.squeeze(-2)
+        args_g = args + (G,) + (result,)  # Don't forget the gradient to backprop !
+
+        grads = [None] * nargs  # list of gradients wrt. args;
+
+        for formula_g, aliases_g, flags, rec_multVar_highdim, var_inds in specs:
+            # N.B.: if I understand PyTorch's doc, we should redefine this function every time we use it?
+            genconv = GenredAutograd.apply
+
+            grad_g = genconv(
+                formula_g,
+                aliases_g,
+                backend,
+                dtype,
+                device_id_request,
+                ranges,
+                flags,
+                rec_multVar_highdim,
+                nx,
+                ny,
+                None,
+                *args_g
+            )
 
-            else:
-                # Otherwise, the current gradient is really needed by the user. Adding new aliases is way too dangerous if we want to compute
-                # second derivatives, etc. So we make explicit references to Var<ind,dim,cat> instead.
-                # New here (Joan) : we still add the new variables to the list of "aliases" (without
-                # giving new aliases for them) these will not be used in the C++ code,
-                # but are useful to keep track of the actual variables used in the formula
-                _, cat, dim, pos = get_type(sig, position_in_list=var_ind)
-                var = "Var(" + str(pos) + "," + str(dim) + "," + str(cat) + ")"  # V
-                formula_g = (
-                    "Grad_WithSavedForward("
-                    + formula
-                    + ", "
-                    + var
-                    + ", "
-                    + eta
-                    + ", "
-                    + resvar
-                    + ")"
-                )  # Grad<F,V,G,R>
-                aliases_g = aliases + [eta, resvar]
-                args_g = (
-                    args + (G,) + (result,)
-                )  # Don't forget the gradient to backprop !
-
-                # N.B.: if I understand PyTorch's doc, we should redefine this function every time we use it?
-                genconv = GenredAutograd.apply
-
-                # For a reduction of the type sum(F*b), with b a variable, and if we require the gradient
-                # with respect to b, the gradient will be of same type sum(F*eta). So we set again rec_multVar option
-                # in this case.
-                if (
-                    not isinstance(ctx.rec_multVar_highdim, bool)
-                    and pos == ctx.rec_multVar_highdim
-                ):
-                    rec_multVar_highdim = (
-                        nargs  # nargs is the position of variable eta.
-                    )
+            offset = 0
+            for var_ind in var_inds:
+                arg_ind = args[var_ind]
+                _, cat, dim, _ = get_type(aliases[var_ind], position_in_list=var_ind)
+                # the gradient is a slice of the concatenated gradients
+                if len(var_inds) > 1:
+                    grad = grad_g[..., offset : offset + dim]
                 else:
-                    rec_multVar_highdim = None
+                    grad = grad_g
+                offset += dim
 
                 if (
                     cat == 2
                 ):  # we're referring to a parameter, so we'll have to sum both wrt 'i' and 'j'
                     # WARNING !! : here we rely on the implementation of DiffT in files in folder keopscore/core/formulas/reductions
                     # if tagI==cat of V is 2, then reduction is done wrt j, so we need to further sum output wrt i
-                    grad = genconv(
-                        formula_g,
-                        aliases_g,
-                        backend,
-                        dtype,
-                        device_id_request,
-                        ranges,
-                        optional_flags,
-                        rec_multVar_highdim,
-                        nx,
-                        ny,
-                        None,
-                        *args_g
-                    )
                     # Then, sum 'grad' wrt 'i' :
                     # I think that '.sum''s backward introduces non-contiguous arrays,
                     # and is thus non-compatible with GenredAutograd: grad = grad.sum(0)
@@ -275,21 +417,6 @@ class GenredAutograd(torch.autograd.Function):
                     )
 
                 else:
-                    grad = genconv(
-                        formula_g,
-                        aliases_g,
-                        backend,
-                        dtype,
-                        device_id_request,
-                        ranges,
-                        optional_flags,
-                        rec_multVar_highdim,
-                        nx,
-                        ny,
-                        None,
-                        *args_g
-                    )
-
                     # N.B.: 'grad' is always a full [A, .., B, M, D] or [A, .., B, N, D] or [A, .., B, D] tensor,
                     #       whereas 'arg_ind' may have some broadcasted batched dimensions.
                     #       Before returning our gradient, we must collapse 'grad' with a .sum() operation,
@@ -308,7 +435,7 @@ class GenredAutograd(torch.autograd.Function):
                 grad = grad.reshape(
                     arg_ind.shape
                 )  # The gradient should have the same shape as the input!
-                grads.append(grad)
+                grads[var_ind] = grad
 
         # Grads wrt. formula, aliases, backend, dtype, device_id_request, ranges, optional_flags, rec_multVar_highdim, nx, ny, out, *args
         return (
@@ -378,6 +505,7 @@ class Genred:
         sum_scheme="auto",
         enable_chunks=True,
         rec_multVar_highdim=False,
+        build_profile=None,
     ):
         r"""
         Instantiate a new generic operation.
@@ -417,6 +545,8 @@ class Genred:
 
                   - **axis** = 0: reduction with respect to :math:`i`, outputs a ``Vj`` or ":math:`j`" variable.
                   - **axis** = 1: reduction with respect to :math:`j`, outputs a ``Vi`` or ":math:`i`" variable.
+                  - **axis** = (0, 1): reduction with respect to both :math:`i` and :math:`j`, outputs a single line.
+                    Only the ``"Sum"`` reduction is supported.
 
             opt_arg (int, default = None): If **reduction_op** is in ``["KMin", "ArgKMin", "KMin_ArgKMin"]``,
                 this argument allows you to specify the number ``K`` of neighbors to consider.
@@ -429,6 +559,9 @@ class Genred:
                   - **dtype_acc** = ``"float32"`` : allowed only if dtype is "float16" or "float32".
                   - **dtype_acc** = ``"float64"`` : allowed only if dtype is "float32" or "float64"..
 
+                With the CPU backend, float16 and bfloat16 tensors are read and written directly,
+                but all computations and accumulations are done in float32.
+
             use_double_acc (bool, default False): same as setting dtype_acc="float64" (only one of the two options can be set)
                 If True, accumulate results of reduction in float64 variables, before casting to float32.
                 This can only be set to True when data is in float32 or float64.
@@ -449,6 +582,13 @@ class Genred:
                                 with formulas involving large dimension variables. Beware ! This will only work if the formula has the very special form
                                 that allows such computation mode.
 
+            build_profile (string, default None): for Cpu mode only, compile flags of the module, which is compiled
+                                for each profile. If None, the global profile set with ``pykeops.set_build_profile`` is used.
+                                The supported values are ``"portable"`` (the default global profile), ``"native"`` (the
+                                instruction set of the current machine), ``"native-fast-math"`` (with ``-ffast-math``, which
+                                may change rounding errors) and ``"pgo"`` (profile guided optimization : the module is built
+                                again with the profile of its first call).
+
         """
 
         if dtype:
@@ -460,6 +600,7 @@ class Genred:
                 "keyword argument cuda_type in Genred is deprecated ; argument is ignored."
             )
 
+        axis, full_reduction = parse_full_axis(axis, reduction_op)
         self.reduction_op = reduction_op
         reduction_op_internal, formula2 = preprocess(reduction_op, formula2)
 
@@ -469,7 +610,11 @@ class Genred:
             use_double_acc,
             sum_scheme,
             enable_chunks,
+            build_profile,
         )
+        if full_reduction:
+            # the rows of the reduction over "j" are summed (see LoadKeOps.genred)
+            self.optional_flags["full_reduction"] = True
 
         str_opt_arg = "," + str(opt_arg) if opt_arg else ""
         str_formula2 = "," + formula2 if formula2 else ""
@@ -491,6 +636,7 @@ class Genred:
         self.opt_arg = opt_arg
 
         self.rec_multVar_highdim = rec_multVar_highdim
+        self.plans = {}
 
     def __call__(self, *args, backend="auto", device_id=-1, ranges=None, out=None):
         r"""
@@ -519,6 +665,7 @@ class Genred:
 
                     - ``"auto"`` (default): let KeOps decide which backend is best suited to your data, based on the tensors' shapes. ``"GPU_1D"`` will be chosen in most cases.
                     - ``"CPU"``: use a simple C++ ``for`` loop on a single CPU core.
+                    - ``"CPU_2D"``: on the CPU, split the reduction index between the threads and merge the partial results, which is faster when the number of output lines is small.
                     - ``"GPU_1D"``: use a `simple multithreading scheme <https://github.com/getkeops/keops/blob/main/keops/core/GpuConv1D.cu>`_ on the GPU - basically, one thread per value of the output index.
                     - ``"GPU_2D"``: use a more sophisticated `2D parallelization scheme <https://github.com/getkeops/keops/blob/main/keops/core/GpuConv2D.cu>`_ on the GPU.
                     - ``"GPU"``: let KeOps decide which one of the ``"GPU_1D"`` or the ``"GPU_2D"`` scheme will run faster on the given input.
@@ -604,16 +751,39 @@ class Genred:
 
         """
 
+        # calls which are not recorded by autograd, with arrays of the same structure,
+        # use the plan of the first one
+        use_plan = not (
+            torch.is_grad_enabled() and any(arg.requires_grad for arg in args)
+        )
+        if use_plan:
+            plan_key = (
+                tuple((arg.shape, arg.dtype, arg.device, arg.stride()) for arg in args),
+                ranges and tuple((r.shape, r.stride()) for r in ranges),
+                out is not None and (out.shape, out.dtype, out.stride()),
+                backend,
+                device_id,
+                config_key(),
+            )
+            plan = self.plans.get(plan_key)
+            if plan is not None:
+                plan, nout, dtype = plan
+                out = plan(args, ranges, out)
+                return postprocess(
+                    out, "torch", self.reduction_op, nout, self.opt_arg, dtype
+                )
+
         dtype = args[0].dtype.__str__().split(".")[1]
 
         nx, ny = get_sizes(self.aliases, *args)
         nout, nred = (nx, ny) if self.axis == 1 else (ny, nx)
 
-        if "Arg" in self.reduction_op:
-            # when using Arg type reductions,
+        if "Arg" in self.reduction_op and get_tag_backend(backend, args)[0] == 1:
+            # when using Arg type reductions on Gpu,
             # if nred is greater than 16 millions and dtype=float32, the result is not reliable
-            # because we encode indices as floats, so we raise an exception ;
-            # same with float16 type and nred>2048
+            # because we encode indices as floats, so we raise an exception (on Cpu
+            # indices are accumulated and written as integers) ;
+            # same with float16 type and nred>2048, and bfloat16 type and nred>256
             if nred > 1.6e7 and dtype in ("float32", "float"):
                 raise ValueError(
                     "size of input array is too large for Arg type reduction with single precision. Use double precision."
@@ -622,8 +792,12 @@ class Genred:
                 raise ValueError(
                     "size of input array is too large for Arg type reduction with float16 dtype.."
                 )
+            elif nred > 256 and dtype == "bfloat16":
+                raise ValueError(
+                    "size of input array is too large for Arg type reduction with bfloat16 dtype.."
+                )
 
-        out = GenredAutograd.apply(
+        genred_args = (
             self.formula,
             self.aliases,
             backend,
@@ -635,7 +809,35 @@ class Genred:
             nx,
             ny,
             out,
-            *args
+            *args,
         )
+        if not use_plan:
+            out = GenredAutograd.apply(*genred_args)
+        else:
+            ctx = NoGradContext()
+            out = GenredAutograd.forward(ctx, *genred_args)
+            strided_args = ctx.myconv.params.strided_args
+            if all(
+                arg.is_contiguous() or k in strided_args for k, arg in enumerate(args)
+            ) and all(r.is_contiguous() for r in ranges or ()):
+                plan = ctx.myconv.make_plan(nx, ny, args, ranges, out)
+                store_plan(self.plans, plan_key, plan and (plan, nout, dtype))
 
         return postprocess(out, "torch", self.reduction_op, nout, self.opt_arg, dtype)
+
+    def submit(self, *args, **kwargs):
+        r"""
+        Same as :meth:`__call__`, but the reduction is run in the background by the
+        pool of :func:`pykeops.get_call_workers` threads : returns a
+        :class:`concurrent.futures.Future`, whose result is the output of the call.
+        The call is recorded by autograd as in the calling thread, and the input
+        tensors should not be modified before its end.
+        """
+        return submit_call(
+            self.call_with_grad_mode, torch.is_grad_enabled(), args, kwargs
+        )
+
+    def call_with_grad_mode(self, grad_enabled, args, kwargs):
+        # the grad mode of torch is specific to each thread
+        with torch.set_grad_enabled(grad_enabled):
+            return self(*args, **kwargs)
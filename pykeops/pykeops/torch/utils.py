@@ -51,6 +51,10 @@ class torchtools:
     def arraysum(x, axis=None):
         return x.sum() if axis is None else x.sum(dim=axis)
 
+    @staticmethod
+    def sum_rows(x):
+        return x.sum(-2, keepdim=True)
+
     @staticmethod
     def long(x):
         return x.long()
@@ -120,6 +124,8 @@ class torchtools:
             return "float64"
         elif dtype == torch.float16:
             return "float16"
+        elif dtype == torch.bfloat16:
+            return "bfloat16"
         elif dtype == int:
             return int
         elif dtype == list:
@@ -129,6 +135,14 @@ class torchtools:
                 "[KeOps] {} data type incompatible with KeOps.".format(dtype)
             )
 
+    @staticmethod
+    def dtype_from_name(name):
+        return getattr(torch, name)
+
+    @staticmethod
+    def strides(x):
+        return list(x.stride())
+
     @staticmethod
     def rand(m, n, dtype, device):
         return torch.rand(m, n, dtype=dtype, device=device)